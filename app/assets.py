@@ -0,0 +1,226 @@
+#assets.py
+"""
+Content-hashed, precompressed frontend assets.
+
+    python -m app.assets build [--source front] [--output front/dist]
+
+The build copies every file under ``front/`` to ``front/dist/`` with a hash
+of its content in the name (``scripts/app.3f9c0a1b2d4e.js``), rewriting
+relative ES-module imports and CSS ``url()`` references to the hashed names
+first, so a change to ``dom.js`` also renames ``app.js``.  ``index.html``
+keeps its name and has its ``/front/...`` links pointed at ``/assets/...``.
+Every text file gets a ``.gz`` sibling (gzip -9) and, with the optional
+``brotli`` package, a ``.br`` sibling (quality 11), written only when
+smaller than the original.
+
+At runtime ``AssetFiles`` serves the precompressed sibling the client
+accepts, so nothing is compressed per request.  Hashed names never change
+content and are sent with a one-year ``immutable`` Cache-Control;
+``index.html`` is ``no-cache`` and revalidated with its ETag.  Without a
+build the app serves ``front/`` as it is.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import sys
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from .compression import _accepts
+
+try:
+    import brotli
+except ImportError:  # optional: `pip install brotli`
+    brotli = None
+
+SOURCE_DIR = os.path.join(os.path.dirname(__file__), "..", "front")
+DIST_DIR = os.path.join(SOURCE_DIR, "dist")
+MANIFEST = "manifest.json"
+URL_PREFIX = "/assets/"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = (".js", ".mjs", ".css", ".html", ".svg", ".json", ".txt", ".map")
+
+_HASHED = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+_JS_IMPORT = re.compile(r"""(\bfrom\s*|\bimport\s*\(?\s*)(["'])(\.{1,2}/[^"']+)\2""")
+_CSS_URL = re.compile(r"""(url\(\s*)(["']?)([^"')]+)\2(\s*\))""")
+_HTML_LINK = re.compile(r"""(\b(?:src|href)=)(["'])/front/([^"']+)\2""")
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def _hashed_name(rel: str, body: bytes) -> str:
+    stem, ext = posixpath.splitext(rel)
+    return f"{stem}.{hashlib.blake2b(body, digest_size=6).hexdigest()}{ext}"
+
+
+def _local(ref: str) -> bool:
+    return not (ref.startswith(("/", "#", "data:")) or "://" in ref)
+
+
+class _Builder:
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.files: Dict[str, bytes] = {}
+        self.manifest: Dict[str, str] = {}  # source path -> hashed path, both relative and "/"-separated
+        self.output: Dict[str, bytes] = {}
+        self._visiting: List[str] = []
+
+    def add(self, rel: str) -> None:
+        with open(os.path.join(self.source, rel), "rb") as fh:
+            self.files[rel] = fh.read()
+
+    def _rewrite(self, rel: str, match: "re.Match", group: int) -> str:
+        ref = match.group(group)
+        path, sep, suffix = ref.partition("?")
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(rel), path))
+        if not _local(ref) or target not in self.files:
+            return match.group(0)
+        hashed = posixpath.relpath(self.hash(target), posixpath.dirname(rel) or ".")
+        if ref.startswith("./") and not hashed.startswith("."):
+            hashed = "./" + hashed  # a bare name would be a package import in JS
+        return match.group(0).replace(ref, hashed + sep + suffix, 1)
+
+    def hash(self, rel: str) -> str:
+        """Hashed name of *rel*, after hashing everything it references."""
+        if rel in self.manifest:
+            return self.manifest[rel]
+        if rel in self._visiting:
+            raise ValueError(f"Reference cycle: {' -> '.join(self._visiting + [rel])}")
+        self._visiting.append(rel)
+        body = self.files[rel]
+        if rel.endswith((".js", ".mjs")):
+            text = _JS_IMPORT.sub(lambda m: self._rewrite(rel, m, 3), body.decode())
+            body = text.encode()
+        elif rel.endswith(".css"):
+            text = _CSS_URL.sub(lambda m: self._rewrite(rel, m, 3), body.decode())
+            body = text.encode()
+        self._visiting.pop()
+        self.manifest[rel] = hashed = _hashed_name(rel, body)
+        self.output[hashed] = body
+        return hashed
+
+    def page(self, rel: str) -> None:
+        """An HTML entry point: keeps its name, links go to the hashed assets."""
+        def link(m: "re.Match") -> str:
+            target = m.group(3)
+            if target not in self.files:
+                return m.group(0)
+            return f"{m.group(1)}{m.group(2)}{URL_PREFIX}{self.hash(target)}{m.group(2)}"
+
+        self.output[rel] = _HTML_LINK.sub(link, self.files.pop(rel).decode()).encode()
+
+
+def _precompress(body: bytes) -> Dict[str, bytes]:
+    out = {}
+    gz = gzip.compress(body, 9, mtime=0)
+    if len(gz) < len(body):
+        out[".gz"] = gz
+    if brotli is not None:
+        br = brotli.compress(body, quality=11)
+        if len(br) < len(body):
+            out[".br"] = br
+    return out
+
+
+def build(source: str = SOURCE_DIR, output: str = DIST_DIR) -> Dict[str, str]:
+    """Write hashed and precompressed copies of *source* into *output*; returns the manifest."""
+    source, output = os.path.abspath(source), os.path.abspath(output)
+    builder = _Builder(source)
+    for root, dirs, names in os.walk(source):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != output and not d.startswith("."))
+        for name in sorted(names):
+            if not name.startswith("."):
+                builder.add(os.path.relpath(os.path.join(root, name), source).replace(os.sep, "/"))
+    pages = [rel for rel in builder.files if rel.endswith(".html")]
+    for rel in pages:
+        builder.page(rel)
+    for rel in list(builder.files):
+        builder.hash(rel)
+
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    for rel, body in builder.output.items():
+        path = os.path.join(output, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        variants = _precompress(body) if rel.endswith(COMPRESSIBLE) else {}
+        for suffix, data in [("", body), *variants.items()]:
+            with open(path + suffix, "wb") as fh:
+                fh.write(data)
+    with open(os.path.join(output, MANIFEST), "w") as fh:
+        json.dump(builder.manifest, fh, indent=2, sort_keys=True)
+    return builder.manifest
+
+# ---------------------------------------------------------------------------
+# Serving
+# ---------------------------------------------------------------------------
+
+_CODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+class AssetFiles(StaticFiles):
+    """
+    ``StaticFiles`` that answers with a precompressed ``.br`` / ``.gz``
+    sibling when the client accepts it, and immutable caching for hashed
+    names (everything else is revalidated).
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        response, coding = None, None
+        for coding, suffix in _CODINGS:
+            if _accepts(accept, coding):
+                try:
+                    response = await super().get_response(path + suffix, scope)
+                    break
+                except HTTPException:
+                    continue
+        if response is None:
+            response, coding = await super().get_response(path, scope), None
+        if coding is not None and response.status_code != 304:
+            response.headers["Content-Encoding"] = coding
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = IMMUTABLE if _HASHED.search(path) else "no-cache"
+        return response
+
+
+def built(directory: str = DIST_DIR) -> bool:
+    return os.path.isfile(os.path.join(directory, MANIFEST))
+
+
+def frontend_files() -> AssetFiles:
+    """The build output when there is one, else the sources as they are."""
+    return AssetFiles(directory=DIST_DIR if built() else SOURCE_DIR)
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.assets", description="Build the frontend assets.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="hash and precompress front/ into front/dist/")
+    p_build.add_argument("--source", default=SOURCE_DIR)
+    p_build.add_argument("-o", "--output", default=DIST_DIR)
+    args = parser.parse_args(argv)
+
+    manifest = build(args.source, args.output)
+    for rel, hashed in sorted(manifest.items()):
+        print(f"{rel} -> {hashed}", file=sys.stderr)
+    print(f"Built {len(manifest)} assets into {os.path.abspath(args.output)}"
+          f" (gzip{', brotli' if brotli is not None else ''})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
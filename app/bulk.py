@@ -0,0 +1,347 @@
+#bulk.py
+"""
+Bulk ingest and enrichment of WeatherRecord rows.
+
+Ingest streams CSV or NDJSON, validates each row with
+``schemas.WeatherRecordCreate``, geocodes the distinct locations of each
+chunk concurrently and inserts the chunk with multi-row INSERTs in a single
+transaction.  Enrichment fills the NULL weather columns of existing records,
+fetching each distinct coordinate once.
+
+CLI:
+
+    python -m app.bulk ingest records.csv [--format ndjson] [--enrich]
+    python -m app.bulk enrich
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from . import crud, schemas, services
+from .config import settings
+from .database import run_db
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+MAX_REPORTED_ERRORS = 100
+MAX_RECORD_LINES = 1000     # lines one quoted CSV field may span
+
+
+class BulkReport:
+    """Running counters for one bulk job; ``errors`` keeps the first few failures."""
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.inserted = 0
+        self.enriched = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def fail(self, line: Optional[int], detail: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "detail": detail})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "enriched": self.enriched,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+ProgressCallback = Callable[[BulkReport], None]
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+async def aiter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a stream of byte chunks (e.g. ``request.stream()``) into text lines."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+async def _aiter(lines: Iterable[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line.rstrip("\r\n")
+
+
+class _LineFeed:
+    """Iterator the CSV reader pulls lines from; filled by ``_csv_records`` as they arrive."""
+
+    def __init__(self) -> None:
+        self.lines: Deque[str] = deque()
+
+    def __iter__(self) -> "_LineFeed":
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def _csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, List[str]]]:
+    """
+    ``(first line number, fields)`` per CSV record, from one ``csv.reader``.
+
+    Lines are handed to the reader only once every quote they open is
+    closed, so a quoted field may span lines.  A quote left open for
+    ``MAX_RECORD_LINES`` lines is taken as literal and the lines are parsed
+    as they are.
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    pending: List[str] = []
+    quotes = 0
+
+    async for line in lines:
+        pending.append(line + "\n")
+        quotes += line.count('"')
+        if quotes % 2 and len(pending) < MAX_RECORD_LINES:
+            continue
+        feed.lines.extend(pending)
+        pending, quotes = [], 0
+        while feed.lines:
+            start = reader.line_num + 1
+            yield start, next(reader)
+    feed.lines.extend(pending)
+    while feed.lines:
+        start = reader.line_num + 1
+        yield start, next(reader)
+
+
+async def parse_rows(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[tuple]:
+    """Yield ``(line_number, dict | error message)`` for every non-empty data row."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    if fmt == "csv":
+        header: Optional[List[str]] = None
+        async for line_no, values in _csv_records(lines):
+            if not any(v.strip() for v in values):
+                continue
+            if header is None:
+                header = [h.strip().lower() for h in values]
+                continue
+            yield line_no, {k: v for k, v in zip(header, values) if v != ""}
+        return
+
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_no, f"Invalid JSON: {exc}"
+            continue
+        yield line_no, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+def _validate(row: Dict[str, Any]) -> schemas.WeatherRecordCreate:
+    return schemas.WeatherRecordCreate(**row)
+
+# ---------------------------------------------------------------------------
+# Ingest
+# ---------------------------------------------------------------------------
+
+async def _insert_chunk(chunk: List[tuple], report: BulkReport) -> None:
+    # Geocode each distinct location in the chunk once, concurrently.
+    to_geocode = sorted({rec.location for _, rec in chunk if rec.latitude is None or rec.longitude is None})
+    geocoded: Dict[str, Dict[str, Any]] = {}
+    if to_geocode:
+        results = await services.run_batch(to_geocode, services.validate_location, settings.batch_concurrency)
+        geocoded = dict(zip(to_geocode, results))
+
+    rows, attempted = [], []
+    for line_no, rec in chunk:
+        lat, lon = rec.latitude, rec.longitude
+        if lat is None or lon is None:
+            result = geocoded[rec.location]
+            if not result["ok"]:
+                report.fail(line_no, f"{rec.location}: {result['error']['detail']}")
+                continue
+            lat, lon = result["data"]["lat"], result["data"]["lon"]
+        rows.append({
+            "location": rec.location,
+            "record_date": rec.record_date,
+            "latitude": lat,
+            "longitude": lon,
+        })
+        attempted.append(line_no)
+    if not rows:
+        return
+
+    try:
+        report.inserted += await run_db(crud.bulk_create_weather_records, rows)
+    except Exception as exc:
+        logger.exception("Bulk insert chunk failed")
+        for line_no in attempted:
+            report.fail(line_no, f"Insert failed: {exc}")
+
+
+async def ingest(
+    lines: AsyncIterator[str],
+    fmt: str,
+    chunk_size: int = 1000,
+    on_progress: Optional[ProgressCallback] = None,
+) -> BulkReport:
+    """Validate, geocode and insert records from *lines*, one chunked transaction at a time."""
+    report = BulkReport()
+    chunk: List[tuple] = []
+
+    async for line_no, row in parse_rows(lines, fmt):
+        report.received += 1
+        if isinstance(row, str):
+            report.fail(line_no, row)
+            continue
+        try:
+            chunk.append((line_no, _validate(row)))
+        except ValidationError as exc:
+            report.fail(line_no, "; ".join(e["msg"] for e in exc.errors()))
+            continue
+        if len(chunk) >= chunk_size:
+            await _insert_chunk(chunk, report)
+            chunk = []
+            if on_progress:
+                on_progress(report)
+
+    if chunk:
+        await _insert_chunk(chunk, report)
+    if on_progress:
+        on_progress(report)
+    return report
+
+# ---------------------------------------------------------------------------
+# Enrichment
+# ---------------------------------------------------------------------------
+
+def _weather_update(data: Dict[str, Any]) -> schemas.WeatherRecordUpdate:
+    return schemas.WeatherRecordUpdate(
+        temperature=data["main"]["temp"],
+        humidity=data["main"]["humidity"],
+        wind_speed=data["wind"]["speed"],
+        conditions=data["weather"][0]["main"],
+    )
+
+
+async def enrich_missing(
+    chunk_size: int = 500,
+    limit: Optional[int] = None,
+    report: Optional[BulkReport] = None,
+    on_progress: Optional[ProgressCallback] = None,
+) -> BulkReport:
+    """Fill NULL weather columns for records that have coordinates, *chunk_size* at a time."""
+    report = report or BulkReport()
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+    last_id = 0
+    done = 0
+
+    async def fetch(coords: tuple):
+        async with semaphore:
+            try:
+                return await services.fetch_current(*coords)
+            except Exception as exc:
+                return exc
+
+    while limit is None or done < limit:
+        n = chunk_size if limit is None else min(chunk_size, limit - done)
+        records = [
+            (r.id, r.latitude, r.longitude)
+            for r in await run_db(crud.get_records_missing_weather, last_id, n)
+        ]
+        if not records:
+            break
+        last_id = records[-1][0]
+        done += len(records)
+
+        coords = sorted({(lat, lon) for _, lat, lon in records})
+        payloads = dict(zip(coords, await asyncio.gather(*(fetch(c) for c in coords))))
+
+        updates = {}
+        for record_id, lat, lon in records:
+            data = payloads[(lat, lon)]
+            if isinstance(data, Exception):
+                detail = data.detail if hasattr(data, "detail") else str(data)
+                report.fail(None, f"record {record_id}: {detail}")
+            else:
+                updates[record_id] = _weather_update(data)
+        report.enriched += await run_db(crud.bulk_update_weather_records, updates)
+        if on_progress:
+            on_progress(report)
+    return report
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def _print_progress(report: BulkReport) -> None:
+    print(
+        f"\rreceived={report.received} inserted={report.inserted} "
+        f"enriched={report.enriched} failed={report.failed}",
+        end="", file=sys.stderr, flush=True,
+    )
+
+
+async def _main(args: argparse.Namespace) -> BulkReport:
+    from .openweather import close_client
+
+    try:
+        if args.command == "ingest":
+            fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+            with open(args.path, encoding="utf-8", newline="") as fh:
+                report = await ingest(_aiter(fh), fmt, args.chunk_size, _print_progress)
+            if args.enrich:
+                await enrich_missing(report=report, on_progress=_print_progress)
+            return report
+        return await enrich_missing(args.chunk_size, args.limit, on_progress=_print_progress)
+    finally:
+        await close_client()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.bulk", description="Bulk load and enrich weather records.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="insert records from a CSV or NDJSON file")
+    p_ingest.add_argument("path")
+    p_ingest.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    p_ingest.add_argument("--chunk-size", type=int, default=1000)
+    p_ingest.add_argument("--enrich", action="store_true", help="fill weather columns afterwards")
+
+    p_enrich = sub.add_parser("enrich", help="fill NULL weather columns of existing records")
+    p_enrich.add_argument("--chunk-size", type=int, default=500)
+    p_enrich.add_argument("--limit", type=int)
+
+    args = parser.parse_args(argv)
+
+    from . import migrations
+    from .database import get_engine
+    migrations.ensure_schema(get_engine(), migrate=True)
+
+    report = asyncio.run(_main(args))
+    print(file=sys.stderr)
+    print(json.dumps(report.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
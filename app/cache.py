@@ -0,0 +1,469 @@
+#cache.py
+"""
+Response cache for upstream weather payloads.
+
+Entries are stored with the wall-clock time they were fetched; freshness is
+decided on read so several processes sharing one SQLite file agree on it.
+The SQLite backend also hands out short leases, so of several workers
+missing the same key only one calls upstream and the rest read its result.
+Its calls block (on disk, or on another worker's write lock), so the caches
+run them in the threadpool (``run_backend``) rather than on the event loop.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+Entry = Tuple[Any, float]  # (value, stored_at)
+
+
+class MemoryBackend:
+    """
+    In-process LRU store; fastest option for a single worker.
+
+    With ``maxbytes`` the store is also bounded by the summed ``sizeof`` of
+    its values, for entries as large as map grids.
+    """
+
+    blocking = False
+
+    def __init__(
+        self, maxsize: int = 10_000, maxbytes: int = 0, sizeof: Optional[Callable[[Any], int]] = None
+    ) -> None:
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self._data: "OrderedDict[str, Entry]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.nbytes = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Entry]:
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key: str, value: Any, stored_at: float) -> None:
+        self._data[key] = (value, stored_at)
+        self._data.move_to_end(key)
+        if self.maxbytes:
+            size = self.sizeof(value)
+            self.nbytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+        # The newest entry stays even if it alone is over maxbytes.
+        while len(self._data) > self.maxsize or (self.nbytes > self.maxbytes > 0 and len(self._data) > 1):
+            self.delete(next(iter(self._data)))
+            self.evictions += 1
+
+    def stored_times(self, keys: Iterable[str]) -> Dict[str, float]:
+        """When each cached key of *keys* was stored; no LRU bump."""
+        data = self._data
+        return {key: data[key][1] for key in keys if key in data}
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+        self.nbytes -= self._sizes.pop(key, 0)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """
+    Store backed by a local SQLite file in WAL mode.
+
+    Every uvicorn worker on the host can open the same file, so a payload
+    fetched by one worker is served by all of them.  Decoded values are
+    memoised per ``stored_at``; a read of an unchanged entry only fetches its
+    timestamp, not the JSON.
+
+    A locked database is waited on for at most ``busy_timeout_ms``; after
+    that a read counts as a miss, a write is skipped and a lease is not
+    taken, since the cache is only an optimisation.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_age: float = 24 * 3600, decoded_size: int = 1024,
+                 busy_timeout_ms: int = 200) -> None:
+        self.path = path
+        self.max_age = max_age
+        self.decoded_size = decoded_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.evictions = 0
+        self.busy = 0
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._decoded: "OrderedDict[str, Entry]" = OrderedDict()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use (always under self._lock), so importing the app
+        # is cheap and a pre-fork import never shares a connection.
+        if self._connection is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_leases ("
+                " key TEXT PRIMARY KEY, owner INTEGER NOT NULL, expires REAL NOT NULL)"
+            )
+            self._connection = conn
+        return self._connection
+
+    def _busy(self, what: str, key: str, exc: sqlite3.OperationalError) -> None:
+        self.busy += 1
+        logger.warning(f"Response cache {what} of {key} skipped: {exc}")
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            memo = self._decoded.get(key)
+            try:
+                row = self._conn.execute(
+                    "SELECT stored_at, CASE WHEN stored_at = ? THEN NULL ELSE value END"
+                    " FROM response_cache WHERE key = ?",
+                    (memo[1] if memo else None, key),
+                ).fetchone()
+            except sqlite3.OperationalError as exc:
+                self._busy("read", key, exc)
+                return None
+            if row is None:
+                return None
+            if row[1] is None:
+                self._decoded.move_to_end(key)
+                return memo
+        entry = json.loads(row[1]), row[0]
+        with self._lock:
+            self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: Entry) -> None:
+        self._decoded[key] = entry
+        self._decoded.move_to_end(key)
+        while len(self._decoded) > self.decoded_size:
+            self._decoded.popitem(last=False)
+
+    def set(self, key: str, value: Any, stored_at: float) -> None:
+        payload = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO response_cache (key, value, stored_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, stored_at = excluded.stored_at",
+                    (key, payload, stored_at),
+                )
+                self._writes += 1
+                if self._writes % 500 == 0:
+                    cur = self._conn.execute(
+                        "DELETE FROM response_cache WHERE stored_at < ?", (time.time() - self.max_age,)
+                    )
+                    self.evictions += cur.rowcount
+            except sqlite3.OperationalError as exc:
+                self._busy("write", key, exc)
+                return
+            self._remember(key, (value, stored_at))
+
+    def stored_times(self, keys: Iterable[str]) -> Dict[str, float]:
+        """When each cached key of *keys* was stored, in one indexed query per 500 keys.
+
+        A chunk that cannot be read is left out, as if its keys were not cached.
+        """
+        keys = list(keys)
+        times: Dict[str, float] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                try:
+                    times.update(self._conn.execute(
+                        f"SELECT key, stored_at FROM response_cache WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ))
+                except sqlite3.OperationalError as exc:
+                    # The keys left out look uncached, which callers already handle.
+                    self._busy("timestamp read", f"{len(chunk)} keys", exc)
+        return times
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self._decoded.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._decoded.clear()
+
+    def claim(self, key: str, ttl: float) -> bool:
+        """Take the fetch lease on *key* for ``ttl`` seconds; False while another process holds it."""
+        now = time.time()
+        with self._lock:
+            try:
+                cur = self._conn.execute(
+                    "INSERT INTO response_leases (key, owner, expires) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                    "WHERE response_leases.expires < ? OR response_leases.owner = excluded.owner",
+                    (key, os.getpid(), now + ttl, now),
+                )
+            except sqlite3.OperationalError as exc:
+                self._busy("lease", key, exc)
+                return False
+            return cur.rowcount == 1
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM response_leases WHERE key = ? AND owner = ?",
+                                   (key, os.getpid()))
+            except sqlite3.OperationalError as exc:
+                self._busy("lease release", key, exc)  # the lease expires on its own
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+async def run_backend(backend, method: str, *args: Any) -> Any:
+    """``backend.method(*args)``, in the threadpool for backends that block."""
+    fn = getattr(backend, method)
+    if backend.blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+def release_soon(backend, key: str) -> None:
+    """Release *backend*'s lease on *key* without awaiting, so it also runs from a cancelled scope."""
+    if backend.blocking:
+        asyncio.get_running_loop().run_in_executor(None, backend.release, key)
+    else:
+        backend.release(key)
+
+
+async def await_lease(backend, key: str, wait: float) -> Tuple[bool, Optional[Entry]]:
+    """
+    Claim *backend*'s cross-process lease on *key*, or wait for the process holding it.
+
+    Returns ``(True, None)`` when the caller should fetch (and later
+    ``release``), ``(False, entry)`` when another process stored *entry*
+    meanwhile, and ``(False, None)`` when ``wait`` seconds ran out and the
+    caller fetches regardless.  Polls with exponential backoff, from 20 ms
+    up to 0.5 s between checks.
+    """
+    started = time.time()
+    deadline = time.monotonic() + wait
+    delay = 0.02
+    while not await run_backend(backend, "claim", key, wait):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False, None
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
+        entry = await run_backend(backend, "get", key)
+        if entry is not None and entry[1] >= started:
+            return False, entry
+    return True, None
+
+
+class ResponseCache:
+    """
+    TTL cache with stale-while-revalidate.
+
+    ``get_or_fetch`` returns fresh entries directly.  Entries older than
+    ``ttl`` but within ``ttl + grace`` are returned immediately while one
+    background task refreshes them.  Anything older is fetched inline, with
+    concurrent misses for the same key sharing one fetch.
+
+    If the fetch fails and the key has an entry younger than
+    ``ttl + stale_if_error``, that entry is served instead of the error.
+
+    An optional ``parse`` callable turns the stored payload into a richer
+    object; its result is memoised per stored payload, so each fetch is
+    parsed at most once per process whichever backend holds it.
+
+    When the backend is shared between processes (it has ``claim``), a fetch
+    first takes the backend's lease on the key.  A worker that finds the
+    lease taken waits up to ``shared_wait`` seconds for the holder's result
+    instead of calling upstream itself.
+    """
+
+    def __init__(self, backend, parsed_size: int = 1024, stale_if_error: float = 0, shared_wait: float = 0) -> None:
+        self.backend = backend
+        self.stale_if_error = stale_if_error
+        self.shared_wait = shared_wait if hasattr(backend, "claim") else 0
+        self.parsed_size = parsed_size
+        self._parsed: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.prefetches = 0
+        self.stale_errors = 0
+        self.peer_fills = 0
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        ttl: float,
+        grace: float,
+        fetch: Callable[[], Awaitable[Any]],
+        parse: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        entry = await run_backend(self.backend, "get", key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                self.hits += 1
+                return self._decode(key, value, stored_at, parse)
+            if age < ttl + grace:
+                self.stale_hits += 1
+                self._refresh_in_background(key, fetch, parse)
+                return self._decode(key, value, stored_at, parse)
+
+        try:
+            if key in self._inflight:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+            # shield() so a cancelled caller (client gone) leaves the fetch running for the others
+            return await asyncio.shield(self._start_fetch(key, fetch, parse))
+        except Exception as exc:
+            if entry is None or time.time() - entry[1] >= ttl + self.stale_if_error:
+                raise
+            self.stale_errors += 1
+            logger.warning(f"Serving stale {key} after fetch error: {exc}")
+            return self._decode(key, entry[0], entry[1], parse)
+
+    def _decode(self, key: str, value: Any, stored_at: float, parse: Optional[Callable[[Any], Any]]) -> Any:
+        if parse is None:
+            return value
+        memo = self._parsed.get(key)
+        if memo is not None and memo[0] == stored_at:
+            self._parsed.move_to_end(key)
+            return memo[1]
+        parsed = parse(value)
+        self._parsed[key] = (stored_at, parsed)
+        self._parsed.move_to_end(key)
+        while len(self._parsed) > self.parsed_size:
+            self._parsed.popitem(last=False)
+        return parsed
+
+    def _start_fetch(
+        self, key: str, fetch: Callable[[], Awaitable[Any]], parse: Optional[Callable[[Any], Any]] = None
+    ) -> asyncio.Task:
+        """The running fetch of *key*, started as a task of its own so no single caller owns it."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.get_running_loop().create_task(self._fetch(key, fetch, parse))
+            task.add_done_callback(functools.partial(self._fetched, key))
+        return task
+
+    def _fetched(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved: every caller may have gone
+
+    async def _fetch(
+        self, key: str, fetch: Callable[[], Awaitable[Any]], parse: Optional[Callable[[Any], Any]] = None
+    ) -> Any:
+        leased = False
+        try:
+            peer = None
+            if self.shared_wait:
+                leased, peer = await await_lease(self.backend, key, self.shared_wait)
+            if peer is not None:
+                self.peer_fills += 1
+                value, stored_at = peer
+            else:
+                value = await fetch()
+                stored_at = time.time()
+                await run_backend(self.backend, "set", key, value, stored_at)
+            return self._decode(key, value, stored_at, parse)
+        finally:
+            if leased:
+                release_soon(self.backend, key)
+
+    def _refresh_in_background(
+        self, key: str, fetch: Callable[[], Awaitable[Any]], parse: Optional[Callable[[Any], Any]] = None
+    ) -> None:
+        if key in self._inflight:
+            return
+        task = asyncio.get_running_loop().create_task(self._refresh(key, fetch, parse))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _refresh(
+        self, key: str, fetch: Callable[[], Awaitable[Any]], parse: Optional[Callable[[Any], Any]] = None
+    ) -> None:
+        self.refreshes += 1
+        try:
+            await asyncio.shield(self._start_fetch(key, fetch, parse))
+        except Exception as exc:
+            self.refresh_errors += 1
+            logger.warning(f"Background refresh failed for {key}: {exc}")
+
+    async def stored_times(self, keys: Iterable[str]) -> Dict[str, float]:
+        """When each cached key of *keys* was last stored; uncached keys are left out."""
+        return await run_backend(self.backend, "stored_times", keys)
+
+    async def prefetch(
+        self, key: str, fetch: Callable[[], Awaitable[Any]], parse: Optional[Callable[[Any], Any]] = None
+    ) -> None:
+        """Fetch *key* ahead of expiry; joins nobody and is skipped if a fetch is already running."""
+        if key in self._inflight:
+            return
+        self.prefetches += 1
+        await asyncio.shield(self._start_fetch(key, fetch, parse))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "size": len(self.backend),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "prefetches": self.prefetches,
+            "stale_errors": self.stale_errors,
+            "peer_fills": self.peer_fills,
+            "evictions": self.backend.evictions,
+            "bytes": getattr(self.backend, "nbytes", 0),
+            "busy": getattr(self.backend, "busy", 0),
+        }
+
+
+def build_backend(kind: str, path: str, maxsize: int):
+    """Return the storage backend named by ``settings.response_cache_backend``."""
+    if kind == "memory":
+        return MemoryBackend(maxsize)
+    if kind == "sqlite":
+        return SQLiteBackend(path)
+    raise ValueError(f"Unknown response cache backend: {kind!r}")
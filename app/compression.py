@@ -0,0 +1,146 @@
+#compression.py
+"""
+Response compression middleware (brotli when available, else gzip).
+
+Bodies smaller than ``minimum_size`` are sent as-is, as are responses that
+are already encoded, partial (206), or of an already-compressed / streaming
+event media type.  The start of the body is held back until ``minimum_size``
+bytes have arrived or the body has ended, because middleware such as
+``BaseHTTPMiddleware`` may split even a tiny body into several messages.
+After that, streaming responses are compressed chunk by chunk with a sync
+flush, so each chunk reaches the client immediately.  Brotli needs the
+optional ``brotli`` package.
+"""
+import zlib
+from typing import List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+SKIP_TYPES = ("image/", "audio/", "video/", "font/woff", "application/zip", "application/gzip",
+              "text/event-stream")
+
+
+def _accepts(header: str, coding: str) -> bool:
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+class _Encoder:
+    def __init__(self, coding: str, level: int) -> None:
+        self.coding = coding
+        if coding == "br":
+            self._br = brotli.Compressor(quality=level)
+        else:
+            self._gz = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes, final: bool) -> bytes:
+        if self.coding == "br":
+            out = self._br.process(data)
+            return out + (self._br.finish() if final else self._br.flush())
+        out = self._gz.compress(data)
+        return out + self._gz.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        if brotli is not None and _accepts(accept, "br"):
+            coding, level = "br", self.brotli_quality
+        elif _accepts(accept, "gzip"):
+            coding, level = "gzip", self.gzip_level
+        else:
+            await self.app(scope, receive, send)
+            return
+        await _Responder(self.app, self.minimum_size, coding, level)(scope, receive, send)
+
+
+class _Responder:
+    def __init__(self, app: ASGIApp, minimum_size: int, coding: str, level: int) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.coding = coding
+        self.level = level
+        self.send: Optional[Send] = None
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.encoder: Optional[_Encoder] = None
+        self.buffered: List[bytes] = []
+        self.buffered_size = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        self.head = scope["method"] == "HEAD"
+        await self.app(scope, receive, self.on_send)
+
+    async def on_send(self, message: Message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "").lower()
+            length = headers.get("content-length")
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 206, 304)
+                or media_type.startswith(SKIP_TYPES)
+                or (length is not None and length.isdigit() and int(length) < self.minimum_size)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message  # held until the first body chunk decides
+            return
+        if kind != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.start is not None:
+            self.buffered.append(body)
+            self.buffered_size += len(body)
+            if more and self.buffered_size < self.minimum_size:
+                return  # not enough to decide yet
+            body, self.buffered = b"".join(self.buffered), []
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if not more and len(body) < self.minimum_size:
+                self.passthrough = True
+                if "content-length" not in headers and not self.head:
+                    headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            self.encoder = _Encoder(self.coding, self.level)
+            headers["Content-Encoding"] = self.coding
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag  # the encoded bytes differ from the identity ones
+            body = self.encoder.chunk(body, final=not more)
+            if not more:
+                headers["Content-Length"] = str(len(body))
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more})
+            return
+        await self.send({"type": "http.response.body", "body": self.encoder.chunk(body, final=not more),
+                         "more_body": more})
@@ -1,9 +1,117 @@
 #config.py
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     openweather_api_key: str
     database_url: str = "sqlite:///./sql_app.db"
+
+    # Server processes (gunicorn.conf.py, app/workers.py)
+    web_concurrency: int = 1                     # workers on this host; the upstream quota is split between them
+
+    # Database engine (app/database.py)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800                  # server databases only
+    db_echo: bool = False
+    db_async: bool = False                       # needs aiosqlite / asyncpg
+    db_migrate_on_startup: bool = True           # else `python -m app.migrations` must run first
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+
+    # Upstream OpenWeather client (app/openweather.py)
+    openweather_base_url: str = "https://api.openweathermap.org"
+    upstream_timeout: float = 10.0
+    upstream_connect_timeout: float = 3.0
+    upstream_max_connections: int = 100
+    upstream_max_keepalive: int = 100
+    upstream_retries: int = 2                    # extra attempts on timeouts, 429 and 5xx
+    upstream_rate_per_minute: float = 60         # OpenWeather plan quota (free tier: 60/min)
+    upstream_rate_burst: Optional[float] = None  # defaults to 10 s worth of quota
+    upstream_max_queue_wait: float = 2.0         # refuse (503) rather than queue longer
+    upstream_breaker_failures: int = 5           # consecutive failures that open a breaker
+    upstream_breaker_reset: float = 30.0         # seconds before a half-open probe
+    stale_if_error: float = 6 * 3600             # serve cached payloads this far past TTL when upstream fails
+
+    # Geocoding cache (services.validate_location)
+    geocode_cache_ttl: float = 7 * 24 * 3600     # seconds a resolved place stays cached
+    geocode_negative_ttl: float = 15 * 60        # seconds a "Location not found" stays cached
+    geocode_cache_size: int = 4096               # max entries before LRU eviction
+
+    # Weather response cache (app/cache.py)
+    response_cache_backend: str = "memory"       # "memory" or "sqlite"
+    response_cache_path: str = "./weather_cache.db"
+    response_cache_size: int = 10_000            # memory backend only
+    shared_fetch_wait: float = 10                # sqlite backend: wait this long for another worker's fetch
+    spatial_precision: int = 6                   # geohash length of a cache cell (~1.2 x 0.6 km)
+    current_ttl: float = 10 * 60
+    current_grace: float = 5 * 60                # serve stale while refreshing
+    forecast_ttl: float = 60 * 60
+    forecast_grace: float = 30 * 60
+
+    # Response compression (app/compression.py); brotli needs `pip install brotli`
+    compression_min_size: int = 500              # bytes; smaller bodies are sent uncompressed
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    # Batch endpoints (POST /weather/current/batch, /weather/forecast/batch)
+    batch_concurrency: int = 20                  # upstream lookups in flight per batch
+
+    # Background prefetch of hot / stored locations (app/prefetch.py)
+    prefetch_enabled: bool = True
+    prefetch_interval: float = 30                # seconds between scans
+    prefetch_top_n: int = 100                    # most-requested cells kept warm
+    prefetch_lead: float = 120                   # refresh this many seconds before TTL expiry
+    prefetch_jitter: float = 0.1                 # extra spread, as a fraction of the TTL
+    prefetch_rate_per_minute: float = 30         # upstream calls the prefetcher may spend
+    prefetch_records: bool = True                # also keep WeatherRecord locations warm
+    prefetch_records_interval: float = 600       # seconds between reloads of record locations
+    prefetch_half_life: float = 3600             # popularity decay
+    prefetch_lock_path: str = "./weather_prefetch.lock"  # one worker per host runs the prefetcher
+
+    # Map grids (app/maps.py: /location/map, /map/tiles, /map/grid)
+    map_anchors: int = 3                         # upstream points per side of a grid (3 -> 9 reads)
+    map_max_size: int = 256                      # cells per side
+    map_cache_size: int = 512                    # grids kept in memory
+    map_cache_bytes: int = 64 * 1024 * 1024      # and their memory (a 256x256 grid takes ~2 MB)
+
+    # Live subscriptions (app/live.py: GET /weather/live, /weather/live/ws)
+    live_refresh_interval: float = 60            # seconds between reads of each watched cell
+    live_max_locations: int = 10                 # per connection
+    live_heartbeat: float = 15                   # idle seconds before a keep-alive is sent
+    live_stall_timeout: float = 120              # drop connections that stop taking updates
+
+    # Observation history (app/observations.py)
+    observations_enabled: bool = True            # record every upstream reading
+    observation_flush_interval: float = 5        # seconds between batched writes
+    observation_max_pending: int = 50_000        # readings buffered before the oldest are dropped
+    observation_raw_retention_days: int = 30     # raw readings; rollups are kept longer
+    observation_hourly_retention_days: int = 400
+    observation_prune_interval: float = 3600
+
+    # Background jobs for POST /weather/?mode=async (app/jobs.py)
+    job_workers: int = 4                         # per process; 0 leaves the queue to other processes
+    job_poll_interval: float = 1                 # seconds between checks for due jobs
+    job_max_attempts: int = 5
+    job_backoff_base: float = 2                  # seconds before the first retry, doubled per attempt
+    job_backoff_max: float = 300
+    job_lease: float = 60                        # a running job is retried after this long without finishing
+    job_retention_days: int = 7                  # finished jobs kept for GET /jobs/{id}
+
+    # Local place index for /location/suggest (app/places.py)
+    place_index_path: str = "./places.idx"       # built with `python -m app.places build`
+    place_index_learn: bool = True               # remember places returned by upstream
+
+    # Logging and metrics (app/logs.py, app/metrics.py)
+    log_level: str = "INFO"
+    log_file: str = "app.log"                    # empty to log to stdout only
+    log_queue_size: int = 10_000                 # records beyond this are dropped, never blocked on
+    log_sample_rate: float = 0.1                 # fraction of per-request access lines kept
+    log_slow_request_ms: float = 1000            # slower requests are always logged
     
     class Config:
         env_file = ".env"
@@ -1,4 +1,9 @@
 # crud.py
+import base64
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, insert, or_, tuple_, update
 from sqlalchemy.orm import Session
 from . import models, schemas
 
@@ -27,9 +32,80 @@ def update_weather_record(db: Session, record_id: int, updates: schemas.WeatherR
         db.refresh(db_record)
     return db_record
 
-# Add to crud.py
-def get_weather_records(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.WeatherRecord).offset(skip).limit(limit).all()
+def get_record_coordinates(db: Session) -> List[tuple]:
+    """Distinct (latitude, longitude) pairs of stored records."""
+    return db.query(models.WeatherRecord.latitude, models.WeatherRecord.longitude).filter(
+        models.WeatherRecord.latitude.isnot(None), models.WeatherRecord.longitude.isnot(None)
+    ).distinct().all()
+
+def encode_cursor(record: models.WeatherRecord) -> str:
+    """Opaque keyset cursor pointing just after *record* in (record_date, id) order."""
+    day = record.record_date.isoformat() if record.record_date is not None else ""
+    raw = f"{day}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[date], int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, record_id = raw.split("|")
+        return (date.fromisoformat(day) if day else None), int(record_id)
+    except Exception as exc:
+        raise ValueError("Invalid cursor") from exc
+
+def filter_weather_records(
+    query,
+    location: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+):
+    """Apply the GET /weather/ filters to an ORM query or a ``select()``."""
+    WR = models.WeatherRecord
+    if location is not None:
+        query = query.filter(WR.location == location)
+    if date_from is not None:
+        query = query.filter(WR.record_date >= date_from)
+    if date_to is not None:
+        query = query.filter(WR.record_date <= date_to)
+    if bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        query = query.filter(WR.latitude.between(min_lat, max_lat), WR.longitude.between(min_lon, max_lon))
+    return query
+
+def get_weather_records(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    location: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+):
+    """
+    Records ordered by (record_date, id), optionally filtered.
+
+    Pass the ``cursor`` of the previous page's last row instead of ``skip``:
+    the seek uses the (record_date, id) indexes, so deep pages cost the same as
+    the first.  Records without a date come first, ordered by id.  ``bbox`` is
+    (min_lat, min_lon, max_lat, max_lon).
+    """
+    WR = models.WeatherRecord
+    query = filter_weather_records(db.query(WR), location, date_from, date_to, bbox)
+    if cursor is not None:
+        after_date, after_id = decode_cursor(cursor)
+        if after_date is None:
+            # Rest of the undated records, then every dated one.
+            query = query.filter(or_(and_(WR.record_date.is_(None), WR.id > after_id), WR.record_date.isnot(None)))
+        else:
+            # Row-value comparison so the database can seek the composite index;
+            # it is never true for undated records, which sort before this one.
+            query = query.filter(tuple_(WR.record_date, WR.id) > tuple_(after_date, after_id))
+    query = query.order_by(WR.record_date.nulls_first(), WR.id)
+    if cursor is None and skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def delete_weather_record(db: Session, record_id: int):
     db_record = db.query(models.WeatherRecord).filter(models.WeatherRecord.id == record_id).first()
@@ -41,3 +117,39 @@ def delete_weather_record(db: Session, record_id: int):
 
 def get_weather_record(db: Session, record_id: int):
     return db.query(models.WeatherRecord).filter(models.WeatherRecord.id == record_id).first()
+
+def bulk_create_weather_records(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """Insert many records in one transaction using multi-row INSERT statements."""
+    if not rows:
+        return 0
+    db.execute(insert(models.WeatherRecord), rows)
+    db.commit()
+    return len(rows)
+
+def get_records_missing_weather(db: Session, after_id: int = 0, limit: int = 500):
+    """Records with coordinates but no weather yet, in id order starting after *after_id*."""
+    return (
+        db.query(models.WeatherRecord)
+        .filter(
+            models.WeatherRecord.id > after_id,
+            models.WeatherRecord.temperature.is_(None),
+            models.WeatherRecord.latitude.is_not(None),
+            models.WeatherRecord.longitude.is_not(None),
+        )
+        .order_by(models.WeatherRecord.id)
+        .limit(limit)
+        .all()
+    )
+
+def bulk_update_weather_records(db: Session, updates: Dict[int, schemas.WeatherRecordUpdate]) -> int:
+    """Apply many WeatherRecordUpdate objects (same semantics as update_weather_record) in one transaction."""
+    rows = [
+        dict(update_.model_dump(exclude_unset=True), id=record_id)
+        for record_id, update_ in updates.items()
+    ]
+    rows = [r for r in rows if len(r) > 1]
+    if not rows:
+        return 0
+    db.execute(update(models.WeatherRecord), rows)
+    db.commit()
+    return len(rows)
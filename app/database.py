@@ -1,13 +1,136 @@
 # database.py
-from sqlalchemy import create_engine
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+from . import metrics
+from .config import settings
+
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+T = TypeVar("T")
+
+# Drivers used for the optional async path (DB_ASYNC=true)
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _engine_kwargs(url) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"echo": settings.db_echo}
+    if url.get_backend_name() == "sqlite":
+        # Sessions are handed between threadpool workers.
+        kwargs["connect_args"] = {"check_same_thread": False}
+        if _is_memory_sqlite(url):
+            return kwargs
+    else:
+        kwargs["pool_pre_ping"] = True
+        kwargs["pool_recycle"] = settings.db_pool_recycle
+    kwargs["pool_size"] = settings.db_pool_size
+    kwargs["max_overflow"] = settings.db_max_overflow
+    kwargs["pool_timeout"] = settings.db_pool_timeout
+    return kwargs
+
+
+def _tune_sqlite(engine: Engine) -> None:
+    """Apply the concurrency PRAGMAs to every new SQLite connection."""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        # WAL lets readers proceed while one writer commits; NORMAL sync is
+        # durable across application crashes and much cheaper than FULL.
+        cur.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cur.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        # Wait for the write lock instead of failing with "database is locked".
+        cur.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cur.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA foreign_keys=ON")
+        cur.close()
+
+
+def build_engine(database_url: str = SQLALCHEMY_DATABASE_URL) -> Engine:
+    url = make_url(database_url)
+    engine = create_engine(url, **_engine_kwargs(url))
+    if url.get_backend_name() == "sqlite" and not _is_memory_sqlite(url):
+        _tune_sqlite(engine)
+    metrics.instrument_engine(engine)
+    return engine
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+_engine: Optional[Engine] = None
+# Bound to the engine by get_engine(); open sessions with SessionLocal(bind=get_engine()).
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+
+def get_engine() -> Engine:
+    """The process-wide engine, built on first use (normally during app startup)."""
+    global _engine
+    if _engine is None:
+        _engine = build_engine()
+        SessionLocal.configure(bind=_engine)
+    return _engine
 
 Base = declarative_base()
+
+# ---------------------------------------------------------------------------
+# Optional async path
+# ---------------------------------------------------------------------------
+
+_async_sessionmaker = None
+
+
+def get_async_sessionmaker():
+    """Build the async engine on first use; needs aiosqlite / asyncpg installed."""
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = make_url(SQLALCHEMY_DATABASE_URL)
+        backend = url.get_backend_name()
+        if backend not in _ASYNC_DRIVERS:
+            raise RuntimeError(f"No async driver configured for {backend}")
+        url = url.set(drivername=_ASYNC_DRIVERS[backend])
+        kwargs = _engine_kwargs(url)
+        kwargs.pop("connect_args", None)
+        async_engine = create_async_engine(url, **kwargs)
+        if backend == "sqlite" and not _is_memory_sqlite(url):
+            _tune_sqlite(async_engine.sync_engine)
+        metrics.instrument_engine(async_engine.sync_engine)
+        _async_sessionmaker = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run ``fn(session, *args, **kwargs)`` without blocking the event loop.
+
+    ``fn`` is any ordinary sync function taking a ``Session`` (e.g. the ones in
+    crud.py).  With ``DB_ASYNC=true`` it runs on an ``AsyncSession`` through
+    ``run_sync``; otherwise it runs on a ``SessionLocal`` in the threadpool.
+    """
+    start = time.perf_counter()
+    try:
+        if settings.db_async:
+            async with get_async_sessionmaker()() as session:
+                return await session.run_sync(fn, *args, **kwargs)
+
+        def call() -> T:
+            with SessionLocal(bind=get_engine()) as db:
+                return fn(db, *args, **kwargs)
+
+        return await run_in_threadpool(call)
+    finally:
+        metrics.db_sessions.observe(time.perf_counter() - start, getattr(fn, "__name__", "call"))
@@ -0,0 +1,229 @@
+#export.py
+"""
+Export weather records as CSV, JSON / NDJSON or a compact columnar binary.
+
+Bulk exports read through a server-side cursor in fixed-size batches and
+encode each batch as it arrives, so memory use does not grow with the
+number of rows.
+
+Columnar format (``application/vnd.weatherapp.columnar``), little-endian::
+
+    file   := b"WXCOL1\\n" schema_len:u32 schema:json block* b"\\0\\0\\0\\0"
+    block  := nrows:u32 column*                  (one block per batch)
+    column := validity:u8[nrows] values
+    values := int64[nrows]                       "int"
+            | float64[nrows]                     "float"
+            | int32[nrows]   days since 1970     "date"
+            | int64[nrows]   µs since 1970 UTC   "timestamp"
+            | offsets:u32[nrows + 1] utf8 bytes  "string"
+
+Null values have validity 0 and a zero placeholder.
+"""
+import csv
+import io
+import json
+import struct
+import sys
+from array import array
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from . import crud, models
+from .database import SessionLocal, get_engine
+
+WR = models.WeatherRecord
+
+COLUMNS: List[Tuple[str, str]] = [
+    ("id", "int"),
+    ("location", "string"),
+    ("record_date", "date"),
+    ("latitude", "float"),
+    ("longitude", "float"),
+    ("temperature", "float"),
+    ("humidity", "float"),
+    ("wind_speed", "float"),
+    ("conditions", "string"),
+    ("created_at", "timestamp"),
+    ("updated_at", "timestamp"),
+]
+FIELDS = [name for name, _ in COLUMNS]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "columnar": "application/vnd.weatherapp.columnar",
+}
+EXTENSIONS = {"csv": "csv", "json": "json", "ndjson": "ndjson", "columnar": "wxcol"}
+
+COLUMNAR_MAGIC = b"WXCOL1\n"
+_EPOCH_DAY = date(1970, 1, 1).toordinal()
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = datetime.resolution  # timedelta(microseconds=1)
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+# ---------------------------------------------------------------------------
+# Encoders (one batch of rows -> bytes)
+# ---------------------------------------------------------------------------
+
+def _csv_header() -> bytes:
+    return (",".join(FIELDS) + "\r\n").encode()
+
+
+def _csv_rows(rows: Sequence[Sequence[Any]]) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerows([[("" if v is None else _jsonable(v)) for v in row] for row in rows])
+    return buf.getvalue().encode()
+
+
+def _ndjson_rows(rows: Sequence[Sequence[Any]]) -> bytes:
+    return "".join(
+        json.dumps({k: _jsonable(v) for k, v in zip(FIELDS, row)}, separators=(",", ":")) + "\n"
+        for row in rows
+    ).encode()
+
+
+def _columnar_header() -> bytes:
+    schema = json.dumps([{"name": n, "type": t} for n, t in COLUMNS]).encode()
+    return COLUMNAR_MAGIC + struct.pack("<I", len(schema)) + schema
+
+
+def _le(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _columnar_rows(rows: Sequence[Sequence[Any]]) -> bytes:
+    n = len(rows)
+    parts = [struct.pack("<I", n)]
+    for i, (_, kind) in enumerate(COLUMNS):
+        col = [row[i] for row in rows]
+        parts.append(bytes(0 if v is None else 1 for v in col))
+        if kind == "string":
+            encoded = [b"" if v is None else str(v).encode() for v in col]
+            offsets = array("I", [0])
+            for e in encoded:
+                offsets.append(offsets[-1] + len(e))
+            parts.append(_le(offsets))
+            parts.append(b"".join(encoded))
+        elif kind == "int":
+            parts.append(_le(array("q", (0 if v is None else v for v in col))))
+        elif kind == "float":
+            parts.append(_le(array("d", (0.0 if v is None else v for v in col))))
+        elif kind == "date":
+            parts.append(_le(array("i", (0 if v is None else v.toordinal() - _EPOCH_DAY for v in col))))
+        else:  # timestamp; naive values from the DB are UTC
+            parts.append(_le(array("q", (
+                0 if v is None else (
+                    (v if v.tzinfo else v.replace(tzinfo=timezone.utc)) - _EPOCH
+                ) // _MICROSECOND
+                for v in col
+            ))))
+    return b"".join(parts)
+
+
+_HEADERS = {"csv": _csv_header, "columnar": _columnar_header}
+_FOOTERS = {"columnar": lambda: struct.pack("<I", 0)}
+_ENCODERS = {"csv": _csv_rows, "ndjson": _ndjson_rows, "columnar": _columnar_rows}
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def record_row(record: models.WeatherRecord) -> Tuple[Any, ...]:
+    return tuple(getattr(record, name) for name in FIELDS)
+
+
+def export_record(record: models.WeatherRecord, fmt: str) -> bytes:
+    """Encode one record; ``json`` is a single object, the rest match bulk export."""
+    if fmt not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    row = record_row(record)
+    if fmt == "json":
+        return json.dumps({k: _jsonable(v) for k, v in zip(FIELDS, row)}).encode()
+    return b"".join(_encode_all(fmt, [[row]]))
+
+
+def _encode_all(fmt: str, batches: Iterable[Sequence[Sequence[Any]]]) -> Iterator[bytes]:
+    if fmt in _HEADERS:
+        yield _HEADERS[fmt]()
+    encode = _ENCODERS[fmt]
+    for rows in batches:
+        yield encode(rows)
+    if fmt in _FOOTERS:
+        yield _FOOTERS[fmt]()
+
+
+def stream_records(
+    fmt: str,
+    batch_size: int = 1000,
+    location: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+) -> Iterator[bytes]:
+    """
+    Yield the encoded export of every matching record in (record_date, id) order.
+
+    Rows are read as plain tuples through a server-side cursor
+    (``yield_per``), never as a full list of ORM objects.  ``json`` is
+    streamed as NDJSON.
+    """
+    if fmt == "json":
+        fmt = "ndjson"
+    if fmt not in _ENCODERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    stmt = select(*(getattr(WR, name) for name in FIELDS))
+    stmt = crud.filter_weather_records(stmt, location, date_from, date_to, bbox)
+    stmt = stmt.order_by(WR.record_date, WR.id).execution_options(yield_per=batch_size)
+
+    with SessionLocal(bind=get_engine()) as db:
+        result = db.execute(stmt)
+        yield from _encode_all(fmt, (list(map(tuple, part)) for part in result.partitions()))
+
+
+def read_columnar(data: bytes) -> Dict[str, List[Any]]:
+    """Decode a columnar export back into ``{column: [values]}`` (for tooling and checks)."""
+    if not data.startswith(COLUMNAR_MAGIC):
+        raise ValueError("Not a columnar export")
+    pos = len(COLUMNAR_MAGIC)
+    (schema_len,) = struct.unpack_from("<I", data, pos)
+    pos += 4
+    schema = json.loads(data[pos:pos + schema_len])
+    pos += schema_len
+    out: Dict[str, List[Any]] = {c["name"]: [] for c in schema}
+    widths = {"int": ("q", 8), "float": ("d", 8), "date": ("i", 4), "timestamp": ("q", 8)}
+
+    while True:
+        (n,) = struct.unpack_from("<I", data, pos)
+        pos += 4
+        if n == 0:
+            return out
+        for col in schema:
+            valid = data[pos:pos + n]
+            pos += n
+            if col["type"] == "string":
+                offsets = struct.unpack_from(f"<{n + 1}I", data, pos)
+                pos += 4 * (n + 1)
+                blob = data[pos:pos + offsets[-1]]
+                pos += offsets[-1]
+                values = [blob[offsets[i]:offsets[i + 1]].decode() for i in range(n)]
+            else:
+                code, width = widths[col["type"]]
+                values = list(struct.unpack_from(f"<{n}{code}", data, pos))
+                pos += width * n
+                if col["type"] == "date":
+                    values = [date.fromordinal(v + _EPOCH_DAY) for v in values]
+                elif col["type"] == "timestamp":
+                    values = [_EPOCH + v * _MICROSECOND for v in values]
+            out[col["name"]].extend(v if ok else None for v, ok in zip(values, valid))
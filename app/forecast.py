@@ -0,0 +1,159 @@
+#forecast.py
+"""Parsed 3-hour forecast held as typed per-slot arrays."""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional
+
+
+def c_to_f(c: float) -> float:
+    """Convert °C to °F (rounded to one decimal)."""
+    return round(c * 9 / 5 + 32, 1)
+
+
+class ForecastSeries:
+    """
+    One upstream ``/data/2.5/forecast`` payload, parsed once.
+
+    Slots are stored column-wise (epoch seconds, °C, humidity, wind m/s,
+    condition) and sorted by time.  ``days`` holds each slot's server-local
+    date ordinal so per-day views are a contiguous slice.
+    """
+
+    __slots__ = ("timestamps", "temps", "humidity", "wind", "conditions", "days", "_iso", "_encoded")
+
+    def __init__(self, timestamps: array, temps: array, humidity: array, wind: array,
+                 conditions: List[str]) -> None:
+        self.timestamps = timestamps
+        self.temps = temps
+        self.humidity = humidity
+        self.wind = wind
+        self.conditions = conditions
+        self.days = array("i", (datetime.fromtimestamp(t).toordinal() for t in timestamps))
+        self._iso: Optional[List[str]] = None
+        self._encoded: Dict[str, bytes] = {}  # serialised bodies, filled by app.responses
+
+    @classmethod
+    def from_payload(cls, data: Dict[str, Any]) -> "ForecastSeries":
+        slots = sorted(data.get("list", []), key=lambda s: s["dt"])
+        return cls(
+            array("q", (s["dt"] for s in slots)),
+            array("d", (s["main"]["temp"] for s in slots)),
+            array("d", (s["main"]["humidity"] for s in slots)),
+            array("d", (s["wind"]["speed"] for s in slots)),
+            [s["weather"][0]["main"] for s in slots],
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def iso_timestamps(self) -> List[str]:
+        """Local-time ISO strings, built on first use and reused afterwards."""
+        if self._iso is None:
+            self._iso = [
+                datetime.fromtimestamp(t, tz=timezone.utc).astimezone().isoformat()
+                for t in self.timestamps
+            ]
+        return self._iso
+
+    def slots(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Slots ``[start, stop)`` in the original per-slot dict format."""
+        iso = self.iso_timestamps()
+        stop = len(self) if stop is None else stop
+        return [
+            {
+                "timestamp": iso[i],
+                "temperature_c": self.temps[i],
+                "temperature_f": c_to_f(self.temps[i]),
+                "humidity": self.humidity[i],
+                "wind_speed_ms": self.wind[i],
+                "conditions": self.conditions[i],
+            }
+            for i in range(start, stop)
+        ]
+
+    def columnar(self) -> Dict[str, Any]:
+        """
+        All slots as parallel arrays: epoch-second timestamps, °C, humidity,
+        wind m/s, and conditions dictionary-encoded as ``values`` + ``codes``.
+        """
+        values: Dict[str, int] = {}
+        codes = [values.setdefault(c, len(values)) for c in self.conditions]
+        return {
+            "format": "columnar",
+            "timestamps": self.timestamps.tolist(),
+            "temperature_c": self.temps.tolist(),
+            "humidity": self.humidity.tolist(),
+            "wind_speed_ms": self.wind.tolist(),
+            "conditions": {"values": list(values), "codes": codes},
+        }
+
+    def day_range(self, day: date) -> "tuple[int, int]":
+        """Index range of the slots that fall on *day* (server-local)."""
+        ordinal = day.toordinal()
+        return bisect_left(self.days, ordinal), bisect_right(self.days, ordinal)
+
+    def day(self, day: date) -> Optional[Dict[str, Any]]:
+        """Slots for *day* plus min / max temps, or None if the day has no slots."""
+        start, stop = self.day_range(day)
+        if start == stop:
+            return None
+        min_c = max_c = self.temps[start]
+        for t in self.temps[start + 1:stop]:
+            if t < min_c:
+                min_c = t
+            elif t > max_c:
+                max_c = t
+        return {
+            "date": day.isoformat(),
+            "min_c": min_c,
+            "min_f": c_to_f(min_c),
+            "max_c": max_c,
+            "max_f": c_to_f(max_c),
+            "slots": self.slots(start, stop),
+        }
+
+    def daily(self) -> List[Dict[str, Any]]:
+        """Per-day rollups (min / max / mean temp, mean humidity, max wind) in one pass."""
+        out: List[Dict[str, Any]] = []
+        n = len(self)
+        i = 0
+        while i < n:
+            ordinal = self.days[i]
+            min_c = max_c = self.temps[i]
+            sum_c = sum_h = 0.0
+            max_wind = self.wind[i]
+            conditions: Counter = Counter()
+            j = i
+            while j < n and self.days[j] == ordinal:
+                t = self.temps[j]
+                if t < min_c:
+                    min_c = t
+                elif t > max_c:
+                    max_c = t
+                sum_c += t
+                sum_h += self.humidity[j]
+                if self.wind[j] > max_wind:
+                    max_wind = self.wind[j]
+                conditions[self.conditions[j]] += 1
+                j += 1
+            count = j - i
+            mean_c = round(sum_c / count, 1)
+            out.append(
+                {
+                    "date": date.fromordinal(ordinal).isoformat(),
+                    "min_c": min_c,
+                    "min_f": c_to_f(min_c),
+                    "max_c": max_c,
+                    "max_f": c_to_f(max_c),
+                    "mean_c": mean_c,
+                    "mean_f": c_to_f(mean_c),
+                    "mean_humidity": round(sum_h / count, 1),
+                    "max_wind_speed_ms": max_wind,
+                    "conditions": conditions.most_common(1)[0][0],
+                    "slots": count,
+                }
+            )
+            i = j
+        return out
@@ -0,0 +1,97 @@
+#httpcache.py
+"""HTTP validators (ETag / Last-Modified) and 304 handling for JSON responses."""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .responses import dumps
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match.
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def _not_modified_since(header: str, last_modified: float) -> bool:
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= since
+
+
+def conditional_json(
+    request: Request,
+    payload: Any,
+    last_modified: Optional[float] = None,
+    cache_control: str = "no-cache",
+) -> Response:
+    """
+    Serialise *payload* and answer 304 when the client's validators still match.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``.
+    """
+    body = dumps(jsonable_encoder(payload))
+    headers = validator_headers(etag_for(body), last_modified, cache_control)
+    if is_not_modified(request, headers["ETag"], last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float] = None) -> bool:
+    """``If-None-Match`` takes precedence over ``If-Modified-Since``."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        return _not_modified_since(if_modified_since, last_modified)
+    return False
+
+
+def validator_headers(etag: str, last_modified: Optional[float] = None, cache_control: str = "no-cache") -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+# ---------------------------------------------------------------------------
+# Stored records
+# ---------------------------------------------------------------------------
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # SQLite CURRENT_TIMESTAMP is UTC
+    return value.timestamp()
+
+
+def record_validators(records: Iterable[Any], *extra: Any) -> Tuple[str, Optional[float]]:
+    """
+    ETag and Last-Modified of stored records, computed from their columns
+    without serialising them.  Last-Modified is the newest ``updated_at``
+    (``created_at`` for rows never updated); the ETag also covers every
+    column, because those timestamps only have second resolution.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    last_modified = None
+    for record in records:
+        columns = tuple(getattr(record, c.key) for c in record.__table__.columns)
+        digest.update(repr(columns).encode())
+        changed = _timestamp(record.updated_at or record.created_at)
+        if changed is not None and (last_modified is None or changed > last_modified):
+            last_modified = changed
+    digest.update(repr(extra).encode())
+    return f'W/"{digest.hexdigest()}"', last_modified
@@ -0,0 +1,349 @@
+#jobs.py
+"""
+Durable background jobs for stored records.
+
+``POST /weather/?mode=async`` inserts the record without coordinates and,
+in the same transaction, a ``locate_record`` job for its location, then
+answers 202.  The queue is the ``jobs`` table and nothing is held only in
+memory, so a crash or restart loses no queued work.
+
+A job geocodes its location, reads the current weather there and fills
+coordinates and weather on all of its records in one transaction.  Records
+created for the same (normalised) location while a job is open (pending or
+running) join it instead of queueing another: a partial unique index on
+open jobs turns the enqueue into an atomic upsert, and the finishing
+transaction reads the record list again, so late joiners are included.
+
+Every process runs ``job_workers`` workers.  A worker claims a due job with
+a conditional UPDATE that sets a lease and a claim token (``FOR UPDATE
+SKIP LOCKED`` on Postgres), so workers in other processes never run the
+same job at once, and the job of a worker
+that died is claimed again once its lease expires.  Upstream failures are
+retried with exponential backoff (at least the upstream ``Retry-After``)
+up to ``job_max_attempts``; an unknown location fails at once.
+"""
+import asyncio
+import json
+import logging
+import math
+import random
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from . import services
+from .bulk import _weather_update
+from .config import settings
+from .database import run_db
+from .models import Job, WeatherRecord
+
+logger = logging.getLogger(__name__)
+
+LOCATE_RECORD = "locate_record"
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+PERMANENT_STATUS = (400, 404, 422)  # retrying cannot help
+
+# Same predicate as the ux_jobs_open_key index, so SQLite can use it as the conflict target.
+_OPEN = text("status IN ('pending', 'running')")
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+def _join_statement(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(Job)
+    return stmt.on_conflict_do_update(
+        index_elements=[Job.kind, Job.key],
+        index_where=_OPEN,
+        set_={"record_ids": Job.record_ids + "," + stmt.excluded.record_ids},
+    )
+
+
+def create_record(db: Session, record: WeatherRecord, kind: str = LOCATE_RECORD) -> Tuple[int, int]:
+    """Insert *record* and queue its job (or join an open one) atomically; returns (record id, job id)."""
+    db.add(record)
+    db.flush()
+    record_id = record.id
+    key = services.normalize_location(record.location)
+    values = dict(kind=kind, key=key, status=PENDING, record_ids=str(record.id), attempts=0, run_after=time.time())
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        db.execute(_join_statement(dialect).values(**values))
+    else:
+        job = db.scalars(select(Job).where(Job.kind == kind, Job.key == key, _OPEN)).first()
+        if job is None:
+            db.add(Job(**values))
+        else:
+            job.record_ids += "," + values["record_ids"]
+        db.flush()
+    job_id = db.scalar(select(Job.id).where(Job.kind == kind, Job.key == key, _OPEN))
+    db.commit()
+    return record_id, job_id
+
+
+def claim(db: Session, lease: float, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Take the oldest due job, or one whose lease expired; None when there is none."""
+    now = time.time() if now is None else now
+    due = or_(and_(Job.status == PENDING, Job.run_after <= now),
+              and_(Job.status == RUNNING, Job.lease_expires < now))
+    oldest = select(Job.id).where(due).order_by(Job.run_after).limit(1)
+    if db.scalar(oldest) is None:
+        return None  # idle polls stay read-only
+    db.commit()
+    owner = secrets.token_hex(8)
+    # One statement, so SQLite takes the write lock up front and concurrent claims queue on it.
+    # Postgres skips rows another claim has locked, and under READ COMMITTED re-checks only
+    # the outer WHERE after waiting on a lock, so ``due`` is repeated there.
+    row = db.execute(
+        update(Job).where(Job.id == oldest.with_for_update(skip_locked=True).scalar_subquery(), due)
+        .values(status=RUNNING, owner=owner, lease_expires=now + lease, attempts=Job.attempts + 1)
+        .returning(Job.id, Job.kind, Job.key, Job.attempts)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.commit()
+    if row is None:
+        return None
+    return {"id": row.id, "owner": owner, "kind": row.kind, "key": row.key, "attempts": row.attempts}
+
+
+def finish(db: Session, job: Dict[str, Any], status: str, values: Optional[Dict[str, Any]] = None,
+           result: Any = None, error: Optional[str] = None) -> bool:
+    """
+    Close a claimed job and apply *values* to its records in one transaction.
+    False when the claim was lost (lease expired and another worker took it).
+    """
+    mine = db.execute(
+        update(Job).where(Job.id == job["id"], Job.owner == job["owner"], Job.status == RUNNING)
+        .values(status=status, finished_at=time.time(), lease_expires=None,
+                result=None if result is None else json.dumps(result), error=error)
+    ).rowcount
+    if not mine:
+        db.rollback()
+        return False
+    if values:
+        # Read after the job row is written: records that joined while it ran are included.
+        ids = [int(i) for i in db.scalar(select(Job.record_ids).where(Job.id == job["id"])).split(",")]
+        db.execute(update(WeatherRecord).where(WeatherRecord.id.in_(ids)).values(**values))
+    db.commit()
+    return True
+
+
+def reschedule(db: Session, job: Dict[str, Any], delay: float, error: Optional[str] = None,
+               count_attempt: bool = True) -> bool:
+    """Put a claimed job back in the queue, due in *delay* seconds."""
+    attempts = Job.attempts if count_attempt else Job.attempts - 1
+    mine = db.execute(
+        update(Job).where(Job.id == job["id"], Job.owner == job["owner"], Job.status == RUNNING)
+        .values(status=PENDING, run_after=time.time() + delay, owner=None, lease_expires=None,
+                attempts=attempts, error=error)
+    ).rowcount
+    db.commit()
+    return bool(mine)
+
+
+def get_status(db: Session, job_id: int) -> Optional[Dict[str, Any]]:
+    job = db.get(Job, job_id)
+    if job is None:
+        return None
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "location": job.key,
+        "status": job.status,
+        "attempts": job.attempts,
+        "record_ids": [int(i) for i in job.record_ids.split(",")],
+        "next_attempt_at": datetime.fromtimestamp(job.run_after, timezone.utc) if job.status == PENDING else None,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+def prune(db: Session, retention_days: float, now: Optional[float] = None) -> int:
+    """Delete finished jobs older than *retention_days*."""
+    cutoff = (time.time() if now is None else now) - retention_days * 86400
+    deleted = db.execute(
+        delete(Job).where(Job.status.in_((DONE, FAILED)), Job.finished_at < cutoff)
+    ).rowcount
+    db.commit()
+    return deleted
+
+# ---------------------------------------------------------------------------
+# Handlers
+# ---------------------------------------------------------------------------
+
+async def locate_record(key: str, found: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Coordinates and current weather for *key*: (record column values, job result)."""
+    coords = await services.validate_location(key)
+    found.update(latitude=coords["lat"], longitude=coords["lon"])
+    weather = _weather_update(await services.fetch_current(coords["lat"], coords["lon"])).model_dump()
+    return {**found, **weather}, {"lat": coords["lat"], "lon": coords["lon"], **weather}
+
+
+HANDLERS = {LOCATE_RECORD: locate_record}
+
+# ---------------------------------------------------------------------------
+# Worker pool
+# ---------------------------------------------------------------------------
+
+def _retry_after(exc: BaseException) -> float:
+    headers = getattr(exc, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+class JobQueue:
+    """Enqueue from requests; ``start()`` / ``stop()`` the workers from the app lifespan."""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        poll_interval: float = 1,
+        max_attempts: int = 5,
+        backoff_base: float = 2,
+        backoff_max: float = 300,
+        lease: float = 60,
+        retention_days: float = 7,
+        prune_interval: float = 3600,
+    ) -> None:
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._pruned_at = -math.inf
+        self.enqueued = 0
+        self.claimed = 0
+        self.done = 0
+        self.retried = 0
+        self.failed = 0
+        self.lost = 0
+        self.errors = 0
+
+    async def enqueue(self, record: WeatherRecord) -> Tuple[int, int]:
+        """Store *record* with its job; returns (record id, job id)."""
+        ids = await run_db(create_record, record)
+        self.enqueued += 1
+        self._wake.set()
+        return ids
+
+    def backoff(self, attempts: int, retry_after: float = 0) -> float:
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+        # Spread retries of jobs that failed together.
+        return max(delay * random.uniform(0.5, 1.0), retry_after)
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> None:
+        if self.workers > 0 and not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._work(n)) for n in range(self.workers)]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _work(self, n: int) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                job = await run_db(claim, self.lease)
+            except Exception:
+                self.errors += 1
+                logger.exception("Could not claim a job")
+                job = None
+            if job is not None:
+                await self._run(job)
+                continue
+            if n == 0 and time.monotonic() - self._pruned_at >= self.prune_interval:
+                self._pruned_at = time.monotonic()
+                try:
+                    deleted = await run_db(prune, self.retention_days)
+                    if deleted:
+                        logger.info(f"Pruned {deleted} finished jobs")
+                except Exception:
+                    logger.exception("Job pruning failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        self.claimed += 1
+        found: Dict[str, Any] = {}
+        try:
+            try:
+                values, result = await HANDLERS[job["kind"]](job["key"], found)
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back now rather than after the lease.
+                await run_db(reschedule, job, 0, count_attempt=False)
+                raise
+            except Exception as exc:
+                await self._failed(job, exc, found)
+                return
+            if await run_db(finish, job, DONE, values, result):
+                self.done += 1
+            else:
+                self.lost += 1
+                logger.warning(f"Job {job['id']} finished after its lease was taken over")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Left running: it is claimed again when the lease expires.
+            self.errors += 1
+            logger.exception(f"Could not record the outcome of job {job['id']}")
+
+    async def _failed(self, job: Dict[str, Any], exc: Exception, found: Dict[str, Any]) -> None:
+        status = getattr(exc, "status_code", None)
+        detail = str(getattr(exc, "detail", exc))
+        if status in PERMANENT_STATUS or job["attempts"] >= self.max_attempts:
+            # Keep coordinates when only the weather read failed; /weather/enrich can fill the rest.
+            await run_db(finish, job, FAILED, found or None, error=detail)
+            self.failed += 1
+            logger.warning(f"Job {job['id']} ({job['key']}) failed after {job['attempts']} attempts: {detail}")
+            return
+        delay = self.backoff(job["attempts"], _retry_after(exc))
+        await run_db(reschedule, job, delay, detail)
+        self.retried += 1
+        logger.info(f"Job {job['id']} ({job['key']}) attempt {job['attempts']} failed, retrying in {delay:.1f}s: {detail}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": sum(1 for t in self._tasks if not t.done()),
+            "enqueued": self.enqueued,
+            "claimed": self.claimed,
+            "done": self.done,
+            "retried": self.retried,
+            "failed": self.failed,
+            "lost": self.lost,
+            "errors": self.errors,
+        }
+
+
+queue = JobQueue(
+    workers=settings.job_workers,
+    poll_interval=settings.job_poll_interval,
+    max_attempts=settings.job_max_attempts,
+    backoff_base=settings.job_backoff_base,
+    backoff_max=settings.job_backoff_max,
+    lease=settings.job_lease,
+    retention_days=settings.job_retention_days,
+)
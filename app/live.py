@@ -0,0 +1,321 @@
+#live.py
+"""
+Live current-weather subscriptions (``GET /weather/live`` as server-sent
+events, ``/weather/live/ws`` as a WebSocket).
+
+Subscribers are grouped into one ``Topic`` per cache cell.  Each topic runs
+a single refresh loop that reads the cell through the response cache every
+``live_refresh_interval`` seconds and pushes an update only when the
+reading changed, so upstream calls follow the number of distinct cells
+being watched, not the number of viewers.
+
+A slow client never holds up the others: every connection has a mailbox
+keeping only the latest unsent update per location, so an update that
+arrives before the previous one was sent replaces it ("conflated").  A
+connection that has not taken its updates for ``live_stall_timeout``
+seconds is dropped.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from . import services, spatial
+from .config import settings
+from .responses import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def _reading(data: Dict[str, Any]) -> Tuple:
+    """The fields a viewer sees; an upstream payload with equal fields is not pushed."""
+    main, wind = data.get("main", {}), data.get("wind", {})
+    conditions = (data.get("weather") or [{}])[0].get("main")
+    return main.get("temp"), main.get("feels_like"), main.get("humidity"), wind.get("speed"), conditions
+
+
+class Subscription:
+    """One client connection: its locations and a mailbox of pending updates."""
+
+    def __init__(self, max_locations: int) -> None:
+        self.max_locations = max_locations
+        self.topics: Dict[str, "Topic"] = {}          # label -> topic
+        self._pending: Dict[str, Dict[str, Any]] = {}  # label -> latest unsent update
+        self._wake = asyncio.Event()
+        self._closed = asyncio.Event()
+        self.drained_at = time.monotonic()
+        self.closed = False
+        self.sent = 0
+        self.conflated = 0
+
+    def offer(self, label: str, message: Dict[str, Any]) -> None:
+        if label in self._pending:
+            self.conflated += 1
+        self._pending[label] = message
+        self._wake.set()
+
+    async def next(self, timeout: float) -> List[Dict[str, Any]]:
+        """Pending updates, waiting up to ``timeout`` seconds; empty on timeout or once closed."""
+        if not self._pending and not self.closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self.drained_at = time.monotonic()
+        self._wake.clear()
+        messages = list(self._pending.values())
+        self._pending.clear()
+        self.sent += len(messages)
+        return messages
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake.set()
+        self._closed.set()
+
+    async def wait_closed(self) -> None:
+        await self._closed.wait()
+
+
+class Topic:
+    """Refresh loop for one cell, fanning each change out to its subscribers."""
+
+    def __init__(self, hub: "Hub", geohash: str) -> None:
+        self.hub = hub
+        self.geohash = geohash
+        self.lat, self.lon = spatial.centre(geohash)
+        self.subscribers: Dict[Tuple[Subscription, str], Tuple[float, float]] = {}
+        self.data: Optional[Dict[str, Any]] = None
+        self._reading: Optional[Tuple] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, sub: Subscription, label: str, lat: float, lon: float) -> None:
+        self.subscribers[(sub, label)] = (lat, lon)
+        if self.data is not None:
+            sub.offer(label, self._message(label, lat, lon))
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def discard(self, sub: Subscription, label: str) -> bool:
+        """Remove one subscriber; True when the topic has none left."""
+        self.subscribers.pop((sub, label), None)
+        return not self.subscribers
+
+    def _message(self, label: str, lat: float, lon: float) -> Dict[str, Any]:
+        message = services.current_from_payload(self.data, lat, lon, label)
+        message["observed_at"] = self.data.get("dt")
+        return message
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                data = await services.fetch_current(self.lat, self.lon)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.hub.errors += 1
+                logger.warning(f"Live refresh of {self.geohash} failed: {getattr(exc, 'detail', exc)}")
+            else:
+                self.hub.refreshes += 1
+                reading = _reading(data)
+                if reading != self._reading:
+                    self.data, self._reading = data, reading
+                    self.hub.published += 1
+                    stalled = time.monotonic() - self.hub.stall_timeout
+                    for (sub, label), (lat, lon) in list(self.subscribers.items()):
+                        if sub.drained_at < stalled:
+                            self.hub.drop(sub)
+                        else:
+                            sub.offer(label, self._message(label, lat, lon))
+            await asyncio.sleep(self.hub.refresh_interval)
+
+    def stop(self) -> Optional[asyncio.Task]:
+        # Not awaited: unsubscribing runs in cancelled request scopes too.
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+        return task
+
+
+class Hub:
+    """All topics of this process; ``stop()`` from the app lifespan."""
+
+    def __init__(self, refresh_interval: float = 60, max_locations: int = 10, stall_timeout: float = 120) -> None:
+        self.refresh_interval = refresh_interval
+        self.max_locations = max_locations
+        self.stall_timeout = stall_timeout
+        self.topics: Dict[str, Topic] = {}
+        self.connections = 0
+        self.refreshes = 0
+        self.published = 0
+        self.errors = 0
+        self.dropped = 0
+
+    def connect(self) -> Subscription:
+        self.connections += 1
+        return Subscription(self.max_locations)
+
+    async def subscribe(self, sub: Subscription, label: str) -> None:
+        """Resolve *label* and attach it to its cell's topic (404 / 400 on bad input)."""
+        if label in sub.topics:
+            return
+        if len(sub.topics) >= sub.max_locations:
+            raise HTTPException(400, f"At most {sub.max_locations} locations per connection")
+        coords = await services.validate_location(label)
+        if sub.closed:
+            return
+        lat, lon = coords["lat"], coords["lon"]
+        geohash = spatial.snap(lat, lon, settings.spatial_precision).geohash
+        topic = self.topics.get(geohash)
+        if topic is None:
+            topic = self.topics[geohash] = Topic(self, geohash)
+        sub.topics[label] = topic
+        topic.add(sub, label, lat, lon)
+
+    def unsubscribe(self, sub: Subscription, label: str) -> None:
+        topic = sub.topics.pop(label, None)
+        if topic is not None and topic.discard(sub, label):
+            del self.topics[topic.geohash]
+            topic.stop()
+
+    def disconnect(self, sub: Subscription) -> None:
+        """Remove every subscription of *sub*; safe to call more than once."""
+        if sub.closed and not sub.topics:
+            return
+        for label in list(sub.topics):
+            self.unsubscribe(sub, label)
+        sub.close()
+        self.connections -= 1
+
+    def drop(self, sub: Subscription) -> None:
+        """Disconnect a client that stopped taking its updates."""
+        self.dropped += 1
+        logger.info(f"Dropping stalled live connection ({len(sub.topics)} locations)")
+        self.disconnect(sub)
+
+    async def stop(self) -> None:
+        topics, self.topics = list(self.topics.values()), {}
+        tasks = [task for task in (topic.stop() for topic in topics) if task is not None]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connections": self.connections,
+            "topics": len(self.topics),
+            "subscribers": sum(len(t.subscribers) for t in self.topics.values()),
+            "refreshes": self.refreshes,
+            "published": self.published,
+            "errors": self.errors,
+            "dropped": self.dropped,
+        }
+
+
+hub = Hub(settings.live_refresh_interval, settings.live_max_locations, settings.live_stall_timeout)
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+
+async def sse_stream(sub: Subscription):
+    """Server-sent events for an already subscribed connection; a comment line keeps it open."""
+    try:
+        while not sub.closed:
+            messages = await sub.next(settings.live_heartbeat)
+            if sub.closed:
+                break
+            if not messages:
+                yield b": ping\n\n"
+                continue
+            yield b"".join(b"event: weather\ndata: " + dumps(m) + b"\n\n" for m in messages)
+    finally:
+        hub.disconnect(sub)
+
+
+class EventStream(StreamingResponse):
+    """
+    ``sse_stream`` as a response that ends once the subscription is closed.
+
+    A stalled client stops reading, so the pending write never returns and
+    the generator never gets to see ``sub.closed``; the write is cancelled
+    instead and the connection closed, which makes the EventSource reconnect.
+    """
+
+    def __init__(self, sub: Subscription, headers: Optional[Dict[str, str]] = None) -> None:
+        super().__init__(sse_stream(sub), media_type="text/event-stream", headers=headers)
+        self.sub = sub
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stream = asyncio.ensure_future(super().__call__(scope, receive, send))
+        closed = asyncio.ensure_future(self.sub.wait_closed())
+        try:
+            await asyncio.wait((stream, closed), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            closed.cancel()
+            if not stream.done():
+                stream.cancel()
+        try:
+            await stream
+        except asyncio.CancelledError:
+            if not self.sub.closed:
+                raise
+
+
+async def serve_websocket(websocket: WebSocket) -> None:
+    """
+    WebSocket protocol: the client sends ``{"subscribe": [...]}`` or
+    ``{"unsubscribe": [...]}``; the server sends ``{"type": "weather", ...}``
+    updates, ``{"type": "error", "location", "detail"}`` for rejected
+    locations and ``{"type": "ping"}`` when idle.
+    """
+    await websocket.accept()
+    sub = hub.connect()
+
+    def error(label: Optional[str], detail: str) -> None:
+        sub.offer(f"error:{label}", {"type": "error", "location": label, "detail": detail})
+
+    async def receive() -> None:
+        while True:
+            try:
+                request = json.loads(await websocket.receive_text())
+                unsubscribe, subscribe = list(request.get("unsubscribe", [])), list(request.get("subscribe", []))
+            except (ValueError, TypeError, AttributeError):
+                error(None, 'Expected {"subscribe": [...]} or {"unsubscribe": [...]}')
+                continue
+            for label in unsubscribe:
+                hub.unsubscribe(sub, str(label))
+            for label in subscribe:
+                try:
+                    await hub.subscribe(sub, str(label))
+                except HTTPException as exc:
+                    error(str(label), exc.detail)
+
+    async def send() -> None:
+        while not sub.closed:
+            messages = await sub.next(settings.live_heartbeat)
+            if sub.closed:
+                break
+            for message in messages or [{"type": "ping"}]:
+                if "type" not in message:
+                    message = {"type": "weather", **message}
+                await websocket.send_text(dumps(message).decode())
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            exc = task.exception()
+            if exc is not None and not isinstance(exc, WebSocketDisconnect):
+                logger.warning(f"Live WebSocket closed: {exc!r}")
+        if sub.closed:
+            await websocket.close(code=1008, reason="Too slow")
+    finally:
+        # Before any await: in a cancelled scope every later await raises again.
+        hub.disconnect(sub)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,93 @@
+#logs.py
+"""
+Non-blocking logging setup.
+
+Application code only puts records on an in-memory queue; a
+``QueueListener`` thread does the formatting and the file / console writes,
+so a slow disk never stalls the event loop.  Per-request access lines are
+sampled (``LOG_SAMPLE_RATE``); warnings, errors and slow requests are always
+kept.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+from typing import Optional
+
+from .config import settings
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a ``rate`` fraction of INFO-and-below records marked ``sampled=True``.
+
+    Records logged with ``extra={"sampled": True}`` are the high-volume ones
+    (one per request); everything else passes untouched.
+    """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or record.levelno > logging.INFO:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
+
+
+def configure_logging() -> None:
+    """Route the root logger through a bounded queue; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(FORMAT)
+    handlers = [logging.StreamHandler()]
+    if settings.log_file:
+        handlers.append(logging.FileHandler(settings.log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Drop rather than block when the writer thread cannot keep up.
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=settings.log_queue_size)
+    queue_handler = _DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.log_sample_rate))
+
+    root = logging.getLogger()
+    root.setLevel(settings.log_level.upper())
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    # httpx logs one INFO line per upstream call; latency is in /metrics instead.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    return _DroppingQueueHandler.dropped
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
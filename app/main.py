@@ -1,67 +1,129 @@
 #main.py
+import time
+_import_started = time.perf_counter()
+
 import logging
-from fastapi import FastAPI, Depends, HTTPException, Query, Request  
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, HTTPException, Path as PathParam, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine
-from app import models, schemas, crud, services
-from typing import List, Optional
-from app.services import get_weather_by_location, get_forecast_by_location
+from app.database import get_engine, run_db
+from app import models, schemas, crud, services, openweather, bulk, migrations, export, metrics, logs, httpcache
+from app import prefetch, spatial, responses, observations, places, workers, live, assets, jobs
+from app.compression import CompressionMiddleware
+from datetime import date
+from typing import Dict, List, Optional
+from app.services import get_forecast_by_location
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 import os
-import requests
 from .config import settings
-from fastapi.responses import FileResponse
-import time
-from urllib.parse import quote
-import requests
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
 BASE_DIR = Path(__file__).resolve().parent.parent      # WeatherApp/
 
-app = FastAPI()
-
-# Log startup event
-logger.info("Starting Weather API Server")
-logger.info(f"OpenWeather API Key valid: {'your_openweather_api_key' not in settings.openweather_api_key}")
+async def _record_cells():
+    rows = await run_db(crud.get_record_coordinates)
+    return {spatial.encode(lat, lon, settings.spatial_precision) for lat, lon in rows}
+
+
+prefetcher = prefetch.Prefetcher(
+    refresh=services.prefetch_cell,
+    stored_times=services.cached_times,
+    ttl=services.upstream_ttl,
+    record_cells=_record_cells if settings.prefetch_records else None,
+    interval=settings.prefetch_interval,
+    top_n=settings.prefetch_top_n,
+    lead=settings.prefetch_lead,
+    jitter=settings.prefetch_jitter,
+    rate_per_minute=workers.prefetch_budget(),
+    records_interval=settings.prefetch_records_interval,
+    leader=workers.prefetch_leader.held if settings.web_concurrency > 1 else None,
+)
 
-FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "..", "front")
+# Milliseconds per startup phase; "import" is app.main itself (see /debug-cache)
+startup_profile: Dict[str, float] = {}
+
+
+@contextmanager
+def _phase(name: str):
+    start = time.perf_counter()
+    yield
+    startup_profile[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resources are built here rather than at import, so importing the app
+    # (or forking workers from a preloaded one) opens no files or sockets.
+    with _phase("logging"):
+        # Queued; file and console writes happen off the event loop
+        logs.configure_logging()
+    with _phase("database"):
+        migrations.ensure_schema(get_engine(), migrate=settings.db_migrate_on_startup)
+        # Opens the pooled connection and a threadpool worker before the first request needs them.
+        await run_db(crud.get_weather_records, limit=1)
+    with _phase("http_client"):
+        openweather.get_client()
+    with _phase("place_index"):
+        places.get_index()
+    if settings.web_concurrency > 1 and settings.response_cache_backend != "sqlite":
+        logger.warning(f"{settings.web_concurrency} workers with a per-process response cache: "
+                       "set RESPONSE_CACHE_BACKEND=sqlite to share it")
+    if settings.prefetch_enabled:
+        prefetcher.start()
+    observations.recorder.start()
+    jobs.queue.start()
+    logger.info(f"Starting Weather API Server (pid {os.getpid()})")
+    logger.info(f"OpenWeather API Key valid: {'your_openweather_api_key' not in settings.openweather_api_key}")
+    logger.info("Startup (ms): " + ", ".join(f"{k}={v}" for k, v in startup_profile.items()))
+    yield
+    await prefetcher.stop()
+    workers.prefetch_leader.release()
+    await live.hub.stop()
+    await jobs.queue.stop()
+    await observations.recorder.stop()
+    await openweather.close_client()
+
+app = FastAPI(lifespan=lifespan, default_response_class=responses.FastJSONResponse)
+
+FRONTEND_DIR = assets.SOURCE_DIR
 app.mount("/front", StaticFiles(directory=FRONTEND_DIR), name="front")
+# Output of `python -m app.assets build`: hashed, precompressed, cached for a year.
+app.mount("/assets", assets.AssetFiles(directory=assets.DIST_DIR, check_dir=False), name="assets")
+frontend_files = assets.frontend_files()
 
-# Middleware to log requests
+# Middleware to time and log requests
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    logger.info(f"Request: {request.method} {request.url}")
-    logger.debug(f"Headers: {request.headers}")
-    
+    start_time = time.perf_counter()
     try:
         response = await call_next(request)
     except Exception as e:
-        logger.error(f"Request failed: {str(e)}")
+        route = metrics.route_label(request.scope)
+        metrics.http_exceptions.inc(request.method, route)
+        metrics.http_requests.observe(time.perf_counter() - start_time, request.method, route, "500")
+        logger.error(f"Request failed: {request.method} {request.url.path}: {str(e)}")
         raise
-    
-    process_time = (time.time() - start_time) * 1000
-    logger.info(f"Response: {response.status_code} (took {process_time:.2f}ms)")
+
+    elapsed = time.perf_counter() - start_time
+    route = metrics.route_label(request.scope)
+    metrics.http_requests.observe(elapsed, request.method, route, str(response.status_code))
+    process_time = elapsed * 1000
+    # One line per request, sampled unless it is slow or a server error.
+    sampled = response.status_code < 500 and process_time < settings.log_slow_request_ms
+    logger.info(
+        f"{request.method} {request.url.path} -> {response.status_code} (took {process_time:.2f}ms)",
+        extra={"sampled": sampled},
+    )
     return response
 
 @app.get("/")
-def serve_frontend():
-    logger.info("Serving frontend index.html")
-    return FileResponse(os.path.join(FRONTEND_DIR, "index.html"))
+async def serve_frontend(request: Request):
+    logger.debug("Serving frontend index.html")
+    return await frontend_files.get_response("index.html", request.scope)
 
 # CORS middleware
 app.add_middleware(
@@ -72,26 +134,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so access logs and metrics time the handler, not the compressor
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_min_size,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality,
+)
+
 @app.get("/location/suggest")
-def suggest_locations(q: str = Query(..., min_length=2)):
-    url = (
-        "http://api.openweathermap.org/geo/1.0/direct"
-        f"?q={quote(q)}&limit=5&appid={settings.openweather_api_key}"
-    )
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        return resp.json()
-    except requests.exceptions.RequestException as exc:
-        raise HTTPException(502, f"Suggestion service unavailable: {exc}") from exc
+async def suggest_locations(q: str = Query(..., min_length=2)):
+    return await services.suggest_locations(q)
 
 @app.get("/weather/forecast/{location}")
-def forecast_weather(location: str):
-    logger.info(f"Fetching forecast for location: {location}")
+async def forecast_weather(location: str, format: str = Query("slots")):
+    """3-hour slots; ``?format=columnar`` returns parallel arrays instead."""
+    logger.debug(f"Fetching forecast for location: {location}")
+    if format not in responses.FORECAST_FORMATS:
+        raise HTTPException(400, f"format must be one of: {', '.join(responses.FORECAST_FORMATS)}")
     try:
-        forecast = get_forecast_by_location(location)
-        logger.debug(f"Forecast data: {forecast}")
-        return forecast
+        return responses.forecast_response(await services.get_forecast_series(location), format)
     except HTTPException as e:
         logger.error(f"Forecast error for {location}: {e.detail}")
         raise e
@@ -99,61 +161,90 @@ def forecast_weather(location: str):
         logger.exception(f"Unexpected forecast error for {location}")
         raise HTTPException(500, f"Unexpected error: {str(e)}")
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        logger.debug("Creating new DB session")
-        yield db
-    finally:
-        logger.debug("Closing DB session")
-        db.close()
+@app.get("/weather/overview/{location}")
+async def weather_overview(request: Request, location: str, today: bool = Query(False)):
+    """Current conditions + forecast for one search; revalidate with If-None-Match."""
+    logger.debug(f"Fetching overview for: {location}")
+    overview = await services.get_overview(location, include_today=today)
+    return httpcache.conditional_json(request, overview, last_modified=overview["observed_at"])
+
+@app.get("/weather/history/{location}")
+async def weather_history(
+    location: str,
+    resolution: str = Query("hour", pattern="^(raw|hour|day)$"),
+    kind: str = Query("current", pattern="^(current|forecast)$"),
+    start: Optional[date] = Query(None, description="UTC date; defaults to a week before end"),
+    end: Optional[date] = Query(None, description="UTC date, inclusive; defaults to today"),
+):
+    """Recorded readings for a location; ``day`` gives min / max / mean per day."""
+    logger.debug(f"Fetching {resolution} history for {location} ({start}..{end})")
+    return await services.get_observation_history(location, resolution, kind, start, end)
+
+
+@app.get("/weather/history/{location}/daily")
+async def weather_history_daily(
+    location: str,
+    kind: str = Query("current", pattern="^(current|forecast)$"),
+    start: Optional[date] = Query(None, description="UTC date; defaults to 30 days before end"),
+    end: Optional[date] = Query(None, description="UTC date, inclusive; defaults to today"),
+):
+    """min / max / mean per day from the daily rollups."""
+    return await services.get_observation_history(location, "day", kind, start, end, days=30)
+
 
 @app.get("/weather/today/{location}")
-def today(location: str):
-    return services.get_today_forecast(location)
+async def today(location: str):
+    return await services.get_today_forecast(location)
+
+
+@app.get("/weather/daily/{location}")
+async def daily(location: str):
+    return await services.get_daily_forecast(location)
+
+
+def _batch_queries(request: schemas.BatchWeatherRequest) -> List[str]:
+    return [
+        f"{item.lat},{item.lon}" if isinstance(item, schemas.Coordinates) else item
+        for item in request.locations
+    ]
+
+
+@app.post("/weather/current/batch", response_model=schemas.BatchWeatherResponse)
+async def weather_batch(request: schemas.BatchWeatherRequest):
+    logger.debug(f"Fetching current weather for batch of {len(request.locations)}")
+    results = await services.run_batch(
+        _batch_queries(request), services.get_weather_by_location, settings.batch_concurrency
+    )
+    return {"results": [dict(r, query=q) for q, r in zip(request.locations, results)]}
+
+
+@app.post("/weather/forecast/batch", response_model=schemas.BatchWeatherResponse)
+async def forecast_batch(request: schemas.BatchWeatherRequest):
+    logger.debug(f"Fetching forecasts for batch of {len(request.locations)}")
+    results = await services.run_batch(
+        _batch_queries(request), get_forecast_by_location, settings.batch_concurrency
+    )
+    return {"results": [dict(r, query=q) for q, r in zip(request.locations, results)]}
 
 
 @app.get("/weather/current/coords/{lat}/{lon}")
-def weather_by_coords(lat: float, lon: float):
-    logger.info(f"Fetching weather for coordinates: {lat},{lon}")
+async def weather_by_coords(
+    lat: float = PathParam(..., ge=-90, le=90),
+    lon: float = PathParam(..., ge=-180, le=180),
+):
+    logger.debug(f"Fetching weather for coordinates: {lat},{lon}")
     try:
-        url = (
-            "https://api.openweathermap.org/data/2.5/weather"
-            f"?lat={lat}&lon={lon}&appid={settings.openweather_api_key}&units=metric"
-        )
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-
-        temp_c       = data["main"]["temp"]
-        feels_like_c = data["main"].get("feels_like")
-
-        return {
-            "location": f"{lat},{lon}",
-            "temperature_c": temp_c,
-            "temperature_f": services.c_to_f(temp_c),
-            "feels_like_c": feels_like_c,
-            "feels_like_f": services.c_to_f(feels_like_c) if feels_like_c is not None else None,
-            "humidity":     data["main"]["humidity"],
-            "wind_speed":   data["wind"]["speed"],
-            "conditions":   data["weather"][0]["main"],
-            "latitude":  lat,
-            "longitude": lon,
-        }
-
-    except requests.exceptions.RequestException as exc:
-        logger.error(f"OpenWeather error: {exc}")
-        raise HTTPException(502, f"Weather service unavailable: {exc}")
+        return await services.get_weather_by_coords(lat, lon)
+    except HTTPException as e:
+        logger.error(f"OpenWeather error: {e.detail}")
+        raise e
 
 
 @app.get("/weather/current/{location}")
-def weather_by_location(location: str):
-    logger.info(f"Fetching current weather for: {location}")
+async def weather_by_location(location: str):
+    logger.debug(f"Fetching current weather for: {location}")
     try:
-        weather = services.get_weather_by_location(location)
-        logger.debug(f"Weather data: {weather}")
-        return weather
+        return await services.get_weather_by_location(location)
     except HTTPException as e:
         logger.error(f"Weather lookup failed for {location}: {e.detail}")
         raise e
@@ -162,32 +253,126 @@ def weather_by_location(location: str):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.get("/weather/live")
+async def weather_live(location: List[str] = Query(..., description="Repeat for several locations")):
+    """Server-sent events: an ``event: weather`` message whenever a location's current conditions change."""
+    if len(location) > settings.live_max_locations:
+        raise HTTPException(400, f"At most {settings.live_max_locations} locations per connection")
+    sub = live.hub.connect()
+    try:
+        for loc in location:
+            await live.hub.subscribe(sub, loc)
+    except BaseException:
+        live.hub.disconnect(sub)
+        raise
+    return live.EventStream(sub, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.websocket("/weather/live/ws")
+async def weather_live_ws(websocket: WebSocket):
+    await live.serve_websocket(websocket)
+
+
 
 @app.get("/weather/", response_model=List[schemas.WeatherRecord])
-def read_records(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    logger.info(f"Fetching weather records (skip={skip}, limit={limit})")
-    records = crud.get_weather_records(db, skip=skip, limit=limit)
+async def read_records(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Deprecated: use cursor"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    location: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+):
+    logger.debug(f"Fetching weather records (cursor={cursor}, skip={skip}, limit={limit})")
+    bbox = _bbox(min_lat, min_lon, max_lat, max_lon)
+
+    try:
+        # Fetch one extra row to learn whether another page exists.
+        records = await run_db(
+            crud.get_weather_records, skip=skip, limit=limit + 1, cursor=cursor,
+            location=location.title() if location else None,
+            date_from=date_from, date_to=date_to, bbox=bbox,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    headers = {}
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = crud.encode_cursor(records[-1])
+        headers["X-Next-Cursor"] = next_cursor
+        next_url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+        headers["Link"] = f'<{next_url}>; rel="next"'
     logger.debug(f"Found {len(records)} records")
+    # The URL already identifies the query, so the page's rows are enough for the ETag.
+    etag, last_modified = httpcache.record_validators(records, headers.get("X-Next-Cursor"))
+    headers.update(httpcache.validator_headers(etag, last_modified))
+    if httpcache.is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return records
 
+def _bbox(min_lat, min_lon, max_lat, max_lon):
+    parts = (min_lat, min_lon, max_lat, max_lon)
+    if all(p is None for p in parts):
+        return None
+    if None in parts:
+        raise HTTPException(400, "Bounding box needs min_lat, min_lon, max_lat and max_lon")
+    return parts
+
+@app.get("/weather/export")
+def export_records(
+    format: str = Query("csv", pattern="^(csv|json|ndjson|columnar)$"),
+    location: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+):
+    """Stream every matching record; ``json`` is delivered as NDJSON."""
+    logger.debug(f"Exporting records as {format} (location={location}, {date_from}..{date_to})")
+    fmt = "ndjson" if format == "json" else format
+    body = export.stream_records(
+        fmt,
+        location=location.title() if location else None,
+        date_from=date_from, date_to=date_to,
+        bbox=_bbox(min_lat, min_lon, max_lat, max_lon),
+    )
+    return StreamingResponse(
+        body,
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="weather_records.{export.EXTENSIONS[fmt]}"'},
+    )
+
 @app.get("/weather/{record_id}", response_model=schemas.WeatherRecord)
-def read_record(record_id: int, db: Session = Depends(get_db)):
-    logger.info(f"Fetching weather record ID: {record_id}")
-    record = crud.get_weather_record(db, record_id=record_id)
+async def read_record(record_id: int, request: Request, response: Response):
+    logger.debug(f"Fetching weather record ID: {record_id}")
+    record = await run_db(crud.get_weather_record, record_id=record_id)
     if record is None:
         logger.warning(f"Record not found: {record_id}")
         raise HTTPException(status_code=404, detail="Record not found")
-    logger.debug(f"Record data: {record}")
+    etag, last_modified = httpcache.record_validators([record])
+    headers = httpcache.validator_headers(etag, last_modified)
+    if httpcache.is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return record
 
 @app.put("/weather/{record_id}", response_model=schemas.WeatherRecord)
-def update_record(
+async def update_record(
     record_id: int, 
     updates: schemas.WeatherRecordUpdate,
-    db: Session = Depends(get_db)
 ):
     logger.info(f"Updating record ID: {record_id} with {updates}")
-    record = crud.update_weather_record(db, record_id=record_id, updates=updates)
+    record = await run_db(crud.update_weather_record, record_id=record_id, updates=updates)
     if record is None:
         logger.warning(f"Update failed - record not found: {record_id}")
         raise HTTPException(status_code=404, detail="Record not found")
@@ -195,9 +380,9 @@ def update_record(
     return record
 
 @app.delete("/weather/{record_id}")
-def delete_record(record_id: int, db: Session = Depends(get_db)):
+async def delete_record(record_id: int):
     logger.info(f"Deleting record ID: {record_id}")
-    success = crud.delete_weather_record(db, record_id=record_id)
+    success = await run_db(crud.delete_weather_record, record_id=record_id)
     if not success:
         logger.warning(f"Delete failed - record not found: {record_id}")
         raise HTTPException(status_code=404, detail="Record not found")
@@ -205,39 +390,90 @@ def delete_record(record_id: int, db: Session = Depends(get_db)):
     return {"message": "Record deleted successfully"}
 
 @app.get("/weather/export/{record_id}/{format}")
-def export_record(record_id: int, format: str, db: Session = Depends(get_db)):
-    logger.info(f"Exporting record {record_id} as {format}")
-    record = crud.get_weather_record(db, record_id=record_id)
+async def export_record(record_id: int, format: str):
+    logger.debug(f"Exporting record {record_id} as {format}")
+    record = await run_db(crud.get_weather_record, record_id=record_id)
     if not record:
         logger.warning(f"Export failed - record not found: {record_id}")
         raise HTTPException(status_code=404, detail="Record not found")
     
     try:
         exported = services.export_data(record, format)
-        logger.debug(f"Exported data: {exported[:100]}...")  # Log first 100 chars
-        return exported
+        return Response(
+            exported,
+            media_type=export.MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="weather_record_{record_id}.{export.EXTENSIONS[format]}"'},
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Export failed for record {record_id}")
         raise HTTPException(500, "Export failed")
 
+def _map_format(format: str) -> str:
+    if format not in responses.MAP_FORMATS:
+        raise HTTPException(400, f"format must be one of: {', '.join(responses.MAP_FORMATS)}")
+    return format
+
+
 @app.get("/location/map/{location}")
-def get_map_data(location: str):
-    logger.info(f"Fetching map data for: {location}")
+async def get_map_data(
+    location: str,
+    radius_km: float = Query(25, gt=0, le=1000),
+    size: int = Query(64, ge=2, le=settings.map_max_size),
+    format: str = "json",
+):
+    """Temperature / humidity / wind grid around a location (see app/maps.py for the layout)."""
+    logger.debug(f"Fetching map data for: {location}")
+    fmt = _map_format(format)
     try:
-        map_data = services.get_map_data(location)
-        return map_data
+        return responses.map_response(await services.get_map_data(location, radius_km, size), fmt)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Map data error for {location}: {str(e)}")
+        logger.exception(f"Map data error for {location}: {str(e)}")
         raise HTTPException(500, "Map service error")
 
-@app.post("/weather/", response_model=schemas.WeatherRecord)
-def create_record(
+
+@app.get("/map/tiles/{z}/{x}/{y}")
+async def get_map_tile(
+    z: int,
+    x: int,
+    y: int,
+    size: int = Query(256, ge=2, le=settings.map_max_size),
+    format: str = "binary",
+):
+    """Grid for a web-mercator tile, one cell per pixel; overlays a slippy map."""
+    fmt = _map_format(format)
+    return responses.map_response(await services.get_map_tile(z, x, y, size), fmt)
+
+
+@app.get("/map/grid")
+async def get_map_grid(
+    south: float = Query(..., ge=-90, le=90),
+    north: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    east: float = Query(..., ge=-180, le=180),
+    rows: int = Query(64, ge=2, le=settings.map_max_size),
+    cols: int = Query(64, ge=2, le=settings.map_max_size),
+    format: str = "json",
+):
+    """Grid over an arbitrary bounding box."""
+    fmt = _map_format(format)
+    return responses.map_response(await services.get_map_bbox(south, north, west, east, rows, cols), fmt)
+
+@app.post("/weather/", response_model=schemas.WeatherRecord,
+          responses={202: {"model": schemas.RecordAccepted, "description": "Stored; geocoding queued"}})
+async def create_record(
     record: schemas.WeatherRecordCreate, 
-    db: Session = Depends(get_db)
+    mode: str = Query("sync", pattern="^(sync|async)$",
+                      description="async: store now, geocode and add weather in the background"),
 ):
-    logger.info(f"Creating new record for: {record.location}")
+    logger.info(f"Creating new record for: {record.location} ({mode})")
+    if mode == "async":
+        return await _create_record_async(record)
     try:
-        location_data = services.validate_location(record.location)
+        location_data = await services.validate_location(record.location)
         if not location_data:
             logger.warning(f"Invalid location: {record.location}")
             raise HTTPException(status_code=400, detail="Location not found")
@@ -253,18 +489,64 @@ def create_record(
             conditions=None
         )
 
-        db.add(db_record)
-        db.commit()
-        db.refresh(db_record)
+        await run_db(_save_record, db_record)
         logger.info(f"Created new record ID: {db_record.id}")
         return db_record
 
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        # run_db's session rolls back on close if the commit failed
+        logger.exception("Record creation failed")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+async def _create_record_async(record: schemas.WeatherRecordCreate):
+    db_record = models.WeatherRecord(location=record.location, record_date=record.record_date)
+    try:
+        record_id, job_id = await jobs.queue.enqueue(db_record)
+    except Exception as e:
         logger.exception("Record creation failed")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    logger.info(f"Created new record ID: {record_id}, queued job {job_id}")
+    accepted = schemas.RecordAccepted(
+        record_id=record_id, job_id=job_id, status=jobs.PENDING, status_url=f"/jobs/{job_id}",
+    )
+    return responses.FastJSONResponse(accepted.model_dump(), status_code=202, headers={"Location": accepted.status_url})
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobStatus)
+async def job_status(job_id: int):
+    status = await run_db(jobs.get_status, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+def _save_record(db: Session, db_record: models.WeatherRecord) -> None:
+    db.add(db_record)
+    db.commit()
+    db.refresh(db_record)
+
+@app.post("/weather/bulk")
+async def bulk_create_records(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    enrich: bool = False,
+):
+    """Stream CSV (with a header row) or NDJSON records into the database."""
+    logger.info(f"Bulk ingest started (format={format}, chunk_size={chunk_size})")
+    report = await bulk.ingest(bulk.aiter_lines(request.stream()), format, chunk_size)
+    if enrich:
+        await bulk.enrich_missing(report=report)
+    logger.info(f"Bulk ingest finished: {report.inserted} inserted, {report.failed} failed")
+    return report.as_dict()
+
+@app.post("/weather/enrich")
+async def enrich_records(limit: Optional[int] = Query(None, ge=1)):
+    """Fill temperature / humidity / wind / conditions for records still missing them."""
+    logger.info(f"Enriching records missing weather (limit={limit})")
+    report = await bulk.enrich_missing(limit=limit)
+    logger.info(f"Enrichment finished: {report.enriched} updated, {report.failed} failed")
+    return report.as_dict()
 
 @app.get("/debug-key")
 def debug_key():
@@ -273,4 +555,74 @@ def debug_key():
     return {
         "loaded_key": settings.openweather_api_key,
         "key_valid": "your_openweather_api_key" not in settings.openweather_api_key
-    }
\ No newline at end of file
+    }
+
+@app.get("/debug-cache")
+def debug_cache():
+    return {
+        "geocode": services.geocode_cache.stats(),
+        "responses": services.response_cache.stats(),
+        "prefetch": prefetcher.stats(),
+        "upstream": openweather.get_client().stats(),
+        "observations": observations.recorder.stats(),
+        "live": live.hub.stats(),
+        "jobs": jobs.queue.stats(),
+        "startup_ms": startup_profile,
+    }
+
+
+metrics.registry.register_collector(metrics.merge_families(
+    metrics.cache_collector(
+        "geocode", services.geocode_cache.stats,
+        hit_keys=("hits", "negative_hits", "coalesced", "shared_hits"), miss_keys=("misses",),
+    ),
+    metrics.cache_collector(
+        "responses", services.response_cache.stats,
+        hit_keys=("hits", "stale_hits", "coalesced"), miss_keys=("misses",),
+    ),
+))
+metrics.registry.register_collector(lambda: [
+    (f"weatherapp_observations_{name}_total", "counter", f"Observation readings {name}.",
+     [({}, observations.recorder.stats()[name])])
+    for name in ("recorded", "written", "dropped")
+])
+metrics.registry.register_collector(lambda: [
+    (f"weatherapp_prefetch_{name}_total", "counter", f"Prefetch scheduler {name}.", [({}, prefetcher.stats()[name])])
+    for name in ("refreshed", "errors", "deferred")
+])
+metrics.registry.register_collector(lambda: [
+    (f"weatherapp_live_{name}", "gauge", f"Live subscription {name}.", [({}, live.hub.stats()[name])])
+    for name in ("connections", "topics", "subscribers")
+])
+metrics.registry.register_collector(lambda: [
+    (f"weatherapp_jobs_{name}_total", "counter", f"Background jobs {name}.", [({}, jobs.queue.stats()[name])])
+    for name in ("enqueued", "done", "retried", "failed")
+])
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _upstream_families():
+    client = openweather.get_client()
+    return [
+        ("weatherapp_upstream_breaker_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open).",
+         [({"endpoint": path}, _BREAKER_STATES[b.state]) for path, b in client.breakers.items()]),
+        ("weatherapp_upstream_inflight", "gauge", "OpenWeather calls in flight.", [({}, client.inflight)]),
+        ("weatherapp_upstream_rate_tokens", "gauge", "Calls left in the rate budget right now.",
+         [({}, client.bucket.available())]),
+    ]
+
+
+metrics.registry.register_collector(_upstream_families)
+metrics.registry.register_collector(lambda: [(
+    "weatherapp_log_records_dropped_total", "counter",
+    "Log records dropped because the log queue was full.",
+    [({}, logs.dropped_records())],
+)])
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+startup_profile["import"] = round((time.perf_counter() - _import_started) * 1000, 2)
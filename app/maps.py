@@ -0,0 +1,272 @@
+#maps.py
+"""
+Gridded weather fields for heatmaps.
+
+A grid covers a bounding box with ``rows x cols`` cells.  Only a small
+lattice of anchor points is read from upstream (``anchors`` per side, so 9
+reads by default, each through the response cache), and temperature,
+humidity and wind are bilinearly interpolated from it onto the cell
+centres.  Bilinear interpolation on a lattice is two small matrix products,
+``Wy @ A @ Wx.T``, where every row of the weight matrices has at most two
+non-zero entries.  With NumPy installed the products run vectorised;
+without it the same sparse products run as list comprehensions, one
+output row at a time.
+
+Values are stored as int16 in units of ``SCALE`` (0.01), row-major from
+north-west.  The ``binary`` encoding sends them as they are:
+
+    uint32 LE header length | JSON header (padded to an even length) |
+    one int16 LE array per field, in ``FIELDS`` order
+
+and the ``json`` encoding sends the same header with each field's values
+as a flat list of integers.  Web-mercator tiles (``tile_bounds``) place rows
+at the latitude of their pixel centres, so a grid lines up with map tiles.
+"""
+import asyncio
+import math
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .responses import dumps
+
+try:
+    import numpy as np
+except ImportError:  # optional: `pip install numpy`
+    np = None
+
+FIELDS = ("temperature_c", "humidity", "wind_speed_ms")
+SCALE = 0.01
+MAX_LAT = 85.05112878  # web-mercator limit
+
+Weights = List[Tuple[int, float]]  # per output point: (left anchor index, weight of the right anchor)
+
+
+def linspace(lo: float, hi: float, n: int) -> List[float]:
+    if n == 1:
+        return [(lo + hi) / 2]
+    step = (hi - lo) / (n - 1)
+    return [lo + i * step for i in range(n)]
+
+
+def centres(lo: float, hi: float, n: int) -> List[float]:
+    """Centres of ``n`` equal cells between ``lo`` and ``hi``."""
+    step = (hi - lo) / n
+    return [lo + (i + 0.5) * step for i in range(n)]
+
+
+def weights(points: Sequence[float], anchors: Sequence[float]) -> Weights:
+    """Linear interpolation weights of *points* on ascending or descending *anchors*."""
+    last = len(anchors) - 1
+    if last == 0:
+        return [(0, 0.0)] * len(points)
+    out = []
+    lo, hi = anchors[0], anchors[-1]
+    span = (hi - lo) / last
+    for p in points:
+        x = min(max((p - lo) / span, 0.0), float(last))
+        i = min(int(x), last - 1)
+        out.append((i, x - i))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Interpolation
+# ---------------------------------------------------------------------------
+
+def _dense(w: Weights, n: int):
+    m = np.zeros((len(w), n))
+    for row, (i, t) in enumerate(w):
+        m[row, i] += 1 - t
+        if t:
+            m[row, i + 1] += t
+    return m
+
+
+def interpolate(values: Sequence[Sequence[float]], wy: Weights, wx: Weights) -> array:
+    """``Wy @ values @ Wx.T`` quantised to int16 units of ``SCALE``, row-major."""
+    if np is not None:
+        a = np.asarray(values, dtype=float) / SCALE
+        field = _dense(wy, a.shape[0]) @ a @ _dense(wx, a.shape[1]).T
+        return array("h", np.rint(field).astype(np.int16).tobytes())
+
+    scaled = [[v / SCALE for v in row] for row in values]
+    out = array("h")
+    for i, t in wy:
+        # Wy @ values: one short row of anchor columns per output row ...
+        top = scaled[i]
+        row = [a + (b - a) * t for a, b in zip(top, scaled[i + 1])] if t else top
+        # ... @ Wx.T: each output cell mixes two neighbouring anchor columns.
+        step = [b - a for a, b in zip(row, row[1:])] + [0.0]
+        out.extend([round(row[j] + step[j] * s) for j, s in wx])
+    return out
+
+
+def fill_missing(lats: Sequence[float], lons: Sequence[float],
+                 readings: List[List[Optional[Tuple[float, ...]]]]) -> None:
+    """Replace failed anchors (None) by inverse-distance averages of the others, in place."""
+    known = [(lats[r], lons[c], v) for r, row in enumerate(readings) for c, v in enumerate(row) if v is not None]
+    for r, row in enumerate(readings):
+        for c, v in enumerate(row):
+            if v is not None:
+                continue
+            total, acc = 0.0, [0.0] * len(known[0][2])
+            for lat, lon, value in known:
+                w = 1.0 / ((lat - lats[r]) ** 2 + (lon - lons[c]) ** 2)
+                total += w
+                acc = [a + w * x for a, x in zip(acc, value)]
+            row[c] = tuple(a / total for a in acc)
+
+
+# ---------------------------------------------------------------------------
+# Grids
+# ---------------------------------------------------------------------------
+
+class Grid:
+    """One interpolated field set plus its encodings, built once per cache entry."""
+
+    __slots__ = ("bbox", "rows", "cols", "fields", "ranges", "anchors", "fetched_at", "extra", "_encoded")
+
+    def __init__(self, bbox: Tuple[float, float, float, float], rows: int, cols: int,
+                 fields: Dict[str, array], anchors: List[Dict[str, Any]], extra: Optional[Dict[str, Any]] = None):
+        self.bbox = bbox  # (south, north, west, east)
+        self.rows = rows
+        self.cols = cols
+        self.fields = fields
+        self.ranges = {name: (min(values) * SCALE, max(values) * SCALE) for name, values in fields.items()}
+        self.anchors = anchors
+        self.fetched_at = int(time.time())
+        self.extra = extra or {}
+        self._encoded: Dict[str, bytes] = {}
+
+    @property
+    def nbytes(self) -> int:
+        """Memory this grid can hold: its int16 fields plus both cached encodings."""
+        # 2 bytes per value in the array, 2 in the binary body, up to 7 ("-32768,") in JSON,
+        # plus room for the two JSON headers.
+        return 1024 + 11 * sum(len(values) for values in self.fields.values())
+
+    def header(self) -> Dict[str, Any]:
+        south, north, west, east = self.bbox
+        header = {
+            "bbox": {"south": south, "north": north, "west": west, "east": east},
+            "rows": self.rows,
+            "cols": self.cols,
+            "order": "row-major from north-west",
+            "scale": SCALE,
+            "fields": {},
+            "anchors": self.anchors,
+            "fetched_at": self.fetched_at,
+        }
+        header.update(self.extra)
+        for name, (lo, hi) in self.ranges.items():
+            header["fields"][name] = {"min": round(lo, 2), "max": round(hi, 2)}
+        return header
+
+    def encode(self, fmt: str) -> bytes:
+        body = self._encoded.get(fmt)
+        if body is None:
+            body = self._encoded[fmt] = self._binary() if fmt == "binary" else self._json()
+        return body
+
+    def _json(self) -> bytes:
+        header = self.header()
+        for name, values in self.fields.items():
+            header["fields"][name]["values"] = values.tolist()
+        return dumps(header)
+
+    def _binary(self) -> bytes:
+        header = self.header()
+        header["dtype"] = "int16le"
+        raw = dumps(header)
+        raw += b" " * ((4 + len(raw)) % 2)  # int16 arrays start 2-byte aligned
+        parts = [struct.pack("<I", len(raw)), raw]
+        for name in FIELDS:
+            values = self.fields[name]
+            if sys.byteorder != "little":
+                values = array("h", values)
+                values.byteswap()
+            parts.append(values.tobytes())
+        return b"".join(parts)
+
+
+def _reading(data: Dict[str, Any]) -> Tuple[float, float, float]:
+    return float(data["main"]["temp"]), float(data["main"]["humidity"]), float(data["wind"]["speed"])
+
+
+async def build_grid(
+    bbox: Tuple[float, float, float, float],
+    rows: int,
+    cols: int,
+    fetch: Callable[[float, float], Awaitable[Dict[str, Any]]],
+    anchors: int = 3,
+    row_lats: Optional[List[float]] = None,
+    concurrency: int = 20,
+    extra: Optional[Dict[str, Any]] = None,
+) -> Grid:
+    """
+    Read ``anchors x anchors`` points of *bbox* with ``fetch(lat, lon)`` and
+    interpolate them onto the grid.  Rows run north to south at *row_lats*
+    (default: evenly spaced centres).  Anchors that fail are filled from the
+    others; if all fail, the first error is raised.
+    """
+    south, north, west, east = bbox
+    anchor_lats = linspace(north, south, anchors)
+    anchor_lons = linspace(west, east, anchors)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(lat: float, lon: float):
+        async with slots:
+            return _reading(await fetch(lat, lon))
+
+    results = await asyncio.gather(
+        *(one(lat, lon) for lat in anchor_lats for lon in anchor_lons), return_exceptions=True
+    )
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if len(errors) == len(results):
+        raise errors[0]
+    readings = [[None if isinstance(r, BaseException) else r for r in results[i:i + anchors]]
+                for i in range(0, len(results), anchors)]
+    if errors:
+        fill_missing(anchor_lats, anchor_lons, readings)
+
+    wy = weights(row_lats or centres(north, south, rows), anchor_lats)
+    wx = weights(centres(west, east, cols), anchor_lons)
+    fields = {
+        name: interpolate([[reading[k] for reading in row] for row in readings], wy, wx)
+        for k, name in enumerate(FIELDS)
+    }
+    points = [
+        {"lat": round(lat, 5), "lon": round(lon, 5), "temperature_c": r[0], "humidity": r[1],
+         "wind_speed_ms": r[2], "ok": not isinstance(results[i * anchors + j], BaseException)}
+        for i, (lat, row) in enumerate(zip(anchor_lats, readings))
+        for j, (lon, r) in enumerate(zip(anchor_lons, row))
+    ]
+    return Grid(bbox, rows, cols, fields, points, extra)
+
+# ---------------------------------------------------------------------------
+# Bounding boxes
+# ---------------------------------------------------------------------------
+
+def around(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """``(south, north, west, east)`` of a square of ``2 * radius_km`` centred on a point."""
+    dlat = radius_km / 111.32
+    dlon = radius_km / (111.32 * max(math.cos(math.radians(lat)), 0.01))
+    return (max(lat - dlat, -MAX_LAT), min(lat + dlat, MAX_LAT),
+            max(lon - dlon, -180.0), min(lon + dlon, 180.0))
+
+
+def _tile_lat(y: float, z: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / 2 ** z))))
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """``(south, north, west, east)`` of web-mercator tile z/x/y."""
+    return _tile_lat(y + 1, z), _tile_lat(y, z), x / 2 ** z * 360 - 180, (x + 1) / 2 ** z * 360 - 180
+
+
+def tile_row_lats(z: int, y: int, rows: int) -> List[float]:
+    """Latitudes of the pixel-row centres of a tile ``rows`` pixels high, north to south."""
+    return [_tile_lat(y + (i + 0.5) / rows, z) for i in range(rows)]
@@ -0,0 +1,275 @@
+#metrics.py
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Instruments are plain counters and fixed-bucket histograms guarded by one
+lock each, so recording from the event loop or from threadpool workers
+(DB calls) costs a dict lookup and a few additions.  Values that other
+modules already track (cache statistics) are pulled at scrape time through
+registered collectors instead of being duplicated.
+
+Durations are measured with ``time.perf_counter()`` and reported in seconds.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Request / upstream latencies: 1 ms .. 10 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# DB statements: 0.1 ms .. 1 s
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_num(value)}"
+
+
+class Histogram:
+    """Cumulative fixed-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket ..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(labels, list(counts), total[0]) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = _labels(self.label_names, labels, f'le="{_num(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            plain = _labels(self.label_names, labels)
+            yield f"{self.name}_sum{plain} {_num(total)}"
+            yield f"{self.name}_count{plain} {cumulative}"
+
+
+# A collector returns (name, type, help, [(labels dict, value), ...]) families.
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+Collector = Callable[[], Iterable[Family]]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List = []
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, doc: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, doc, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, doc: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, doc, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.doc}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            for name, kind, doc, samples in collector():
+                lines.append(f"# HELP {name} {doc}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f"{name}{_labels(names, tuple(labels.values()))} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---------------------------------------------------------------------------
+# Instruments
+# ---------------------------------------------------------------------------
+
+http_requests = registry.histogram(
+    "weatherapp_http_request_duration_seconds",
+    "Time from request received to response headers sent, by route template.",
+    ("method", "route", "status"),
+)
+http_exceptions = registry.counter(
+    "weatherapp_http_exceptions_total",
+    "Requests that raised an unhandled exception.",
+    ("method", "route"),
+)
+upstream_requests = registry.histogram(
+    "weatherapp_upstream_request_duration_seconds",
+    "OpenWeather call latency including time queued for a connection slot.",
+    ("endpoint",),
+)
+upstream_errors = registry.counter(
+    "weatherapp_upstream_errors_total",
+    "Failed OpenWeather calls by endpoint and error (HTTP status or exception class).",
+    ("endpoint", "error"),
+)
+upstream_rejected = registry.counter(
+    "weatherapp_upstream_rejected_total",
+    "OpenWeather calls refused locally (circuit_open, rate_limited, overloaded).",
+    ("endpoint", "reason"),
+)
+upstream_retries = registry.counter(
+    "weatherapp_upstream_retries_total",
+    "OpenWeather calls retried after a timeout, 429 or 5xx.",
+    ("endpoint",),
+)
+db_sessions = registry.histogram(
+    "weatherapp_db_session_duration_seconds",
+    "Wall time of one database.run_db() unit of work, including threadpool wait.",
+    ("operation",),
+)
+db_queries = registry.histogram(
+    "weatherapp_db_query_duration_seconds",
+    "Time spent executing one SQL statement.",
+    ("statement",),
+    buckets=DB_BUCKETS,
+)
+
+# ---------------------------------------------------------------------------
+# Hooks
+# ---------------------------------------------------------------------------
+
+def route_label(scope: dict) -> str:
+    """Route template (``/weather/{record_id}``) so label cardinality stays bounded."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return "static" if scope.get("path", "").startswith("/front") else "unmatched"
+    return path
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement run on *engine* (sync engines and ``AsyncEngine.sync_engine``)."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_query_start")
+        if starts:
+            verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            db_queries.observe(time.perf_counter() - starts.pop(), verb)
+
+
+def cache_collector(name: str, stats: Callable[[], Dict[str, object]],
+                    hit_keys: Sequence[str], miss_keys: Sequence[str]) -> Collector:
+    """Expose a cache's ``stats()`` dict as lookup counters plus a hit ratio gauge."""
+
+    def collect() -> Iterable[Family]:
+        s = stats()
+        lookups = [({"cache": name, "result": k}, s[k]) for k in (*hit_keys, *miss_keys)]
+        hits = sum(s[k] for k in hit_keys)
+        total = hits + sum(s[k] for k in miss_keys)
+        return [
+            ("weatherapp_cache_lookups_total", "counter", "Cache lookups by outcome.", lookups),
+            ("weatherapp_cache_hit_ratio", "gauge", "Hits / lookups since start.",
+             [({"cache": name}, hits / total if total else 0.0)]),
+            ("weatherapp_cache_entries", "gauge", "Entries currently cached.",
+             [({"cache": name}, s["size"])]),
+            ("weatherapp_cache_evictions_total", "counter", "Entries evicted for space or age.",
+             [({"cache": name}, s["evictions"])]),
+        ]
+
+    return collect
+
+
+def merge_families(*collectors: Collector) -> Collector:
+    """Combine collectors that emit the same metric names into one family each."""
+
+    def collect() -> Iterable[Family]:
+        merged: Dict[str, Family] = {}
+        for collector in collectors:
+            for name, kind, doc, samples in collector():
+                if name in merged:
+                    merged[name][3].extend(samples)
+                else:
+                    merged[name] = (name, kind, doc, list(samples))
+        return list(merged.values())
+
+    return collect
+
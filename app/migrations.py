@@ -0,0 +1,106 @@
+#migrations.py
+"""
+Bring an existing database up to the current schema.
+
+``create_all`` only creates missing tables, so indexes added to existing
+tables (e.g. the pagination indexes on ``weather_records``) would never
+reach an old ``sql_app.db``.  ``upgrade`` creates those as well, drops the
+ones listed in ``OBSOLETE_INDEXES``, records
+``SCHEMA_VERSION`` in the ``schema_version`` table and is safe to run
+repeatedly.  Deployments run it once before starting workers:
+
+    python -m app.migrations
+
+At startup the app only reads the stored version (``ensure_schema``).
+"""
+import logging
+
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+from . import models
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever models.py gains or loses a table, column or index.
+SCHEMA_VERSION = 4
+
+# Indexes older versions created that models.py no longer declares.
+OBSOLETE_INDEXES = {
+    # The leading column of ix_weather_records_location_record_date_id.
+    "weather_records": ("ix_weather_records_location",),
+}
+
+_version_table = Table("schema_version", MetaData(), Column("version", Integer, nullable=False))
+
+
+def current_version(engine: Engine) -> int:
+    """Stored schema version; 0 for databases created before versioning."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(_version_table.c.version)).scalar() or 0
+    except DBAPIError:
+        return 0
+
+
+def upgrade(engine: Engine) -> None:
+    Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+    created, dropped = [], []
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+        for name in OBSOLETE_INDEXES.get(table.name, ()):
+            if name in existing:
+                with engine.begin() as conn:
+                    conn.execute(text(f"DROP INDEX {name}"))
+                dropped.append(name)
+
+    if dropped:
+        logger.info(f"Dropped indexes: {', '.join(dropped)}")
+    if created:
+        logger.info(f"Created indexes: {', '.join(created)}")
+        if engine.dialect.name == "sqlite":
+            # Refresh planner statistics so the new indexes are used.
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+
+    _version_table.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(_version_table.delete())
+        conn.execute(_version_table.insert().values(version=SCHEMA_VERSION))
+    logger.info(f"Database schema at version {SCHEMA_VERSION}")
+
+
+def ensure_schema(engine: Engine, migrate: bool) -> bool:
+    """
+    Check the stored schema version; returns True if an upgrade ran.
+
+    With ``migrate`` false an out-of-date database is an error, so workers
+    never race each other through ``upgrade``.
+    """
+    version = current_version(engine)
+    if version >= SCHEMA_VERSION:
+        if version > SCHEMA_VERSION:
+            logger.warning(f"Database schema version {version} is newer than this app ({SCHEMA_VERSION})")
+        return False
+    if not migrate:
+        raise RuntimeError(
+            f"Database schema is at version {version}, the app needs {SCHEMA_VERSION}: "
+            "run `python -m app.migrations` first"
+        )
+    upgrade(engine)
+    return True
+
+
+if __name__ == "__main__":
+    from .database import get_engine
+
+    logging.basicConfig(level=logging.INFO)
+    upgrade(get_engine())
@@ -1,12 +1,19 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index, Text, func, text
 from .database import Base
 
 class WeatherRecord(Base):
     __tablename__ = "weather_records"
+    __table_args__ = (
+        # Keyset pagination order for GET /weather/, optionally per location
+        Index("ix_weather_records_record_date_id", "record_date", "id"),
+        Index("ix_weather_records_location_record_date_id", "location", "record_date", "id"),
+        # Bounding-box filter
+        Index("ix_weather_records_lat_lon", "latitude", "longitude"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    location = Column(String, index=True)
+    location = Column(String)  # indexed by ix_weather_records_location_record_date_id
     record_date = Column(Date)  # Changed from 'date' to 'record_date'
     latitude = Column(Float)
     longitude = Column(Float)
@@ -15,4 +22,70 @@ class WeatherRecord(Base):
     wind_speed = Column(Float)
     conditions = Column(String)
     created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime, onupdate=func.now())
+
+class Observation(Base):
+    """One upstream reading (current conditions or a forecast slot) for a cache cell."""
+    __tablename__ = "observations"
+    __table_args__ = (
+        # Range scans per cell; ``day`` lets retention drop whole days at once.
+        Index("ix_observations_cell_kind_observed_at", "cell", "kind", "observed_at"),
+        Index("ix_observations_day", "day"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    cell = Column(String(12), nullable=False)       # geohash, see app/spatial.py
+    kind = Column(String(8), nullable=False)        # "current" or "forecast"
+    observed_at = Column(Integer, nullable=False)   # epoch seconds the reading is valid for
+    day = Column(Integer, nullable=False)           # observed_at // 86400 (UTC day number)
+    fetched_at = Column(Integer, nullable=False)
+    temperature = Column(Float)
+    humidity = Column(Float)
+    wind_speed = Column(Float)
+    conditions = Column(String)
+
+
+class ObservationRollup(Base):
+    """Hourly / daily aggregates of ``observations``, updated as readings are written."""
+    __tablename__ = "observation_rollups"
+    __table_args__ = {"sqlite_with_rowid": False}  # rows stored in primary-key order
+
+    cell = Column(String(12), primary_key=True)
+    kind = Column(String(8), primary_key=True)
+    period = Column(Integer, primary_key=True)         # 3600 or 86400
+    period_start = Column(Integer, primary_key=True)   # epoch seconds, UTC-aligned
+    samples = Column(Integer, nullable=False)
+    temp_min = Column(Float)
+    temp_max = Column(Float)
+    temp_sum = Column(Float)
+    humidity_sum = Column(Float)
+    wind_max = Column(Float)
+    wind_sum = Column(Float)
+
+
+class Job(Base):
+    """Durable background work for stored records (see app/jobs.py)."""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # At most one open job per location: records created meanwhile join it.
+        Index("ux_jobs_open_key", "kind", "key", unique=True,
+              sqlite_where=text("status IN ('pending', 'running')"),
+              postgresql_where=text("status IN ('pending', 'running')")),
+        # Claim order
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(32), nullable=False)          # "locate_record"
+    key = Column(String, nullable=False)               # normalised location
+    status = Column(String(16), nullable=False)        # pending, running, done, failed
+    record_ids = Column(Text, nullable=False)          # comma-separated WeatherRecord ids
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(Float, nullable=False)          # epoch seconds; the next attempt is due
+    owner = Column(String(32))                         # claim token of the running worker
+    lease_expires = Column(Float)                      # a running job past this is claimed again
+    finished_at = Column(Float)
+    result = Column(Text)                              # JSON
+    error = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, onupdate=func.now())
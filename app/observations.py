@@ -0,0 +1,324 @@
+#observations.py
+"""
+History of every reading fetched from OpenWeather.
+
+``recorder.add`` is called for each upstream payload (current conditions or
+a 40-slot forecast) and only buffers rows in memory.  Each reading is kept
+once per cell and timestamp: a refetched forecast only contributes the
+slots newer than the last one recorded, so repeated fetches do not skew
+the rollups.  A background task
+writes the buffer every ``flush_interval`` seconds in one transaction:
+raw rows are appended to ``observations`` and the same batch is folded into
+hourly and daily ``observation_rollups`` with an upsert, so aggregate
+queries read a few hundred pre-computed rows instead of scanning raw data.
+
+Raw rows carry a ``day`` column (UTC day number) that acts as the time
+partition: retention deletes whole days through its index.  Rollups are
+kept much longer than raw rows; daily rollups are never pruned.
+"""
+import asyncio
+import logging
+import math
+import time
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, delete, insert, select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import run_db
+from .models import Observation, ObservationRollup
+
+logger = logging.getLogger(__name__)
+
+HOUR, DAY = 3600, 86400
+PERIODS = {"hour": HOUR, "day": DAY}
+KINDS = ("current", "forecast")
+RAW_LIMIT = 10_000          # rows returned by one raw query
+
+_Key = Tuple[str, str, int, int]  # (cell, kind, period, period_start)
+_EPOCH_DAY = date(1970, 1, 1).toordinal()
+
+
+def _reading(cell: str, kind: str, slot: Dict[str, Any], fetched_at: int) -> Dict[str, Any]:
+    observed_at = int(slot["dt"])
+    return {
+        "cell": cell,
+        "kind": kind,
+        "observed_at": observed_at,
+        "day": observed_at // DAY,
+        "fetched_at": fetched_at,
+        "temperature": float(slot["main"]["temp"]),
+        "humidity": float(slot["main"]["humidity"]),
+        "wind_speed": float(slot["wind"]["speed"]),
+        "conditions": slot["weather"][0]["main"],
+    }
+
+
+def day_bounds(start: date, end: date) -> Tuple[int, int]:
+    """Epoch seconds ``[start 00:00, end+1 00:00)`` in UTC."""
+    return (start.toordinal() - _EPOCH_DAY) * DAY, (end.toordinal() + 1 - _EPOCH_DAY) * DAY
+
+# ---------------------------------------------------------------------------
+# Writes (run in the threadpool via run_db)
+# ---------------------------------------------------------------------------
+
+def _fold(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Aggregate a batch of readings into one rollup delta per (cell, kind, period, start)."""
+    acc: Dict[_Key, List[float]] = {}
+    for r in rows:
+        t, h, w = r["temperature"], r["humidity"], r["wind_speed"]
+        for period in (HOUR, DAY):
+            key = (r["cell"], r["kind"], period, r["observed_at"] - r["observed_at"] % period)
+            a = acc.get(key)
+            if a is None:
+                acc[key] = [1, t, t, t, h, w, w]
+            else:
+                a[0] += 1
+                a[1] = min(a[1], t)
+                a[2] = max(a[2], t)
+                a[3] += t
+                a[4] += h
+                a[5] = max(a[5], w)
+                a[6] += w
+    return [
+        {"cell": cell, "kind": kind, "period": period, "period_start": start,
+         "samples": a[0], "temp_min": a[1], "temp_max": a[2], "temp_sum": a[3],
+         "humidity_sum": a[4], "wind_max": a[5], "wind_sum": a[6]}
+        for (cell, kind, period, start), a in acc.items()
+    ]
+
+
+@lru_cache(maxsize=None)
+def _upsert_statement(dialect: str):
+    """ON CONFLICT upsert, executed once per batch with executemany."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    R = ObservationRollup
+    stmt = dialect_insert(R)
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[R.cell, R.kind, R.period, R.period_start],
+        set_={
+            "samples": R.samples + new.samples,
+            "temp_min": case((new.temp_min < R.temp_min, new.temp_min), else_=R.temp_min),
+            "temp_max": case((new.temp_max > R.temp_max, new.temp_max), else_=R.temp_max),
+            "temp_sum": R.temp_sum + new.temp_sum,
+            "humidity_sum": R.humidity_sum + new.humidity_sum,
+            "wind_max": case((new.wind_max > R.wind_max, new.wind_max), else_=R.wind_max),
+            "wind_sum": R.wind_sum + new.wind_sum,
+        },
+    )
+
+
+def _merge_rollup(db: Session, delta: Dict[str, Any]) -> None:
+    """Read-modify-write fallback for databases without ON CONFLICT."""
+    R = ObservationRollup
+    row = db.get(R, (delta["cell"], delta["kind"], delta["period"], delta["period_start"]))
+    if row is None:
+        db.add(R(**delta))
+        return
+    row.samples += delta["samples"]
+    row.temp_min = min(row.temp_min, delta["temp_min"])
+    row.temp_max = max(row.temp_max, delta["temp_max"])
+    row.temp_sum += delta["temp_sum"]
+    row.humidity_sum += delta["humidity_sum"]
+    row.wind_max = max(row.wind_max, delta["wind_max"])
+    row.wind_sum += delta["wind_sum"]
+
+
+def write_batch(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Append raw readings and fold them into the rollups, atomically."""
+    db.execute(insert(Observation), rows)
+    deltas = _fold(rows)
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        db.execute(_upsert_statement(dialect), deltas)
+    else:
+        for delta in deltas:
+            _merge_rollup(db, delta)
+    db.commit()
+
+
+def prune(db: Session, raw_days: int, hourly_days: int, now: Optional[float] = None) -> Tuple[int, int]:
+    """Drop raw days and hourly rollups past their retention; returns the rows deleted."""
+    today = int(now if now is not None else time.time()) // DAY
+    raw = db.execute(delete(Observation).where(Observation.day < today - raw_days)).rowcount
+    hourly = db.execute(delete(ObservationRollup).where(
+        ObservationRollup.period == HOUR,
+        ObservationRollup.period_start < (today - hourly_days) * DAY,
+    )).rowcount
+    db.commit()
+    return raw, hourly
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def query_rollups(db: Session, cell: str, kind: str, period: int, start: int, end: int) -> List[Dict[str, Any]]:
+    """min / max / mean per hour or day in ``[start, end)``, oldest first."""
+    R = ObservationRollup
+    rows = db.execute(
+        select(R.period_start, R.samples, R.temp_min, R.temp_max, R.temp_sum,
+               R.humidity_sum, R.wind_max, R.wind_sum)
+        .where(R.cell == cell, R.kind == kind, R.period == period,
+               R.period_start >= start, R.period_start < end)
+        .order_by(R.period_start)
+    ).all()
+    out = []
+    for ts, n, t_min, t_max, t_sum, h_sum, w_max, w_sum in rows:
+        out.append({
+            "start": _iso(ts),
+            "samples": n,
+            "temperature_c": {"min": t_min, "max": t_max, "mean": round(t_sum / n, 2)},
+            "humidity": {"mean": round(h_sum / n, 1)},
+            "wind_speed_ms": {"max": w_max, "mean": round(w_sum / n, 2)},
+        })
+    return out
+
+
+def query_raw(db: Session, cell: str, kind: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """Raw readings in ``[start, end)``, oldest first, at most ``RAW_LIMIT``."""
+    O = Observation
+    rows = db.execute(
+        select(O.observed_at, O.fetched_at, O.temperature, O.humidity, O.wind_speed, O.conditions)
+        .where(O.cell == cell, O.kind == kind, O.observed_at >= start, O.observed_at < end)
+        .order_by(O.observed_at, O.id)
+        .limit(RAW_LIMIT)
+    ).all()
+    return [
+        {"observed_at": _iso(ts), "fetched_at": _iso(fetched), "temperature_c": t,
+         "humidity": h, "wind_speed_ms": w, "conditions": c}
+        for ts, fetched, t, h, w, c in rows
+    ]
+
+# ---------------------------------------------------------------------------
+# Recorder
+# ---------------------------------------------------------------------------
+
+class ObservationRecorder:
+    """Buffers readings from upstream payloads and writes them in batches."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        flush_interval: float = 5,
+        max_pending: int = 50_000,
+        raw_retention_days: int = 30,
+        hourly_retention_days: int = 400,
+        prune_interval: float = 3600,
+    ) -> None:
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.raw_retention_days = raw_retention_days
+        self.hourly_retention_days = hourly_retention_days
+        self.prune_interval = prune_interval
+        self._pending: List[Dict[str, Any]] = []
+        self._newest: Dict[Tuple[str, str], int] = {}  # (kind, cell) -> newest observed_at recorded
+        self._task: Optional[asyncio.Task] = None
+        self._pruned_at = -math.inf
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def add(self, endpoint: str, cell: str, payload: Dict[str, Any]) -> None:
+        """Queue the readings in one ``/data/2.5/{endpoint}`` payload; never blocks."""
+        if not self.enabled:
+            return
+        kind = "forecast" if endpoint == "forecast" else "current"
+        slots = payload.get("list", []) if kind == "forecast" else [payload]
+        now = int(time.time())
+        try:
+            rows = [_reading(cell, kind, slot, now) for slot in slots]
+        except (KeyError, IndexError, TypeError, ValueError) as exc:
+            logger.warning(f"Skipping malformed {endpoint} payload for {cell}: {exc!r}")
+            return
+        # Upstream updates current conditions roughly every 10 minutes and the
+        # forecast every 3 hours; skip the readings already recorded.
+        newest = self._newest.get((kind, cell))
+        if newest is not None:
+            rows = [r for r in rows if r["observed_at"] > newest]
+        if not rows:
+            return
+        if len(self._newest) > 100_000:
+            self._newest.clear()
+        self._newest[(kind, cell)] = max(r["observed_at"] for r in rows)
+        self._pending.extend(rows)
+        self.recorded += len(rows)
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+
+    async def flush(self) -> int:
+        rows, self._pending = self._pending, []
+        if not rows:
+            return 0
+        try:
+            await run_db(write_batch, rows)
+        except Exception:
+            self.errors += 1
+            self.dropped += len(rows)
+            logger.exception(f"Could not write {len(rows)} observations")
+            return 0
+        self.written += len(rows)
+        return len(rows)
+
+    async def prune(self) -> None:
+        raw, hourly = await run_db(prune, self.raw_retention_days, self.hourly_retention_days)
+        if raw or hourly:
+            logger.info(f"Pruned {raw} raw observations and {hourly} hourly rollups")
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() - self._pruned_at >= self.prune_interval:
+                self._pruned_at = time.monotonic()
+                try:
+                    await self.prune()
+                except Exception:
+                    logger.exception("Observation pruning failed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+recorder = ObservationRecorder(
+    enabled=settings.observations_enabled,
+    flush_interval=settings.observation_flush_interval,
+    max_pending=settings.observation_max_pending,
+    raw_retention_days=settings.observation_raw_retention_days,
+    hourly_retention_days=settings.observation_hourly_retention_days,
+    prune_interval=settings.observation_prune_interval,
+)
@@ -0,0 +1,274 @@
+#openweather.py
+"""
+Shared async OpenWeather gateway.
+
+Every upstream call in the app goes through one ``OpenWeatherClient``,
+which adds, in order:
+
+* a per-endpoint circuit breaker: after ``failure_threshold`` consecutive
+  failures, calls fail fast for ``reset_timeout`` seconds, then a single
+  probe decides whether to close it again;
+* a token bucket sized to the API plan (``rate_per_minute``): each call
+  books the next free slot, and one whose slot is more than
+  ``max_queue_wait`` away is refused at once;
+* bounded concurrency over one pooled keep-alive connection pool;
+* retries with full-jitter exponential backoff for timeouts, connection
+  errors, 429 and 5xx (all calls are idempotent GETs).
+
+Calls that are refused locally raise ``UpstreamUnavailable``, a subclass of
+``httpx.HTTPError``, carrying a ``retry_after`` hint in seconds.
+"""
+from typing import Any, Dict, Optional
+
+import asyncio
+import random
+import time
+
+import httpx
+
+from . import metrics
+from .config import settings
+from .ratelimit import TokenBucket
+from .workers import request_share, worker_share
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class UpstreamUnavailable(httpx.HTTPError):
+    """The call was not sent: breaker open, rate budget exhausted or too many queued."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half_open (one probe) -> closed."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return self.state != self.OPEN
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN:
+            return 1.0
+        return max(1.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give up a half-open probe slot without a verdict (e.g. cancelled)."""
+        self._probing = False
+
+
+class _Retryable(Exception):
+    def __init__(self, response: httpx.Response) -> None:
+        self.response = response
+
+
+class OpenWeatherClient:
+    """
+    Thin wrapper around one ``httpx.AsyncClient``.
+
+    TCP/TLS connections are reused across requests instead of being opened
+    per call.  The API key is added to every request.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        timeout: float = 10.0,
+        connect_timeout: float = 3.0,
+        max_connections: int = 100,
+        max_keepalive: int = 100,
+        retries: int = 2,
+        rate_per_minute: float = 60,
+        rate_burst: Optional[float] = None,
+        max_queue_wait: float = 2.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+    ) -> None:
+        self.api_key = api_key
+        self.retries = retries
+        self.max_queue_wait = max_queue_wait
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.bucket = TokenBucket.per_minute(rate_per_minute, rate_burst)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.max_connections = max_connections
+        self.inflight = 0
+        # Queue excess callers here rather than inside httpx's pool, whose
+        # wait-list handling gets slow with thousands of pending requests.
+        self._slots = asyncio.Semaphore(max_connections)
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            # Limits must live on the transport; the client ignores its own
+            # ``limits`` once a custom transport is given.  All calls go to a
+            # single host, so the pool limit is the per-host limit.
+            # Retries are handled in get_json, not by the transport.
+            transport=httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive,
+                ),
+            ),
+        )
+
+    def breaker(self, path: str) -> CircuitBreaker:
+        breaker = self.breakers.get(path)
+        if breaker is None:
+            breaker = self.breakers[path] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def _reject(self, path: str, reason: str, retry_after: float) -> UpstreamUnavailable:
+        metrics.upstream_rejected.inc(path, reason)
+        return UpstreamUnavailable(f"OpenWeather {path} {reason.replace('_', ' ')}", retry_after)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def get_json(
+        self, path: str, params: Optional[Dict[str, Any]] = None, bucket: Optional[TokenBucket] = None
+    ) -> Any:
+        """
+        GET ``path`` and return the decoded JSON body; raises ``httpx.HTTPError``.
+
+        Each attempt is charged to *bucket* instead of this worker's request
+        quota when given (the prefetcher passes its own budget).
+        """
+        query = {"appid": self.api_key}
+        if params:
+            query.update(params)
+
+        breaker = self.breaker(path)
+        if not breaker.allow():
+            raise self._reject(path, "circuit_open", breaker.retry_after())
+
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    return await self._attempt(path, query, breaker, bucket or self.bucket)
+                except (httpx.TransportError, _Retryable) as exc:
+                    if attempt == self.retries:
+                        breaker.record_failure()
+                        if isinstance(exc, _Retryable):
+                            exc.response.raise_for_status()
+                        raise
+                    metrics.upstream_retries.inc(path)
+                    await asyncio.sleep(self._backoff(attempt))
+        except httpx.HTTPStatusError as exc:
+            metrics.upstream_errors.inc(path, str(exc.response.status_code))
+            raise
+        except (UpstreamUnavailable, asyncio.CancelledError):
+            breaker.release()
+            raise
+        except Exception as exc:
+            breaker.release()
+            metrics.upstream_errors.inc(path, type(exc).__name__)
+            raise
+        finally:
+            metrics.upstream_requests.observe(time.perf_counter() - start, path)
+
+    async def _attempt(self, path: str, query: Dict[str, Any], breaker: CircuitBreaker, bucket: TokenBucket) -> Any:
+        if not await bucket.acquire(max_wait=self.max_queue_wait):
+            raise self._reject(path, "rate_limited", bucket.wait_time())
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.max_queue_wait)
+        except asyncio.TimeoutError:
+            raise self._reject(path, "overloaded", 1.0) from None
+        self.inflight += 1
+        try:
+            r = await self._http.get(path, params=query)
+        finally:
+            self.inflight -= 1
+            self._slots.release()
+
+        if r.status_code in RETRYABLE_STATUS:
+            raise _Retryable(r)
+        # Any other answer (including 4xx) means upstream is healthy.
+        breaker.record_success()
+        r.raise_for_status()
+        return r.json()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": self.inflight,
+            "max_connections": self.max_connections,
+            "rate_tokens": round(self.bucket.available(), 2),
+            "breakers": {
+                path: {"state": b.state, "failures": b.failures, "times_opened": b.times_opened}
+                for path, b in self.breakers.items()
+            },
+        }
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+_client: Optional[OpenWeatherClient] = None
+
+
+def get_client() -> OpenWeatherClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = OpenWeatherClient(
+            base_url=settings.openweather_base_url,
+            api_key=settings.openweather_api_key,
+            timeout=settings.upstream_timeout,
+            connect_timeout=settings.upstream_connect_timeout,
+            max_connections=settings.upstream_max_connections,
+            max_keepalive=settings.upstream_max_keepalive,
+            retries=settings.upstream_retries,
+            # The plan quota is per API key, shared by every worker on the host,
+            # less what the prefetcher reserves (see workers.prefetch_budget).
+            rate_per_minute=request_share(),
+            rate_burst=None if settings.upstream_rate_burst is None else worker_share(settings.upstream_rate_burst),
+            max_queue_wait=settings.upstream_max_queue_wait,
+            failure_threshold=settings.upstream_breaker_failures,
+            reset_timeout=settings.upstream_breaker_reset,
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
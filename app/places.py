@@ -0,0 +1,436 @@
+#places.py
+"""
+Local place index for location autocomplete.
+
+Built once from a GeoNames-style gazetteer (``cities15000.txt`` etc.) into a
+single file that is memory-mapped at runtime; lookups are a binary search
+over sorted name keys, plus a precomputed top-N table for every prefix that
+matches more than ``SCAN_LIMIT`` keys, so a suggestion costs microseconds and no upstream call.  Places learned from
+upstream answers are kept in a small in-memory overlay and appended to a
+side file in gazetteer format, which the next build folds in.
+
+Index layout (native byte order, 8-byte aligned sections)::
+
+    header   := b"WXPLC1\\0\\0" n_records:u32 n_keys:u32 n_prefixes:u32 top_n:u32
+    records  := (lat:f64 lon:f64 population:u32 id:u32)[n_records]
+    labels   := offsets:u32[n_records + 1] utf8 "name\\x1fstate\\x1fcountry"
+    keys     := offsets:u32[n_keys + 1] utf8 (sorted) record:u32[n_keys]
+    prefixes := offsets:u32[n_prefixes + 1] utf8 (sorted) top:u32[n_prefixes * top_n]
+
+CLI:
+
+    python -m app.places build cities15000.txt [--admin1 admin1CodesASCII.txt] [-o places.idx]
+    python -m app.places query "san f"
+"""
+import argparse
+import heapq
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import unicodedata
+from array import array
+from bisect import insort
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WXPLC1\0\0"
+HEADER = struct.Struct("<8sIIII")
+RECORD = struct.Struct("=ddII")
+SEP = "\x1f"
+NONE = 0xFFFFFFFF
+
+SCAN_LIMIT = 128        # prefixes matching more keys answer from the top-N table
+TOP_N = 10
+
+# GeoNames "geoname" table columns used here
+_COL_NAME, _COL_ASCII, _COL_LAT, _COL_LON = 1, 2, 4, 5
+_COL_COUNTRY, _COL_ADMIN1, _COL_POPULATION = 8, 10, 14
+_GEONAMES_COLUMNS = 19
+
+_SPACES = re.compile(r"[\s,]+")
+
+
+def normalize(text: str) -> str:
+    """Case-, accent- and punctuation-insensitive key: "São Paulo," -> "sao paulo"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _SPACES.sub(" ", stripped.casefold()).strip()
+
+
+class Place(NamedTuple):
+    name: str
+    state: str
+    country: str
+    lat: float
+    lon: float
+    population: int = 0
+
+    def as_suggestion(self) -> Dict[str, Any]:
+        """Same shape as an OpenWeather ``geo/1.0/direct`` item."""
+        out: Dict[str, Any] = {"name": self.name, "lat": self.lat, "lon": self.lon, "country": self.country}
+        if self.state:
+            out["state"] = self.state
+        return out
+
+    def ident(self) -> Tuple[str, str, str]:
+        return normalize(self.name), self.state, self.country
+
+# ---------------------------------------------------------------------------
+# Gazetteer input
+# ---------------------------------------------------------------------------
+
+def read_admin1(path: str) -> Dict[str, str]:
+    """``admin1CodesASCII.txt`` -> {"US.CA": "California", ...}."""
+    names: Dict[str, str] = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) >= 2:
+                names[parts[0]] = parts[1]
+    return names
+
+
+def read_gazetteer(path: str, admin1: Optional[Dict[str, str]] = None,
+                   min_population: int = 0) -> Iterator[Tuple[Place, Tuple[str, ...]]]:
+    """Yield ``(place, names)`` from a GeoNames tab-separated file; ``names`` are the indexed spellings."""
+    admin1 = admin1 or {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip() or line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < _COL_POPULATION + 1:
+                continue
+            try:
+                lat, lon = float(cols[_COL_LAT]), float(cols[_COL_LON])
+                population = int(cols[_COL_POPULATION] or 0)
+            except ValueError:
+                continue
+            if population < min_population:
+                continue
+            country = cols[_COL_COUNTRY]
+            state = admin1.get(f"{country}.{cols[_COL_ADMIN1]}", cols[_COL_ADMIN1])
+            names = tuple(dict.fromkeys(n for n in (cols[_COL_NAME], cols[_COL_ASCII]) if n))
+            yield Place(cols[_COL_NAME], state, country, lat, lon, population), names
+
+
+def gazetteer_line(place: Place) -> str:
+    """Format *place* as a GeoNames row (unused columns left empty)."""
+    cols = [""] * _GEONAMES_COLUMNS
+    name, state, country, lat, lon, population = place
+    cols[_COL_NAME] = cols[_COL_ASCII] = name
+    cols[_COL_LAT], cols[_COL_LON] = repr(lat), repr(lon)
+    cols[_COL_COUNTRY], cols[_COL_ADMIN1], cols[_COL_POPULATION] = country, state, str(population)
+    return "\t".join(cols) + "\n"
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def _pad(buf: bytearray) -> None:
+    buf.extend(b"\0" * (-len(buf) % 8))
+
+
+def _strings(buf: bytearray, values: Sequence[bytes]) -> None:
+    offsets = array("I", [0])
+    for v in values:
+        offsets.append(offsets[-1] + len(v))
+    buf.extend(offsets.tobytes())
+    buf.extend(b"".join(values))
+    _pad(buf)
+
+
+def _heavy_prefixes(keyed: List[Tuple[bytes, int]], places: List[Place], top_n: int) -> Dict[bytes, List[int]]:
+    """Top-N places for each prefix matching more than SCAN_LIMIT keys, one prefix length at a time."""
+    tops: Dict[bytes, List[int]] = {}
+    groups = [(0, len(keyed))]
+    n = 1
+    while groups:
+        heavy = []
+        for lo, hi in groups:
+            i = lo
+            while i < hi:
+                prefix = keyed[i][0][:n]
+                j = i + 1
+                while j < hi and keyed[j][0][:n] == prefix:
+                    j += 1
+                if j - i > SCAN_LIMIT and len(prefix) == n:
+                    records = dict.fromkeys(idx for _, idx in keyed[i:j])
+                    tops[prefix] = heapq.nlargest(top_n, records, key=lambda r: places[r].population)
+                    heavy.append((i, j))
+                i = j
+        groups = heavy
+        n += 1
+    return tops
+
+
+def build_index(entries: Iterable[Tuple[Place, Sequence[str]]], path: str, top_n: int = TOP_N) -> int:
+    """Write the index for *entries* to *path* (atomically); returns the number of places."""
+    places: List[Place] = []
+    seen: Dict[Tuple[str, str, str], int] = {}
+    keyed: List[Tuple[bytes, int]] = []
+    for place, names in entries:
+        ident = place.ident()
+        idx = seen.get(ident)
+        if idx is None:
+            idx = seen[ident] = len(places)
+            places.append(place)
+        elif place.population > places[idx].population:
+            places[idx] = place
+        for name in names:
+            keyed.append((normalize(name).encode(), idx))
+    keyed = sorted(set(keyed))
+    tops = _heavy_prefixes(keyed, places, top_n)
+    prefixes = sorted(tops)
+
+    buf = bytearray(HEADER.pack(MAGIC, len(places), len(keyed), len(prefixes), top_n))
+    _pad(buf)
+    labels = []
+    for i, (name, state, country, lat, lon, population) in enumerate(places):
+        buf.extend(RECORD.pack(lat, lon, min(population, NONE - 1), i))
+        labels.append(SEP.join((name, state, country)).encode())
+    _pad(buf)
+    _strings(buf, labels)
+    _strings(buf, [k for k, _ in keyed])
+    buf.extend(array("I", (i for _, i in keyed)).tobytes())
+    _pad(buf)
+    _strings(buf, prefixes)
+    top = array("I")
+    for p in prefixes:
+        top.extend(tops[p] + [NONE] * (top_n - len(tops[p])))
+    buf.extend(top.tobytes())
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(buf)
+    os.replace(tmp, path)
+    return len(places)
+
+# ---------------------------------------------------------------------------
+# Lookup
+# ---------------------------------------------------------------------------
+
+class _StringTable:
+    """UTF-8 strings addressed by index, sliced straight out of the map."""
+
+    def __init__(self, view: memoryview, pos: int, count: int) -> None:
+        self.count = count
+        self.offsets = view[pos:pos + 4 * (count + 1)].cast("I")
+        self.base = pos + 4 * (count + 1)
+        self.view = view
+        self.end = self.base + self.offsets[count]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self.view[self.base + self.offsets[i]:self.base + self.offsets[i + 1]])
+
+    def lower_bound(self, key: bytes, lo: int = 0, hi: Optional[int] = None) -> int:
+        hi = self.count if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self[mid] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+def _aligned(pos: int) -> int:
+    return pos + (-pos % 8)
+
+
+class PlaceIndex:
+    """
+    Read-only memory-mapped index plus an in-memory overlay of learned places.
+
+    An index with no file is valid: it answers from the overlay alone.
+    """
+
+    def __init__(self, path: Optional[str] = None, overlay_path: Optional[str] = None) -> None:
+        self.path = path
+        self.overlay_path = overlay_path
+        self._lock = threading.Lock()
+        self._overlay_keys: List[Tuple[str, int]] = []
+        self._overlay: List[Place] = []
+        self._overlay_seen: set = set()
+        self.n_records = 0
+        self._mmap = None
+        if path and os.path.exists(path):
+            self._open(path)
+        if overlay_path and os.path.exists(overlay_path):
+            for place, names in read_gazetteer(overlay_path):
+                self._add(place, names)
+
+    def _open(self, path: str) -> None:
+        with open(path, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, n_records, n_keys, n_prefixes, top_n = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a place index")
+        pos = _aligned(HEADER.size)
+        self.n_records, self.top_n = n_records, top_n
+        self._records = view[pos:pos + RECORD.size * n_records]
+        self._population = view[pos:pos + RECORD.size * n_records].cast("I")[4::6]
+        pos = _aligned(pos + RECORD.size * n_records)
+        self._labels = _StringTable(view, pos, n_records)
+        pos = _aligned(self._labels.end)
+        self._keys = _StringTable(view, pos, n_keys)
+        pos = _aligned(self._keys.end)
+        self._key_record = view[pos:pos + 4 * n_keys].cast("I")
+        pos = _aligned(pos + 4 * n_keys)
+        self._prefixes = _StringTable(view, pos, n_prefixes)
+        pos = _aligned(self._prefixes.end)
+        self._top = view[pos:pos + 4 * n_prefixes * top_n].cast("I")
+
+    def __len__(self) -> int:
+        return self.n_records + len(self._overlay)
+
+    def _place(self, i: int) -> Place:
+        lat, lon, population, _ = RECORD.unpack_from(self._records, i * RECORD.size)
+        name, state, country = self._labels[i].decode().split(SEP)
+        return Place(name, state, country, lat, lon, population)
+
+    def _local(self, key: str, limit: int) -> List[int]:
+        if self._mmap is None or not key:
+            return []
+        kb = key.encode()
+        i = self._prefixes.lower_bound(kb)
+        if i < len(self._prefixes) and self._prefixes[i] == kb and limit <= self.top_n:
+            top = self._top[i * self.top_n:(i + 1) * self.top_n]
+            return [r for r in top if r != NONE][:limit]
+        lo = self._keys.lower_bound(kb)
+        hi = self._keys.lower_bound(kb + b"\xff", lo)
+        records = dict.fromkeys(self._key_record[i] for i in range(lo, hi))
+        return heapq.nlargest(limit, records, key=self._population.__getitem__)
+
+    def suggest(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Best-populated places whose name starts with *query*; [] when nothing matches."""
+        key = normalize(query)
+        candidates = [self._place(i) for i in self._local(key, limit)]
+        if self._overlay_keys:
+            j = _bisect_left(self._overlay_keys, key)
+            while j < len(self._overlay_keys) and self._overlay_keys[j][0].startswith(key):
+                candidates.append(self._overlay[self._overlay_keys[j][1]])
+                j += 1
+        out: List[Dict[str, Any]] = []
+        seen = set()
+        for place in sorted(candidates, key=lambda p: -p.population):
+            ident = place.ident()
+            if ident not in seen:
+                seen.add(ident)
+                out.append(place.as_suggestion())
+                if len(out) == limit:
+                    break
+        return out
+
+    def _add(self, place: Place, names: Sequence[str]) -> bool:
+        ident = place.ident()
+        if ident in self._overlay_seen:
+            return False
+        self._overlay_seen.add(ident)
+        self._overlay.append(place)
+        for name in names:
+            insort(self._overlay_keys, (normalize(name), len(self._overlay) - 1))
+        return True
+
+    def learn(self, suggestions: Iterable[Dict[str, Any]]) -> int:
+        """Merge upstream ``geo/1.0/direct`` items into the overlay (and its side file); blocking."""
+        added = []
+        with self._lock:
+            for item in suggestions:
+                try:
+                    place = Place(item["name"], item.get("state", ""), item.get("country", ""),
+                                  float(item["lat"]), float(item["lon"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if self._add(place, (place.name,)):
+                    added.append(place)
+            if added and self.overlay_path:
+                try:
+                    with open(self.overlay_path, "a", encoding="utf-8") as fh:
+                        fh.writelines(gazetteer_line(p) for p in added)
+                except OSError as exc:
+                    logger.warning(f"Could not persist learned places: {exc}")
+        return len(added)
+
+
+def _bisect_left(keys: List[Tuple[str, int]], key: str) -> int:
+    lo, hi = 0, len(keys)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if keys[mid][0] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+_index: Optional[PlaceIndex] = None
+
+
+def get_index() -> PlaceIndex:
+    """Process-wide index, opened on first use from ``settings.place_index_path``."""
+    global _index
+    if _index is None:
+        path = settings.place_index_path
+        overlay = f"{path}.learned.tsv" if path and settings.place_index_learn else None
+        try:
+            _index = PlaceIndex(path, overlay)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Place index unavailable, using upstream only: {exc}")
+            _index = PlaceIndex(None, overlay)
+        logger.info(f"Place index loaded: {len(_index)} places")
+    return _index
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.places", description="Build or query the place index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="build the index from GeoNames-format files")
+    p_build.add_argument("sources", nargs="+", help="cities15000.txt, allCountries.txt, ...")
+    p_build.add_argument("--admin1", help="admin1CodesASCII.txt, for full state names")
+    p_build.add_argument("--min-population", type=int, default=0)
+    p_build.add_argument("-o", "--output", default=settings.place_index_path)
+    p_build.add_argument("--no-learned", action="store_true", help="skip places learned from upstream")
+
+    p_query = sub.add_parser("query", help="print suggestions for a prefix")
+    p_query.add_argument("prefix")
+    p_query.add_argument("--limit", type=int, default=5)
+    p_query.add_argument("-i", "--index", default=settings.place_index_path)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        admin1 = read_admin1(args.admin1) if args.admin1 else None
+        sources = list(args.sources)
+        learned = f"{args.output}.learned.tsv"
+        if not args.no_learned and os.path.exists(learned):
+            sources.append(learned)
+
+        def entries():
+            for src in sources:
+                yield from read_gazetteer(src, admin1, args.min_population if src != learned else 0)
+
+        count = build_index(entries(), args.output)
+        print(f"Indexed {count} places into {args.output} ({os.path.getsize(args.output)} bytes)", file=sys.stderr)
+    else:
+        for item in PlaceIndex(args.index).suggest(args.prefix, args.limit):
+            print(item)
+
+
+if __name__ == "__main__":
+    main()
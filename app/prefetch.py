@@ -0,0 +1,241 @@
+#prefetch.py
+"""
+Background refresh of popular and stored locations.
+
+``hot`` counts lookups per cached cell (endpoint + geohash) with exponential
+decay, so yesterday's spike fades.  The ``Prefetcher`` task wakes every
+``interval`` seconds and refreshes the top-N hot cells, plus every cell
+referenced by a stored WeatherRecord, shortly before their cached payload
+reaches its TTL.  Each cell gets a stable per-key jitter, so entries
+fetched together do not all come due together.  A scan reads the cached
+timestamps of all its candidates in one backend query.
+
+Refreshes are charged to the prefetcher's own token bucket, which
+``workers.prefetch_budget`` takes off the upstream quota before it is
+split between workers, so prefetching never eats into request capacity.
+
+``hot`` lives in each process.  With several workers the prefetch leader
+only sees the lookups it served itself; cells popular on the other workers
+are still kept fresh by those workers' own cache misses and stale hits.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import settings
+from .ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+CellKey = Tuple[str, str]  # (endpoint, geohash)
+
+
+class HotSet:
+    """
+    Exponentially decayed request counts per cell, bounded to ``max_tracked`` keys.
+
+    Per process: nothing is shared between workers.
+    """
+
+    def __init__(self, half_life: float = 3600, max_tracked: int = 10_000) -> None:
+        self.decay = math.log(2) / half_life
+        self.max_tracked = max_tracked
+        self._scores: Dict[CellKey, Tuple[float, float]] = {}  # key -> (score, updated)
+
+    def touch(self, endpoint: str, geohash: str) -> None:
+        now = time.monotonic()
+        key = (endpoint, geohash)
+        entry = self._scores.get(key)
+        if entry is None:
+            self._scores[key] = (1.0, now)
+            if len(self._scores) > self.max_tracked:
+                self._prune(now)
+        else:
+            score, updated = entry
+            self._scores[key] = (score * math.exp(-self.decay * (now - updated)) + 1.0, now)
+
+    def _score(self, entry: Tuple[float, float], now: float) -> float:
+        return entry[0] * math.exp(-self.decay * (now - entry[1]))
+
+    def _prune(self, now: float) -> None:
+        keep = heapq.nlargest(self.max_tracked // 2, self._scores.items(), key=lambda kv: self._score(kv[1], now))
+        self._scores = dict(keep)
+
+    def top(self, n: int) -> List[Tuple[CellKey, float]]:
+        now = time.monotonic()
+        return heapq.nlargest(
+            n, ((k, self._score(v, now)) for k, v in self._scores.items()), key=lambda kv: kv[1]
+        )
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+hot = HotSet(settings.prefetch_half_life)
+
+
+def _jitter(key: CellKey) -> float:
+    """Stable value in [0, 1) per key."""
+    return zlib.crc32(f"{key[0]}:{key[1]}".encode()) / 2 ** 32
+
+
+class Prefetcher:
+    """
+    Periodic refresher; ``start()`` from the app lifespan, ``stop()`` on shutdown.
+
+    The callables connect it to services.py without an import cycle:
+
+    * ``refresh(endpoint, geohash, budget)`` fetches one cell into the response
+      cache, charging upstream calls to the ``budget`` token bucket,
+    * ``stored_times(cells)`` returns when each cached cell was stored,
+    * ``ttl(endpoint)`` is the freshness window of that endpoint,
+    * ``record_cells()`` returns the geohashes of stored WeatherRecords,
+    * ``leader()`` says whether this process should scan at all; with several
+      workers only the one holding the prefetch lock does.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[str, str, TokenBucket], Awaitable[Any]],
+        stored_times: Callable[[List[CellKey]], Awaitable[Dict[CellKey, float]]],
+        ttl: Callable[[str], float],
+        record_cells: Optional[Callable[[], Awaitable[Iterable[str]]]] = None,
+        hot_set: HotSet = hot,
+        endpoints: Tuple[str, ...] = ("weather", "forecast"),
+        interval: float = 30,
+        top_n: int = 100,
+        lead: float = 120,
+        jitter: float = 0.1,
+        rate_per_minute: float = 30,
+        concurrency: int = 4,
+        records_interval: float = 600,
+        leader: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        self.refresh = refresh
+        self.stored_times = stored_times
+        self.ttl = ttl
+        self.record_cells = record_cells
+        self.hot = hot_set
+        self.endpoints = endpoints
+        self.interval = interval
+        self.top_n = top_n
+        self.lead = lead
+        self.jitter = jitter
+        self.budget = TokenBucket.per_minute(rate_per_minute)
+        self._slots = asyncio.Semaphore(concurrency)
+        self.records_interval = records_interval
+        self.leader = leader
+        self.leading = False
+        self._records: Set[str] = set()
+        self._records_loaded = -math.inf
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self._unpaid = 0  # refreshes waiting for a slot, not yet charged to the budget
+        self.scans = 0
+        self.refreshed = 0
+        self.errors = 0
+        self.deferred = 0
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._inflight) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.leading = self.leader is None or self.leader()
+                if self.leading:
+                    await self.scan()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Prefetch scan failed")
+            await asyncio.sleep(self.interval)
+
+    # -- scheduling --------------------------------------------------------
+
+    def _due_at(self, key: CellKey, stored: Optional[float]) -> float:
+        """Wall-clock time at which *key*, cached at *stored*, should be refreshed (0 when not cached)."""
+        if stored is None:
+            return 0.0
+        ttl = self.ttl(key[0])
+        return stored + ttl - self.lead - _jitter(key) * self.jitter * ttl
+
+    async def _load_records(self) -> None:
+        if self.record_cells is None or time.monotonic() - self._records_loaded < self.records_interval:
+            return
+        try:
+            self._records = set(await self.record_cells())
+            self._records_loaded = time.monotonic()
+        except Exception as exc:
+            logger.warning(f"Could not load record locations for prefetch: {exc}")
+
+    def candidates(self) -> List[CellKey]:
+        """Hot cells first (by popularity), then stored-record cells."""
+        keys = [key for key, _ in self.hot.top(self.top_n)]
+        seen = set(keys)
+        for geohash in sorted(self._records):
+            for endpoint in self.endpoints:
+                key = (endpoint, geohash)
+                if key not in seen:
+                    seen.add(key)
+                    keys.append(key)
+        return keys
+
+    async def scan(self) -> int:
+        """Start refreshes for every candidate due before the next scan; returns how many."""
+        self.scans += 1
+        await self._load_records()
+        candidates = self.candidates()
+        stored = await self.stored_times(candidates)
+        horizon = time.time() + self.interval
+        allowance = int(self.budget.available()) - self._unpaid
+        started = 0
+        for key in candidates:
+            if self._due_at(key, stored.get(key)) > horizon:
+                continue
+            if started >= allowance:
+                self.deferred += 1
+                continue
+            self._unpaid += 1
+            task = asyncio.get_running_loop().create_task(self._refresh(key))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            started += 1
+        return started
+
+    async def _refresh(self, key: CellKey) -> None:
+        async with self._slots:
+            self._unpaid -= 1
+            try:
+                await self.refresh(*key, self.budget)
+                self.refreshed += 1
+            except Exception as exc:
+                self.errors += 1
+                logger.warning(f"Prefetch of {key[0]}:{key[1]} failed: {exc}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "leader": self.leading,
+            "tracked": len(self.hot),
+            "record_cells": len(self._records),
+            "scans": self.scans,
+            "refreshed": self.refreshed,
+            "errors": self.errors,
+            "deferred": self.deferred,
+            "budget_tokens": round(self.budget.tokens, 2),
+        }
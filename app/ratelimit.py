@@ -0,0 +1,74 @@
+#ratelimit.py
+"""Token-bucket rate limiting for upstream calls."""
+import asyncio
+import math
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    ``rate`` tokens per second, bursting up to ``capacity``.
+
+    ``try_acquire`` never waits.  ``reserve`` / ``acquire`` book tokens at
+    once, running the bucket into debt, so every caller gets its own slot in
+    arrival order and a caller whose slot is too far away is turned down up
+    front instead of waiting in line.  Not thread-safe: use it from the
+    event loop only.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, n: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= n:
+            self.tokens -= n
+            return True
+        return False
+
+    def available(self) -> float:
+        """Tokens left right now; 0 while booked slots are still pending."""
+        self._refill()
+        return max(0.0, self.tokens)
+
+    def wait_time(self, n: float = 1) -> float:
+        """Seconds until *n* more tokens are free, after every slot already booked."""
+        self._refill()
+        return max(0.0, (n - self.tokens) / self.rate) if self.rate > 0 else float("inf")
+
+    def reserve(self, n: float = 1, max_wait: float = math.inf) -> Optional[float]:
+        """
+        Book *n* tokens and return the seconds until they may be used, or
+        None (nothing booked) when that is more than *max_wait*.
+        """
+        wait = self.wait_time(n)
+        if wait > max_wait:
+            return None
+        self.tokens -= n
+        return wait
+
+    async def acquire(self, n: float = 1, max_wait: float = math.inf) -> bool:
+        """Book *n* tokens and sleep until their slot; False at once if it is beyond *max_wait*."""
+        wait = self.reserve(n, max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.tokens += n  # give the slot back
+                raise
+        return True
+
+    @classmethod
+    def per_minute(cls, calls: float, burst: Optional[float] = None) -> "TokenBucket":
+        return cls(calls / 60.0, burst if burst is not None else max(1.0, calls / 6))
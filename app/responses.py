@@ -0,0 +1,63 @@
+#responses.py
+"""
+Fast JSON responses.
+
+``dumps`` uses orjson when it is installed (``pip install orjson``) and the
+standard library otherwise.  Forecast bodies are encoded once per parsed
+forecast and reused until the cached payload is refreshed.
+"""
+import json
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse, Response
+
+from .forecast import ForecastSeries
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+FORECAST_FORMATS = ("slots", "columnar")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """Drop-in ``JSONResponse`` using ``dumps``; the app's default response class."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _encoded(series: ForecastSeries, fmt: str, build: Callable[[], Any]) -> bytes:
+    body = series._encoded.get(fmt)
+    if body is None:
+        body = series._encoded[fmt] = dumps(build())
+    return body
+
+
+def forecast_body(series: ForecastSeries, fmt: str = "slots") -> bytes:
+    """JSON for ``series`` as a list of slot objects or as parallel arrays."""
+    if fmt == "columnar":
+        return _encoded(series, fmt, series.columnar)
+    if fmt == "slots":
+        return _encoded(series, fmt, series.slots)
+    raise ValueError(f"Unsupported forecast format: {fmt}")
+
+
+def forecast_response(series: ForecastSeries, fmt: str = "slots") -> Response:
+    return Response(forecast_body(series, fmt), media_type="application/json")
+
+
+MAP_FORMATS = ("json", "binary")
+_MAP_MEDIA_TYPES = {"json": "application/json", "binary": "application/octet-stream"}
+
+
+def map_response(grid, fmt: str = "json") -> Response:
+    """Body of a ``maps.Grid``; each encoding is built once per cached grid."""
+    return Response(grid.encode(fmt), media_type=_MAP_MEDIA_TYPES[fmt])
@@ -1,6 +1,7 @@
 #schemas.py
 from __future__ import annotations
 from datetime import date, datetime
+from typing import Any, List, Union
 from pydantic import BaseModel, Field, field_validator
 
 class WeatherRecordBase(BaseModel):
@@ -39,10 +40,51 @@ class WeatherRecordUpdate(BaseModel):
 
 class WeatherRecord(WeatherRecordBase):
     id: int
-    latitude: float
-    longitude: float
+    latitude: float | None = None   # unset until an async create has been geocoded
+    longitude: float | None = None
     created_at: datetime
     updated_at: datetime | None = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class Coordinates(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+class BatchWeatherRequest(BaseModel):
+    # Place names / ZIP codes / "lat,lon" strings, or explicit coordinate objects
+    locations: List[Union[Coordinates, str]] = Field(..., min_length=1, max_length=200)
+
+class BatchItemError(BaseModel):
+    status_code: int
+    detail: str
+
+class BatchItem(BaseModel):
+    query: Union[Coordinates, str]
+    ok: bool
+    data: Any = None
+    error: BatchItemError | None = None
+
+class BatchWeatherResponse(BaseModel):
+    results: List[BatchItem]
+
+class RecordAccepted(BaseModel):
+    """202 answer of ``POST /weather/?mode=async``."""
+    record_id: int
+    job_id: int
+    status: str
+    status_url: str
+
+class JobStatus(BaseModel):
+    id: int
+    kind: str
+    location: str
+    status: str                      # pending, running, done, failed
+    attempts: int
+    record_ids: List[int]
+    next_attempt_at: datetime | None = None
+    result: Any = None
+    error: str | None = None
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
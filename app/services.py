@@ -1,50 +1,145 @@
 #services.py
+import asyncio
+import functools
+import math
 import re
-from datetime import datetime, timezone, date
-from typing import List, Dict, Any
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Any, Awaitable, Callable, Optional
 
-import requests
+import httpx
 from fastapi import HTTPException
-from urllib.parse import quote
+from fastapi.concurrency import run_in_threadpool
 
+from . import export, maps, observations, places, prefetch, spatial
+from .cache import MemoryBackend, ResponseCache, await_lease, build_backend, release_soon, run_backend
 from .config import settings
+from .database import run_db
+from .forecast import ForecastSeries, c_to_f
+from .openweather import UpstreamUnavailable, get_client
+from .ratelimit import TokenBucket
 
 # ──────────────────────────────────────────────────────────────
 # Regex helper (US ZIP‑code test)
 _zip_re = re.compile(r"^\d{5}(?:-\d{4})?$")
 
 
-def c_to_f(c: float) -> float:
-    """Convert °C to °F (rounded to one decimal)."""
-    return round(c * 9 / 5 + 32, 1)
+def upstream_error(exc: httpx.HTTPError, what: str = "Weather service unavailable") -> HTTPException:
+    """502 for upstream failures; 503 + Retry-After when the gateway refused to call."""
+    if isinstance(exc, UpstreamUnavailable):
+        return HTTPException(503, f"{what}: {exc}", headers={"Retry-After": str(math.ceil(exc.retry_after))})
+    return HTTPException(502, f"{what}: {exc}")
+
+# ---------------------------------------------------------------------------
+# 0.  CACHED UPSTREAM PAYLOADS
+# ---------------------------------------------------------------------------
+
+response_cache = ResponseCache(
+    build_backend(
+        settings.response_cache_backend,
+        settings.response_cache_path,
+        settings.response_cache_size,
+    ),
+    stale_if_error=settings.stale_if_error,
+    shared_wait=settings.shared_fetch_wait,
+)
+
+
+async def _cached_upstream(
+    endpoint: str, lat: float, lon: float, ttl: float, grace: float,
+    parse: Optional[Callable[[Dict[str, Any]], Any]] = None,
+) -> Any:
+    """Fetch ``/data/2.5/{endpoint}`` through the response cache.
+
+    Coordinates are snapped to a geohash cell (see app/spatial.py); the
+    upstream call is made for the cell centre and cached under the geohash,
+    so every lookup inside one cell shares a single payload.
+    """
+    cell = spatial.snap(lat, lon, settings.spatial_precision)
+    prefetch.hot.touch(endpoint, cell.geohash)
+    return await response_cache.get_or_fetch(
+        f"{endpoint}:{cell.geohash}", ttl, grace, _cell_fetcher(endpoint, cell.geohash), parse
+    )
+
+
+def _cell_fetcher(
+    endpoint: str, geohash: str, bucket: Optional[TokenBucket] = None
+) -> Callable[[], Awaitable[Dict[str, Any]]]:
+    lat, lon = spatial.centre(geohash)
+
+    async def fetch() -> Dict[str, Any]:
+        try:
+            data = await get_client().get_json(
+                f"/data/2.5/{endpoint}", {"lat": lat, "lon": lon, "units": "metric"}, bucket
+            )
+        except httpx.HTTPError as exc:
+            raise upstream_error(exc) from exc
+        observations.recorder.add(endpoint, geohash, data)
+        return data
+
+    return fetch
+
+
+# Per-endpoint freshness and parser: (ttl, grace, parse)
+def _endpoint_policy(endpoint: str) -> tuple:
+    if endpoint == "forecast":
+        return settings.forecast_ttl, settings.forecast_grace, ForecastSeries.from_payload
+    return settings.current_ttl, settings.current_grace, None
+
+
+def upstream_ttl(endpoint: str) -> float:
+    return _endpoint_policy(endpoint)[0]
+
+
+async def cached_times(cells: List[prefetch.CellKey]) -> Dict[prefetch.CellKey, float]:
+    """When each cached (endpoint, geohash) cell was stored, in one backend query."""
+    keys = {f"{endpoint}:{geohash}": (endpoint, geohash) for endpoint, geohash in cells}
+    times = await response_cache.stored_times(keys)
+    return {keys[key]: stored for key, stored in times.items()}
+
+
+async def prefetch_cell(endpoint: str, geohash: str, budget: TokenBucket) -> None:
+    """Refresh one cell's payload into the cache, charged to the prefetch *budget*."""
+    parse = _endpoint_policy(endpoint)[2]
+    await response_cache.prefetch(f"{endpoint}:{geohash}", _cell_fetcher(endpoint, geohash, budget), parse)
+
+
+async def fetch_current(lat: float, lon: float) -> Dict[str, Any]:
+    return await _cached_upstream("weather", lat, lon, settings.current_ttl, settings.current_grace)
+
+
+async def fetch_forecast(lat: float, lon: float) -> ForecastSeries:
+    """Return the parsed forecast; parsing happens once per upstream fetch."""
+    return await _cached_upstream(
+        "forecast", lat, lon, settings.forecast_ttl, settings.forecast_grace,
+        parse=ForecastSeries.from_payload,
+    )
 
 # ---------------------------------------------------------------------------
 # 1.  CURRENT CONDITIONS
 # ---------------------------------------------------------------------------
 
-def get_weather_by_location(location: str) -> Dict[str, Any]:
+async def get_weather_by_location(location: str) -> Dict[str, Any]:
     """Return current conditions (both °C and °F)."""
 
-    coords = validate_location(location)
+    coords = await validate_location(location)
+    return await get_weather_by_coords(coords["lat"], coords["lon"], label=location)
 
-    url = (
-        "https://api.openweathermap.org/data/2.5/weather"
-        f"?lat={coords['lat']}&lon={coords['lon']}"
-        f"&appid={settings.openweather_api_key}&units=metric"
-    )
 
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-    except requests.exceptions.RequestException as exc:
-        raise HTTPException(502, f"Weather service unavailable: {exc}") from exc
+async def get_weather_by_coords(lat: float, lon: float, label: Optional[str] = None) -> Dict[str, Any]:
+    """Return current conditions for a coordinate pair."""
 
-    data = r.json()
+    return current_from_payload(await fetch_current(lat, lon), lat, lon, label)
+
+
+def current_from_payload(data: Dict[str, Any], lat: float, lon: float, label: Optional[str] = None) -> Dict[str, Any]:
+    """Format one current-weather payload; ``cell`` is the cache cell it was fetched for."""
     temp_c = data["main"]["temp"]
     feels_like_c = data["main"].get("feels_like")
 
     return {
-        "location": location,
+        "location": label if label is not None else f"{lat},{lon}",
         "temperature_c": temp_c,
         "temperature_f": c_to_f(temp_c),
         "feels_like_c": feels_like_c,
@@ -52,76 +147,371 @@ def get_weather_by_location(location: str) -> Dict[str, Any]:
         "humidity": data["main"]["humidity"],
         "wind_speed": data["wind"]["speed"],  # or convert to km/h if needed
         "conditions": data["weather"][0]["main"],
-        "latitude": coords["lat"],
-        "longitude": coords["lon"],
+        "latitude": lat,
+        "longitude": lon,
+        "cell": spatial.snap(lat, lon, settings.spatial_precision).as_dict(),
     }
 
 # ---------------------------------------------------------------------------
 # 2.  5‑DAY / 3‑HOUR FORECAST
 # ---------------------------------------------------------------------------
 
-def get_forecast_by_location(location: str) -> List[Dict[str, Any]]:
-    """Return the next ≈5 days (40 slots) of 3‑hour forecasts."""
+async def get_forecast_by_location(location: str) -> List[Dict[str, Any]]:
+    """Return the next ≈5 days (40 slots) of 3‑hour forecasts."""
 
-    coords = validate_location(location)
+    return (await get_forecast_series(location)).slots()
 
-    url = (
-        "https://api.openweathermap.org/data/2.5/forecast"
-        f"?lat={coords['lat']}&lon={coords['lon']}"
-        f"&appid={settings.openweather_api_key}&units=metric"
-    )
 
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-    except requests.exceptions.RequestException as exc:
-        raise HTTPException(502, f"Weather service unavailable: {exc}") from exc
-
-    data = r.json()
-    results: list[dict[str, Any]] = []
-
-    for slot in data.get("list", []):
-        ts = datetime.fromtimestamp(slot["dt"], tz=timezone.utc).astimezone()
-        temp_c = slot["main"]["temp"]
-        results.append(
-            {
-                "timestamp": ts.isoformat(),
-                "temperature_c": temp_c,
-                "temperature_f": c_to_f(temp_c),
-                "humidity": slot["main"]["humidity"],
-                "wind_speed_ms": slot["wind"]["speed"],
-                "conditions": slot["weather"][0]["main"],
-            }
-        )
-    return results
+async def get_forecast_series(location: str) -> ForecastSeries:
+    coords = await validate_location(location)
+    return await fetch_forecast(coords["lat"], coords["lon"])
 
 # ---------------------------------------------------------------------------
-# 3.  TODAY‑ONLY FORECAST (optional helper)
+# 3.  PER-DAY VIEWS (computed from the cached forecast, never refetched)
 # ---------------------------------------------------------------------------
 
-def get_today_forecast(location: str) -> Dict[str, Any]:
+def today_from_series(series: ForecastSeries) -> Dict[str, Any]:
+    today = series.day(date.today())
+    if today is None:
+        raise HTTPException(404, "No forecast slots for today")
+    return today
+
+
+async def get_today_forecast(location: str) -> Dict[str, Any]:
     """Return every 3‑hour slot **for today** plus min / max temps."""
+    return today_from_series(await get_forecast_series(location))
 
-    today_iso = date.today().isoformat()  # YYYY‑MM‑DD
-    slots = [s for s in get_forecast_by_location(location) if s["timestamp"].startswith(today_iso)]
 
-    if not slots:
-        raise HTTPException(404, "No forecast slots for today")
+async def get_daily_forecast(location: str) -> List[Dict[str, Any]]:
+    """Return one min / max / mean rollup per forecast day."""
+    return (await get_forecast_series(location)).daily()
 
-    min_c = min(s["temperature_c"] for s in slots)
-    max_c = max(s["temperature_c"] for s in slots)
+# ---------------------------------------------------------------------------
+# 3a. OVERVIEW (current + forecast for one search)
+# ---------------------------------------------------------------------------
+
+async def get_overview(location: str, include_today: bool = False) -> Dict[str, Any]:
+    """
+    Current conditions and the 3-hour forecast from a single geocode, with
+    both upstream payloads fetched concurrently.
+
+    ``observed_at`` is the upstream observation time (epoch seconds) of the
+    current conditions; ``today`` is ``None`` when not requested or when the
+    forecast has no slots left for today.
+    """
+    coords = await validate_location(location)
+    lat, lon = coords["lat"], coords["lon"]
+    current, series = await asyncio.gather(fetch_current(lat, lon), fetch_forecast(lat, lon))
+    return {
+        "location": location,
+        "latitude": lat,
+        "longitude": lon,
+        "observed_at": current.get("dt"),
+        "cell": spatial.snap(lat, lon, settings.spatial_precision).as_dict(),
+        "current": current_from_payload(current, lat, lon, label=location),
+        "forecast": series.slots(),
+        "today": series.day(date.today()) if include_today else None,
+    }
+
+# ---------------------------------------------------------------------------
+# 3b. OBSERVATION HISTORY (recorded upstream readings, see app/observations.py)
+# ---------------------------------------------------------------------------
+
+async def get_observation_history(
+    location: str, resolution: str, kind: str,
+    start: Optional[date] = None, end: Optional[date] = None, days: int = 7,
+) -> Dict[str, Any]:
+    """
+    Readings for the location's cell between two UTC dates (inclusive);
+    without dates, the last *days* days up to today (UTC).
 
+    ``hour`` and ``day`` are answered from the rollups; ``raw`` returns the
+    stored readings, which are kept for ``observation_raw_retention_days``.
+    """
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=days - 1)
+    if end < start:
+        raise HTTPException(400, "end must not be before start")
+    coords = await validate_location(location)
+    cell = spatial.encode(coords["lat"], coords["lon"], settings.spatial_precision)
+    lo, hi = observations.day_bounds(start, end)
+    if resolution == "raw":
+        rows = await run_db(observations.query_raw, cell, kind, lo, hi)
+    else:
+        rows = await run_db(observations.query_rollups, cell, kind, observations.PERIODS[resolution], lo, hi)
     return {
-        "date": today_iso,
-        "min_c": min_c,
-        "min_f": c_to_f(min_c),
-        "max_c": max_c,
-        "max_f": c_to_f(max_c),
-        "slots": slots,
+        "location": location,
+        "cell": cell,
+        "kind": kind,
+        "resolution": resolution,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "series": rows,
     }
 
 # ---------------------------------------------------------------------------
-# 4.  LOCATION HELPERS
+# 3c. EXPORT
+# ---------------------------------------------------------------------------
+
+def export_data(record, format: str) -> bytes:
+    """Serialise one WeatherRecord as csv / json / ndjson / columnar (see app/export.py)."""
+    try:
+        return export.export_record(record, format)
+    except ValueError as exc:
+        raise HTTPException(400, str(exc)) from exc
+
+# ---------------------------------------------------------------------------
+# 3d. MAP GRIDS (interpolated fields for heatmaps, see app/maps.py)
+# ---------------------------------------------------------------------------
+
+# Grids are derived from current conditions, so they share their freshness.
+grid_cache = ResponseCache(
+    MemoryBackend(settings.map_cache_size, settings.map_cache_bytes, sizeof=lambda grid: grid.nbytes)
+)
+
+
+async def _map_grid(
+    key: str, bbox: tuple, rows: int, cols: int,
+    row_lats: Optional[List[float]] = None, extra: Optional[Dict[str, Any]] = None,
+) -> maps.Grid:
+    async def build() -> maps.Grid:
+        return await maps.build_grid(
+            bbox, rows, cols, fetch_current, settings.map_anchors, row_lats, settings.batch_concurrency, extra
+        )
+
+    return await grid_cache.get_or_fetch(key, settings.current_ttl, settings.current_grace, build)
+
+
+async def get_map_data(location: str, radius_km: float = 25, size: int = 64) -> maps.Grid:
+    """A ``size x size`` grid over the square of ``2 * radius_km`` centred on *location*."""
+    coords = await validate_location(location)
+    lat, lon = coords["lat"], coords["lon"]
+    return await _map_grid(
+        f"around:{lat:.4f},{lon:.4f}:{radius_km:g}:{size}", maps.around(lat, lon, radius_km), size, size,
+        extra={"center": {"lat": lat, "lon": lon}},
+    )
+
+
+async def get_map_tile(z: int, x: int, y: int, size: int = 256) -> maps.Grid:
+    """Grid for web-mercator tile z/x/y, one cell per pixel of a ``size`` pixel tile."""
+    if not (0 <= z <= 20 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(400, f"Tile {z}/{x}/{y} does not exist")
+    return await _map_grid(
+        f"tile:{z}/{x}/{y}:{size}", maps.tile_bounds(z, x, y), size, size,
+        row_lats=maps.tile_row_lats(z, y, size), extra={"tile": {"z": z, "x": x, "y": y}},
+    )
+
+
+async def get_map_bbox(south: float, north: float, west: float, east: float, rows: int, cols: int) -> maps.Grid:
+    if south >= north or west >= east:
+        raise HTTPException(400, "Bounding box needs south < north and west < east")
+    return await _map_grid(
+        f"bbox:{south:.4f},{north:.4f},{west:.4f},{east:.4f}:{rows}x{cols}", (south, north, west, east), rows, cols
+    )
+
+# ---------------------------------------------------------------------------
+# 4.  BATCH LOOKUPS
+# ---------------------------------------------------------------------------
+
+def batch_key(query: str) -> str:
+    """Dedup key for a batch item, using the same normalisation as validate_location."""
+    coords = parse_coords(query.strip())
+    if coords is not None:
+        return f"{coords['lat']},{coords['lon']}"
+    return normalize_location(query)
+
+
+async def run_batch(
+    queries: List[str],
+    lookup: Callable[[str], Awaitable[Any]],
+    concurrency: int,
+) -> List[Dict[str, Any]]:
+    """
+    Run *lookup* for each distinct query with at most *concurrency* in flight.
+
+    Returns one ``{"ok", "data", "error"}`` dict per input query, in order;
+    a failing item carries its error instead of failing the whole batch.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return {"ok": True, "data": await lookup(query), "error": None}
+            except HTTPException as exc:
+                return {"ok": False, "data": None,
+                        "error": {"status_code": exc.status_code, "detail": str(exc.detail)}}
+            except Exception as exc:
+                return {"ok": False, "data": None,
+                        "error": {"status_code": 500, "detail": f"Unexpected error: {exc}"}}
+
+    unique: Dict[str, str] = {}
+    for query in queries:
+        unique.setdefault(batch_key(query), query)
+    results = await asyncio.gather(*(one(q) for q in unique.values()))
+    by_key = dict(zip(unique.keys(), results))
+    return [by_key[batch_key(q)] for q in queries]
+
+# ---------------------------------------------------------------------------
+# 5.  GEOCODE CACHE
+# ---------------------------------------------------------------------------
+
+_ws_re = re.compile(r"\s+")
+_comma_re = re.compile(r"\s*,\s*")
+
+
+def normalize_location(raw: str) -> str:
+    """Canonical cache key for a place query: trimmed, lower-cased, single-spaced."""
+    key = _ws_re.sub(" ", raw.strip()).lower()
+    return _comma_re.sub(",", key)
+
+
+class GeocodeCache:
+    """
+    LRU cache of geocoding results.
+
+    Successful lookups live for ``ttl`` seconds, "Location not found" answers
+    for ``negative_ttl`` seconds.  Concurrent misses on the same key share one
+    upstream call, run as a task of its own so it outlives a cancelled caller;
+    other errors (timeouts, 5xx) are never cached.
+
+    With a ``shared`` store (the SQLite response cache backend) answers are
+    also written there, and a local miss checks it before calling upstream,
+    so other workers on the host reuse them.  Concurrent misses in several
+    workers take the store's lease as ``ResponseCache`` does, waiting up to
+    ``shared_wait`` seconds for the worker that resolves the name.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, maxsize: int, shared=None, shared_wait: float = 0) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self.shared = shared
+        self.shared_wait = shared_wait if shared is not None else 0
+        self._entries: "OrderedDict[str, tuple[float, Optional[Dict[str, float]]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.shared_hits = 0
+
+    async def get_or_resolve(
+        self, key: str, resolve: Callable[[], Awaitable[Dict[str, float]]]
+    ) -> Dict[str, float]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                if value is None:
+                    self.negative_hits += 1
+                    raise HTTPException(404, "Location not found")
+                self.hits += 1
+                return dict(value)
+            del self._entries[key]
+
+        if self.shared is not None:
+            entry = await run_backend(self.shared, "get", f"geocode:{key}")
+            if entry is not None:
+                value, stored_at = entry
+                remaining = stored_at + (self.negative_ttl if value is None else self.ttl) - time.time()
+                if remaining > 0:
+                    self.shared_hits += 1
+                    self._store(key, value, remaining)
+                    if value is None:
+                        raise HTTPException(404, "Location not found")
+                    return dict(value)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # A task of its own, so no single caller owns the lookup.
+            task = self._inflight[key] = asyncio.get_running_loop().create_task(self._resolve(key, resolve))
+            task.add_done_callback(functools.partial(self._resolved, key))
+        # shield() so a cancelled caller (client gone) leaves the lookup running for the others
+        return dict(await asyncio.shield(task))
+
+    async def _resolve(self, key: str, resolve: Callable[[], Awaitable[Dict[str, float]]]) -> Dict[str, float]:
+        try:
+            value = await self._resolve_shared(key, resolve)
+        except HTTPException as exc:
+            if exc.status_code == 404:
+                self._store(key, None, self.negative_ttl)
+            raise
+        self._store(key, value, self.ttl)
+        return value
+
+    def _resolved(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved: every caller may have gone
+
+    def _store(self, key: str, value: Optional[Dict[str, float]], ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _resolve_shared(
+        self, key: str, resolve: Callable[[], Awaitable[Dict[str, float]]]
+    ) -> Dict[str, float]:
+        """``resolve()`` and publish the answer, or take the one another worker publishes meanwhile."""
+        if self.shared is None:
+            return await resolve()
+        shared_key = f"geocode:{key}"
+        leased, peer = False, None
+        if self.shared_wait:
+            leased, peer = await await_lease(self.shared, shared_key, self.shared_wait)
+        if peer is not None:
+            self.shared_hits += 1
+            if peer[0] is None:
+                raise HTTPException(404, "Location not found")
+            return peer[0]
+        try:
+            value = await resolve()
+        except HTTPException as exc:
+            if exc.status_code == 404:
+                await run_backend(self.shared, "set", shared_key, None, time.time())
+            raise
+        else:
+            await run_backend(self.shared, "set", shared_key, value, time.time())
+            return value
+        finally:
+            if leased:
+                release_soon(self.shared, shared_key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "shared_hits": self.shared_hits,
+            "evictions": self.evictions,
+        }
+
+
+geocode_cache = GeocodeCache(
+    ttl=settings.geocode_cache_ttl,
+    negative_ttl=settings.geocode_negative_ttl,
+    maxsize=settings.geocode_cache_size,
+    shared=response_cache.backend if settings.response_cache_backend == "sqlite" else None,
+    shared_wait=settings.shared_fetch_wait,
+)
+
+# ---------------------------------------------------------------------------
+# 6.  LOCATION HELPERS
 # ---------------------------------------------------------------------------
 
 def is_zip(txt: str) -> bool:
@@ -129,25 +519,33 @@ def is_zip(txt: str) -> bool:
     return bool(_zip_re.fullmatch(txt.strip()))
 
 
-def lookup_zip(zip_code: str, country: str = "us") -> Dict[str, float]:
-    url = (
-        "http://api.openweathermap.org/geo/1.0/zip"
-        f"?zip={zip_code},{country}&appid={settings.openweather_api_key}"
-    )
-    r = requests.get(url, timeout=10)
-    r.raise_for_status()
-    data = r.json()
+async def lookup_zip(zip_code: str, country: str = "us") -> Dict[str, float]:
+    data = await get_client().get_json("/geo/1.0/zip", {"zip": f"{zip_code},{country}"})
     return {"lat": float(data["lat"]), "lon": float(data["lon"])}
 
 
-def validate_location(raw: str) -> Dict[str, float]:
-    key = settings.openweather_api_key
-    if not key or key == "your_openweather_api_key":
-        raise HTTPException(500, "API key mis-configured")
+async def suggest_locations(q: str, limit: int = 5) -> List[Dict[str, Any]]:
+    """
+    Autocomplete matches in OpenWeather direct-geocoding format.
 
-    query = raw.strip()
+    Answered from the local place index when it has any prefix match;
+    otherwise asks upstream and merges the answer into the index.
+    """
+    index = places.get_index()
+    local = index.suggest(q, limit)
+    if local:
+        return local
+    try:
+        results = await get_client().get_json("/geo/1.0/direct", {"q": q, "limit": limit})
+    except httpx.HTTPError as exc:
+        raise upstream_error(exc, "Suggestion service unavailable") from exc
+    if settings.place_index_learn:
+        await run_in_threadpool(index.learn, results)  # appends to the overlay file
+    return results
 
-    # 0) Check if input looks like coordinates: "lat,lon"
+
+def parse_coords(query: str) -> Optional[Dict[str, float]]:
+    """Return ``{"lat", "lon"}`` if *query* is a valid "lat,lon" pair, else None."""
     if ',' in query:
         parts = query.split(',')
         if len(parts) == 2:
@@ -159,32 +557,55 @@ def validate_location(raw: str) -> Dict[str, float]:
                     return {"lat": lat, "lon": lon}
             except ValueError:
                 pass  # Not valid floats, fall through to other logic
+    return None
+
+
+async def validate_location(raw: str) -> Dict[str, float]:
+    key = settings.openweather_api_key
+    if not key or key == "your_openweather_api_key":
+        raise HTTPException(500, "API key mis-configured")
+
+    query = raw.strip()
+
+    # 0) Check if input looks like coordinates: "lat,lon"
+    coords = parse_coords(query)
+    if coords is not None:
+        return coords
 
     # 1) ZIP code path
     if is_zip(query):
-        try:
-            return lookup_zip(query)
-        except requests.exceptions.RequestException as exc:
-            raise HTTPException(502, f"Weather service unavailable: {exc}") from exc
+        return await geocode_cache.get_or_resolve(f"zip:{query}", lambda: _geocode_zip(query))
 
     # 2) Generic place / landmark
+    return await geocode_cache.get_or_resolve(
+        f"q:{normalize_location(query)}", lambda: _geocode_direct(query)
+    )
+
+
+async def _geocode_zip(query: str) -> Dict[str, float]:
     try:
-        url = (
-            "http://api.openweathermap.org/geo/1.0/direct"
-            f"?q={quote(query)}&limit=5&appid={key}"
-        )
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        if not data:
-            raise HTTPException(404, "Location not found")
-        hit = data[0]  # first hit (landmark, city, etc.)
-        return {"lat": float(hit["lat"]), "lon": float(hit["lon"])}
-    except requests.exceptions.RequestException as exc:
-        raise HTTPException(502, f"Weather service unavailable: {exc}") from exc
-
-
-def parse_location_input(raw: str) -> Dict[str, float]:
+        return await lookup_zip(query)
+    except httpx.HTTPStatusError as exc:
+        # OpenWeather answers 404 for a ZIP it does not know: a miss, not an outage.
+        if exc.response.status_code == 404:
+            raise HTTPException(404, "Location not found") from exc
+        raise upstream_error(exc) from exc
+    except httpx.HTTPError as exc:
+        raise upstream_error(exc) from exc
+
+
+async def _geocode_direct(query: str) -> Dict[str, float]:
+    try:
+        data = await get_client().get_json("/geo/1.0/direct", {"q": query, "limit": 5})
+    except httpx.HTTPError as exc:
+        raise upstream_error(exc) from exc
+    if not data:
+        raise HTTPException(404, "Location not found")
+    hit = data[0]  # first hit (landmark, city, etc.)
+    return {"lat": float(hit["lat"]), "lon": float(hit["lon"])}
+
+
+async def parse_location_input(raw: str) -> Dict[str, float]:
     """
     Parse the raw location input and return latitude and longitude.
     Supports:
@@ -192,23 +613,4 @@ def parse_location_input(raw: str) -> Dict[str, float]:
      - US ZIP codes (validated by regex)
      - Generic place names (city, landmark, town, etc)
     """
-    raw = raw.strip()
-    
-    # 1) Check if it's GPS coordinates like "37.7749,-122.4194"
-    if ',' in raw:
-        parts = raw.split(',')
-        if len(parts) == 2:
-            try:
-                lat = float(parts[0].strip())
-                lon = float(parts[1].strip())
-                if -90 <= lat <= 90 and -180 <= lon <= 180:
-                    return {"lat": lat, "lon": lon}
-            except ValueError:
-                pass  # Not valid float coordinates, fall through to next checks
-
-    # 2) Check if it's a ZIP code
-    if is_zip(raw):
-        return lookup_zip(raw)
-    
-    # 3) Otherwise treat as generic place name
-    return validate_location(raw)
+    return await validate_location(raw)
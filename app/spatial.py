@@ -0,0 +1,104 @@
+#spatial.py
+"""
+Coordinate quantisation for the response cache.
+
+Coordinates are snapped to geohash cells; every lookup inside a cell shares
+one upstream request (made for the cell centre) and one cache entry keyed
+by the geohash, so finding a cell's weather is a single dict / primary-key
+lookup.  Approximate cell sizes at the equator:
+
+    precision 5  ~ 4.9 km x 4.9 km
+    precision 6  ~ 1.2 km x 0.6 km
+    precision 7  ~ 153 m x 153 m
+"""
+import math
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+EARTH_RADIUS_M = 6_371_000
+
+
+class Cell(NamedTuple):
+    geohash: str
+    lat: float          # cell centre
+    lon: float
+    error_m: float      # distance from the requested point to the centre
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "geohash": self.geohash,
+            "lat": self.lat,
+            "lon": self.lon,
+            "error_m": round(self.error_m, 1),
+        }
+
+
+def encode(lat: float, lon: float, precision: int) -> str:
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars = []
+    bits = bit = 0
+    even = True  # longitude first
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                bits = bits * 2 + 1
+                lon_lo = mid
+            else:
+                bits *= 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = bits * 2 + 1
+                lat_lo = mid
+            else:
+                bits *= 2
+                lat_hi = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(_BASE32[bits])
+            bits = bit = 0
+    return "".join(chars)
+
+
+@lru_cache(maxsize=65536)
+def bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """``(lat_lo, lat_hi, lon_lo, lon_hi)`` of a geohash cell."""
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            on = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if on else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if on else (lat_lo, mid)
+            even = not even
+    return lat_lo, lat_hi, lon_lo, lon_hi
+
+
+def centre(geohash: str) -> Tuple[float, float]:
+    lat_lo, lat_hi, lon_lo, lon_hi = bounds(geohash)
+    # Rounded so the upstream request and cache key are stable and short.
+    return round((lat_lo + lat_hi) / 2, 6), round((lon_lo + lon_hi) / 2, 6)
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def snap(lat: float, lon: float, precision: int) -> Cell:
+    """The cell containing ``(lat, lon)`` at *precision* geohash characters."""
+    geohash = encode(lat, lon, precision)
+    c_lat, c_lon = centre(geohash)
+    return Cell(geohash, c_lat, c_lon, haversine_m(lat, lon, c_lat, c_lon))
@@ -0,0 +1,101 @@
+#workers.py
+"""
+Helpers for running several API workers on one host (see gunicorn.conf.py).
+
+Each worker is a separate process with its own event loop, HTTP client and
+caches.  What they must not duplicate is work against OpenWeather: the
+response and geocode caches share a SQLite file (``response_cache_backend
+= "sqlite"``), the upstream quota is split between workers, and only one
+worker at a time runs the prefetcher, chosen with a file lock.  The
+prefetcher's budget is taken off the quota before the split, since the
+leader spends it on top of its own share.
+"""
+import gc
+import logging
+import os
+from typing import IO, Optional
+
+from .config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no multi-worker mode, every process leads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def worker_share(value: float) -> float:
+    """This worker's part of a host-wide budget such as the upstream quota."""
+    return value / max(1, settings.web_concurrency)
+
+
+def prefetch_budget() -> float:
+    """Upstream calls per minute reserved for the prefetcher, at most half the quota."""
+    if not settings.prefetch_enabled:
+        return 0.0
+    return min(settings.prefetch_rate_per_minute, settings.upstream_rate_per_minute / 2)
+
+
+def request_share() -> float:
+    """This worker's upstream calls per minute for serving requests."""
+    return worker_share(settings.upstream_rate_per_minute - prefetch_budget())
+
+
+class LeaderLock:
+    """
+    Non-blocking exclusive lock on a file; at most one process holds it.
+
+    ``held()`` is cheap to call repeatedly: a worker that did not get the lock
+    tries again, so leadership moves on when the leader exits (the kernel
+    drops the lock with the process).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fh: Optional[IO] = None
+
+    def held(self) -> bool:
+        if self._fh is not None:
+            return True
+        if fcntl is None:
+            return True
+        fh = open(self.path, "a+")
+        try:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        fh.seek(0)
+        fh.truncate()
+        fh.write(f"{os.getpid()}\n")
+        fh.flush()
+        self._fh = fh
+        logger.info(f"Worker {os.getpid()} holds {self.path}")
+        return True
+
+    def release(self) -> None:
+        if self._fh is not None:
+            fh, self._fh = self._fh, None
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            fh.close()
+
+
+prefetch_leader = LeaderLock(settings.prefetch_lock_path)
+
+
+def prefork_warmup() -> None:
+    """
+    Load read-only data in the master before workers fork.
+
+    The place index is an mmap, so its pages are shared by every worker
+    anyway; loading it here also shares the Python objects built around it.
+    ``gc.freeze()`` moves everything imported so far out of the collector's
+    reach, so collections in the workers do not touch (and copy) those pages.
+    """
+    from . import places
+
+    places.get_index()
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Pre-fork warmup done, {gc.get_freeze_count()} objects frozen")
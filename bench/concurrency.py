@@ -0,0 +1,60 @@
+#concurrency.py
+"""
+Fire N concurrent current-weather lookups at the API against the fake upstream.
+
+    python -m bench.concurrency --requests 2000 --latency-ms 200
+
+With a blocking client the wall time grows with N / threadpool size; with the
+async client it should stay close to a single upstream round trip.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+async def _run(n: int, distinct: int) -> float:
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *(client.get(f"/weather/current/City{i % distinct}") for i in range(n))
+        )
+        elapsed = time.perf_counter() - start
+    failed = sum(1 for r in responses if r.status_code != 200)
+    if failed:
+        print(f"{failed} requests failed, first: {next(r for r in responses if r.status_code != 200).text}")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--distinct", type=int, default=100, help="number of distinct city names")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--port", type=int, default=9001)
+    args = parser.parse_args()
+
+    from bench.fake_openweather import running_fake_server
+
+    with tempfile.TemporaryDirectory() as workdir, running_fake_server(args.port, args.latency_ms) as base_url:
+        os.environ["OPENWEATHER_BASE_URL"] = base_url
+        # Startup migrates the database; keep the real one untouched.
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ.setdefault("PREFETCH_ENABLED", "false")
+        os.environ.setdefault("OPENWEATHER_API_KEY", "bench")
+        # Measure the app, not the production quota.
+        os.environ.setdefault("UPSTREAM_RATE_PER_MINUTE", "1000000")
+        elapsed = asyncio.run(_run(args.requests, args.distinct))
+
+    print(f"{args.requests} requests, upstream latency {args.latency_ms:.0f}ms: "
+          f"{elapsed:.2f}s wall, {args.requests / elapsed:.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
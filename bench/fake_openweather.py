@@ -0,0 +1,238 @@
+#fake_openweather.py
+"""
+Local stand-in for the OpenWeather endpoints the app calls.
+
+Answers replay the payloads in ``bench/payloads/`` (``weather``, ``forecast``,
+``direct``, ``zip``), with coordinates, names and timestamps rewritten per
+request.  Replace them with live captures using
+
+    python -m bench.fake_openweather record --api-key KEY [--city London --zip 10001]
+
+Run standalone with ``uvicorn bench.fake_openweather:app --port 9001`` and
+point the API at it with ``OPENWEATHER_BASE_URL=http://127.0.0.1:9001``, or
+use ``running_fake_server()`` to start it in a background process.
+
+Latency and faults come from the environment (``FAKE_OW_LATENCY_MS``,
+``FAKE_OW_JITTER_MS``, ``FAKE_OW_ERROR_RATE``, ``FAKE_OW_ERROR_STATUS``, a
+comma-separated list) and can be changed at runtime with
+``POST /_fake/config``.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+PAYLOAD_DIR = Path(os.getenv("FAKE_OW_PAYLOADS", Path(__file__).resolve().parent / "payloads"))
+
+
+@lru_cache(maxsize=None)
+def _recorded(name: str) -> Any:
+    with open(PAYLOAD_DIR / f"{name}.json", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _current_payload(lat: float, lon: float) -> dict:
+    data = copy.deepcopy(_recorded("weather"))
+    data["coord"] = {"lon": lon, "lat": lat}
+    data["dt"] = int(time.time())
+    return data
+
+
+def _forecast_payload(lat: float, lon: float) -> dict:
+    data = copy.deepcopy(_recorded("forecast"))
+    slots = data["list"]
+    # Keep the recorded spacing, starting at the current 3-hour boundary.
+    shift = int(time.time()) // 10800 * 10800 - slots[0]["dt"]
+    for slot in slots:
+        slot["dt"] += shift
+        slot["dt_txt"] = datetime.fromtimestamp(slot["dt"], tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    data["city"]["coord"] = {"lat": lat, "lon": lon}
+    return data
+
+
+def _direct_payload(q: str, limit: int) -> List[dict]:
+    if q.lower().startswith("nowhere"):
+        return []
+    # Stable pseudo-coordinates per query so different cities differ.
+    h = sum(ord(c) for c in q.lower())
+    name = q.split(",")[0].strip().title()
+    lat, lon = (h % 180) - 90 + 0.5, (h * 7 % 360) - 180 + 0.5
+    places = copy.deepcopy(_recorded("direct"))[:limit]
+    for i, place in enumerate(places):
+        place["name"] = name
+        place["lat"], place["lon"] = lat + i * 0.37, lon - i * 0.41
+        place.pop("local_names", None)
+    return places
+
+
+def _zip_payload(code: str) -> dict:
+    data = dict(_recorded("zip"))
+    data.update(zip=code, lat=40.0 + int(code[:2]) / 100)
+    return data
+
+
+class Faults:
+    """Latency (fixed + uniform jitter) and a random error rate, shared by all routes."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 error_status: Optional[List[int]] = None) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status or [503]
+        self.served = 0
+        self.injected = 0
+
+    async def apply(self) -> Optional[JSONResponse]:
+        self.served += 1
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000.0)
+        if self.error_rate and random.random() < self.error_rate:
+            self.injected += 1
+            status = random.choice(self.error_status)
+            return JSONResponse({"cod": status, "message": "injected fault"}, status_code=status)
+        return None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms, "error_rate": self.error_rate,
+                "error_status": self.error_status, "served": self.served, "injected": self.injected}
+
+
+def faults_from_env() -> Faults:
+    return Faults(
+        latency_ms=float(os.getenv("FAKE_OW_LATENCY_MS", "0")),
+        jitter_ms=float(os.getenv("FAKE_OW_JITTER_MS", "0")),
+        error_rate=float(os.getenv("FAKE_OW_ERROR_RATE", "0")),
+        error_status=[int(s) for s in os.getenv("FAKE_OW_ERROR_STATUS", "503").split(",") if s],
+    )
+
+
+def create_app(latency_ms: float = 0.0, faults: Optional[Faults] = None) -> FastAPI:
+    """Build a fake upstream; ``faults`` defaults to a fixed ``latency_ms`` and no errors."""
+    fake = FastAPI()
+    faults = faults or Faults(latency_ms=latency_ms)
+
+    @fake.get("/data/2.5/weather")
+    async def weather(lat: float, lon: float):
+        return await faults.apply() or _current_payload(lat, lon)
+
+    @fake.get("/data/2.5/forecast")
+    async def forecast(lat: float, lon: float):
+        return await faults.apply() or _forecast_payload(lat, lon)
+
+    @fake.get("/geo/1.0/direct")
+    async def direct(q: str, limit: int = 5):
+        return await faults.apply() or _direct_payload(q, limit)
+
+    @fake.get("/geo/1.0/zip")
+    async def zip_code(zip: str = Query(...)):
+        return await faults.apply() or _zip_payload(zip.split(",")[0])
+
+    @fake.get("/_fake/config")
+    async def get_config():
+        return faults.as_dict()
+
+    @fake.post("/_fake/config")
+    async def set_config(changes: Dict[str, Any]):
+        for key in ("latency_ms", "jitter_ms", "error_rate", "error_status"):
+            if key in changes:
+                setattr(faults, key, changes[key])
+        return faults.as_dict()
+
+    return fake
+
+
+app = create_app(faults=faults_from_env())
+
+
+@contextmanager
+def running_fake_server(port: int = 9001, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                        error_rate: float = 0.0, error_status: str = "503") -> Iterator[str]:
+    """
+    Serve the fake upstream on 127.0.0.1:``port`` for the duration of the block.
+
+    It runs in a child process so its CPU use does not skew measurements of
+    the API process.
+    """
+    env = dict(os.environ, FAKE_OW_LATENCY_MS=str(latency_ms), FAKE_OW_JITTER_MS=str(jitter_ms),
+               FAKE_OW_ERROR_RATE=str(error_rate), FAKE_OW_ERROR_STATUS=error_status)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "bench.fake_openweather:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("fake OpenWeather server failed to start")
+                time.sleep(0.05)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.wait()
+
+# ---------------------------------------------------------------------------
+# Recording live payloads
+# ---------------------------------------------------------------------------
+
+def record(api_key: str, city: str, zip_code: str, base_url: str = "https://api.openweathermap.org") -> None:
+    """Overwrite ``bench/payloads/*.json`` with live answers from OpenWeather."""
+    import httpx
+
+    with httpx.Client(base_url=base_url, timeout=10) as client:
+        def get(path: str, **params: Any) -> Any:
+            r = client.get(path, params=dict(params, appid=api_key))
+            r.raise_for_status()
+            return r.json()
+
+        places = get("/geo/1.0/direct", q=city, limit=5)
+        if not places:
+            raise SystemExit(f"OpenWeather does not know {city!r}")
+        lat, lon = places[0]["lat"], places[0]["lon"]
+        captured = {
+            "direct": places,
+            "zip": get("/geo/1.0/zip", zip=f"{zip_code},us"),
+            "weather": get("/data/2.5/weather", lat=lat, lon=lon, units="metric"),
+            "forecast": get("/data/2.5/forecast", lat=lat, lon=lon, units="metric"),
+        }
+    PAYLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    for name, payload in captured.items():
+        with open(PAYLOAD_DIR / f"{name}.json", "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, indent=1)
+            fh.write("\n")
+        print(f"wrote {PAYLOAD_DIR / name}.json")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record payloads for the fake OpenWeather server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="capture live payloads into bench/payloads/")
+    rec.add_argument("--api-key", default=os.getenv("OPENWEATHER_API_KEY"), required=not os.getenv("OPENWEATHER_API_KEY"))
+    rec.add_argument("--city", default="London")
+    rec.add_argument("--zip", default="10001")
+    args = parser.parse_args()
+    record(args.api_key, args.city, args.zip)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#forecast_format.py
+"""
+CPU time and payload size of /weather/forecast bodies.
+
+    python -m bench.forecast_format --iterations 2000
+
+Compares the previous path (slot dicts through ``jsonable_encoder`` and
+``json.dumps``), ``responses.dumps`` on fresh slots, the memoised body
+served for a cached forecast, and the columnar format.  Sizes are reported
+raw, gzipped at the configured level and, when installed, brotli-compressed.
+"""
+import argparse
+import json
+import os
+import time
+import zlib
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "bench")
+
+
+def _series():
+    from app.forecast import ForecastSeries
+    from bench.fake_openweather import _forecast_payload
+
+    return ForecastSeries.from_payload(_forecast_payload(51.5, -0.12))
+
+
+def _cpu_us(fn, iterations: int) -> float:
+    fn()
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    from fastapi.encoders import jsonable_encoder
+
+    from app import responses
+    from app.compression import brotli
+    from app.config import settings
+
+    series = _series()
+
+    def baseline() -> bytes:
+        return json.dumps(jsonable_encoder(series.slots())).encode()
+
+    def fresh_slots() -> bytes:
+        series._encoded.clear()
+        return responses.forecast_body(series, "slots")
+
+    def fresh_columnar() -> bytes:
+        series._encoded.clear()
+        return responses.forecast_body(series, "columnar")
+
+    cases = [
+        ("slots, jsonable_encoder + json", baseline),
+        ("slots, responses.dumps", fresh_slots),
+        ("slots, cached body", lambda: responses.forecast_body(series, "slots")),
+        ("columnar, responses.dumps", fresh_columnar),
+        ("columnar, cached body", lambda: responses.forecast_body(series, "columnar")),
+    ]
+    print(f"JSON encoder: {'orjson' if responses.orjson is not None else 'stdlib json'}")
+    print(f"{'case':34} {'cpu us':>9} {'raw B':>7} {'gzip B':>7} {'br B':>7}")
+    for name, fn in cases:
+        cpu = _cpu_us(fn, args.iterations)
+        body = fn()
+        gz = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        gz_size = len(gz.compress(body) + gz.flush())
+        br_size = str(len(brotli.compress(body, quality=settings.compression_brotli_quality))) if brotli else "-"
+        print(f"{name:34} {cpu:9.1f} {len(body):7d} {gz_size:7d} {br_size:>7}")
+
+
+if __name__ == "__main__":
+    main()
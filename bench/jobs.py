@@ -0,0 +1,137 @@
+#jobs.py
+"""
+Write latency of ``POST /weather/`` with and without the job queue.
+
+    python -m bench.jobs --records 200 --locations 50 --latency-ms 300
+
+Starts the fake OpenWeather server with ``--latency-ms`` per call and the
+API in a child process, then creates ``--records`` records spread over
+``--locations`` distinct places, first synchronously and then with
+``?mode=async``.  Reported per mode: request latency, and for async mode the
+time until every job finished and the upstream calls made, which follow
+the number of distinct locations rather than the number of records.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from bench.load import summarize
+from bench.workers import _upstream_served, _wait_for_port
+
+
+async def _post_all(client: httpx.AsyncClient, mode: str, names: List[str], concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    job_ids = set()
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(name: str) -> None:
+        nonlocal errors
+        async with sem:
+            t = time.perf_counter()
+            r = await client.post(f"/weather/?mode={mode}", json={"location": name})
+            if r.status_code in (200, 202):
+                latencies.append(time.perf_counter() - t)
+                if r.status_code == 202:
+                    job_ids.add(r.json()["job_id"])
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(name) for name in names))
+    result = summarize(latencies, errors, time.perf_counter() - start)
+    result["job_ids"] = sorted(job_ids)
+    return result
+
+
+async def _drain(client: httpx.AsyncClient, job_ids: List[int], timeout: float) -> Dict[str, Any]:
+    start = time.perf_counter()
+    deadline = start + timeout
+    statuses: Dict[str, int] = {}
+    while time.perf_counter() < deadline:
+        rows = await asyncio.gather(*(client.get(f"/jobs/{i}") for i in job_ids))
+        statuses = {}
+        for r in rows:
+            status = r.json()["status"]
+            statuses[status] = statuses.get(status, 0) + 1
+        if statuses.get("pending", 0) + statuses.get("running", 0) == 0:
+            break
+        await asyncio.sleep(0.1)
+    return {"drain_s": round(time.perf_counter() - start, 2), "statuses": statuses}
+
+
+async def _run(args: argparse.Namespace, fake_url: str) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"records": args.records, "locations": args.locations, "latency_ms": args.latency_ms}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as client:
+        for mode in ("sync", "async"):
+            # A fresh set of names per mode, so neither profits from the other's geocode cache.
+            names = [f"{mode}town{i % args.locations}" for i in range(args.records)]
+            served = _upstream_served(fake_url)
+            result = await _post_all(client, mode, names, args.concurrency)
+            job_ids = result.pop("job_ids")
+            if job_ids:
+                result["jobs"] = len(job_ids)
+                result.update(await _drain(client, job_ids, args.timeout))
+            result["upstream_calls"] = _upstream_served(fake_url) - served
+            report[mode] = result
+            print(f"{mode:5s}: p50={result['p50_ms']}ms p99={result['p99_ms']}ms  "
+                  f"upstream={result['upstream_calls']}"
+                  + (f"  jobs={result['jobs']} drained in {result['drain_s']}s" if job_ids else ""),
+                  file=sys.stderr)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--locations", type=int, default=50, help="distinct places among the records")
+    parser.add_argument("--latency-ms", type=float, default=300, help="upstream latency per call")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for the queue to drain")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--fake-port", type=int, default=9001)
+    parser.add_argument("--output", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    from bench.fake_openweather import running_fake_server
+
+    with running_fake_server(args.fake_port, latency_ms=args.latency_ms) as fake_url, \
+            tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            OPENWEATHER_API_KEY=os.environ.get("OPENWEATHER_API_KEY", "bench"),
+            OPENWEATHER_BASE_URL=fake_url,
+            DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            PLACE_INDEX_PATH=os.path.join(workdir, "places.idx"),
+            UPSTREAM_RATE_PER_MINUTE="1000000",
+            PREFETCH_ENABLED="false",
+            LOG_FILE="",
+            LOG_LEVEL="WARNING",
+            PYTHONPATH=os.getcwd(),
+        )
+        proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                                 "--port", str(args.port), "--log-level", "warning", "--no-access-log"], env=env)
+        try:
+            _wait_for_port(args.port, proc)
+            report = asyncio.run(_run(args, fake_url))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
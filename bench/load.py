@@ -0,0 +1,323 @@
+#load.py
+"""
+Scripted load scenarios against ``app.main:app`` with an offline upstream.
+
+    python -m bench.load --concurrency 50 --requests 2000 --output before.json
+    python -m bench.load --latency-ms 80 --jitter-ms 40 --error-rate 0.02 --scenarios search
+    python -m bench.load compare before.json after.json
+
+The app runs in-process (``httpx.ASGITransport``, lifespan included) on a
+throwaway SQLite database and place index; OpenWeather is replaced by
+``bench.fake_openweather`` in a child process.  Scenarios:
+
+* ``search``: a burst of ``/weather/overview/{city}`` lookups over
+  ``--distinct`` cities, so both cold and cached paths are exercised;
+* ``autocomplete``: users typing place names, one ``/location/suggest``
+  request per keystroke from the second character on;
+* ``records``: create / read / update / list / delete of WeatherRecords;
+* ``export``: one bulk CSV ingest, then concurrent CSV and NDJSON exports.
+
+The JSON report holds, per scenario and per route, request and error
+counts, throughput and p50 / p95 / p99 / max latency in milliseconds.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+SCENARIOS = ("search", "autocomplete", "records", "export")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ms = sorted(x * 1000 for x in latencies)
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "rps": round(len(ms) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(ms[-1], 2) if ms else 0.0,
+    }
+
+
+class Recorder:
+    """Times requests of one scenario, grouped by route template."""
+
+    def __init__(self, client) -> None:
+        self.client = client
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.status: Dict[str, int] = {}
+
+    async def call(self, route: str, method: str, url: str, ok: tuple = (200,), **kwargs: Any):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            await response.aread()
+            status = str(response.status_code)
+        except Exception as exc:
+            response, status = None, type(exc).__name__
+        self.latencies.setdefault(route, []).append(time.perf_counter() - start)
+        self.status[status] = self.status.get(status, 0) + 1
+        if response is None or response.status_code not in ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        everything = [x for values in self.latencies.values() for x in values]
+        out = summarize(everything, sum(self.errors.values()), elapsed)
+        out["duration_s"] = round(elapsed, 3)
+        out["status"] = dict(sorted(self.status.items()))
+        out["routes"] = {
+            route: summarize(values, self.errors.get(route, 0), elapsed)
+            for route, values in sorted(self.latencies.items())
+        }
+        return out
+
+
+async def _bounded(jobs: List[Callable[[], Awaitable[None]]], concurrency: int) -> None:
+    queue = iter(jobs)
+
+    async def worker() -> None:
+        for job in queue:
+            await job()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+# ---------------------------------------------------------------------------
+# Scenarios: each returns the jobs to run for ``n`` requests
+# ---------------------------------------------------------------------------
+
+def search_jobs(rec: Recorder, n: int, ctx: Dict[str, Any]) -> List[Callable]:
+    cities = [f"City{i}" for i in range(ctx["distinct"])]
+    rng = random.Random(1)
+
+    def job(city: str):
+        return lambda: rec.call("GET /weather/overview/{location}", "GET", f"/weather/overview/{city}")
+
+    return [job(rng.choice(cities)) for _ in range(n)]
+
+
+def autocomplete_jobs(rec: Recorder, n: int, ctx: Dict[str, Any]) -> List[Callable]:
+    rng = random.Random(2)
+    jobs, issued = [], 0
+    while issued < n:
+        name = rng.choice(ctx["place_names"])
+        prefixes = [name[:i] for i in range(2, min(len(name), 10) + 1)]
+        issued += len(prefixes)
+
+        async def typing(prefixes=prefixes) -> None:
+            for prefix in prefixes:
+                await rec.call("GET /location/suggest", "GET", "/location/suggest", params={"q": prefix})
+
+        jobs.append(typing)
+    return jobs
+
+
+def records_jobs(rec: Recorder, n: int, ctx: Dict[str, Any]) -> List[Callable]:
+    cities = [f"City{i}" for i in range(ctx["distinct"])]
+
+    async def lifecycle(i: int) -> None:
+        r = await rec.call("POST /weather/", "POST", "/weather/", json={"location": cities[i % len(cities)]})
+        if r is None or r.status_code != 200:
+            return
+        record_id = r.json()["id"]
+        await rec.call("GET /weather/{record_id}", "GET", f"/weather/{record_id}")
+        await rec.call("PUT /weather/{record_id}", "PUT", f"/weather/{record_id}",
+                       json={"temperature": 21.5, "conditions": "Clear"})
+        await rec.call("GET /weather/", "GET", "/weather/", params={"limit": 50})
+        await rec.call("DELETE /weather/{record_id}", "DELETE", f"/weather/{record_id}")
+
+    return [lambda i=i: lifecycle(i) for i in range(max(1, n // 5))]
+
+
+def export_jobs(rec: Recorder, n: int, ctx: Dict[str, Any]) -> List[Callable]:
+    rng = random.Random(3)
+    lines = ["location,record_date,latitude,longitude"]
+    for i in range(ctx["export_rows"]):
+        lines.append(f"City{i % ctx['distinct']},2024-{1 + i % 12:02d}-{1 + i % 28:02d},"
+                     f"{rng.uniform(-60, 60):.4f},{rng.uniform(-170, 170):.4f}")
+    body = "\n".join(lines) + "\n"
+
+    async def seed() -> None:
+        await rec.call("POST /weather/bulk", "POST", "/weather/bulk", params={"format": "csv"}, content=body)
+
+    def export(fmt: str):
+        return lambda: rec.call("GET /weather/export", "GET", "/weather/export", params={"format": fmt})
+
+    # The ingest runs first and alone; exports then run concurrently.
+    return [seed] + [export("csv" if i % 2 else "ndjson") for i in range(max(1, n // 20))]
+
+
+JOB_BUILDERS = {
+    "search": search_jobs,
+    "autocomplete": autocomplete_jobs,
+    "records": records_jobs,
+    "export": export_jobs,
+}
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _prepare_environment(workdir: str, base_url: str, places: int) -> List[str]:
+    """Point the app at throwaway state; must run before ``app`` is imported."""
+    os.environ.update({
+        "OPENWEATHER_BASE_URL": base_url,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "RESPONSE_CACHE_BACKEND": "memory",
+        "PLACE_INDEX_PATH": os.path.join(workdir, "places.idx"),
+        "LOG_FILE": "",
+        "LOG_LEVEL": "WARNING",
+        "PREFETCH_ENABLED": "false",
+        # Measure the app, not the production quota.
+        "UPSTREAM_RATE_PER_MINUTE": "1000000",
+    })
+    os.environ.setdefault("OPENWEATHER_API_KEY", "bench")
+
+    from app import places as place_index
+    from bench.places import write_gazetteer
+
+    gazetteer = os.path.join(workdir, "places.txt")
+    names = write_gazetteer(gazetteer, places)
+    place_index.build_index(place_index.read_gazetteer(gazetteer), os.environ["PLACE_INDEX_PATH"])
+    return names
+
+
+async def _run(scenarios: List[str], n: int, concurrency: int, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    import httpx
+    from app.main import app
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for name in scenarios:
+                rec = Recorder(client)
+                jobs = JOB_BUILDERS[name](rec, n, ctx)
+                start = time.perf_counter()
+                if name == "export":
+                    await jobs[0]()
+                    jobs = jobs[1:]
+                await _bounded(jobs, concurrency)
+                results[name] = rec.report(time.perf_counter() - start)
+                print(f"{name:13} {results[name]['requests']:6d} req  {results[name]['rps']:8.1f} req/s  "
+                      f"p50 {results[name]['p50_ms']:7.2f}  p95 {results[name]['p95_ms']:7.2f}  "
+                      f"p99 {results[name]['p99_ms']:7.2f} ms  errors {results[name]['errors']}", file=sys.stderr)
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from bench.fake_openweather import running_fake_server
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as workdir, running_fake_server(
+        args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.error_status,
+    ) as base_url:
+        names = _prepare_environment(workdir, base_url, args.places)
+        ctx = {"distinct": args.distinct, "place_names": names, "export_rows": args.export_rows}
+        results = asyncio.run(_run(scenarios, args.requests, args.concurrency, ctx))
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "upstream": {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                         "error_rate": args.error_rate, "error_status": args.error_status},
+        },
+        "scenarios": results,
+    }
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """Print per-scenario and per-route changes between two reports."""
+    with open(old_path) as fh:
+        old = json.load(fh)
+    with open(new_path) as fh:
+        new = json.load(fh)
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    keys = ("rps", "p50_ms", "p95_ms", "p99_ms", "errors")
+    print(f"{'scenario / route':44} " + " ".join(f"{k:>20}" for k in keys))
+    for name, after in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if before is None:
+            continue
+        rows = [(name, before, after)] + [
+            (f"  {route}", before["routes"][route], stats)
+            for route, stats in after["routes"].items() if route in before["routes"]
+        ]
+        for label, b, a in rows:
+            cells = []
+            for k in keys:
+                change = f"{(a[k] - b[k]) / b[k] * 100:+.0f}%" if b[k] else ""
+                cells.append(f"{b[k]:>8g}->{a[k]:<8g}{change:>4}")
+            print(f"{label[:44]:44} " + " ".join(f"{c:>20}" for c in cells))
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        parser = argparse.ArgumentParser(prog="bench.load compare")
+        parser.add_argument("old")
+        parser.add_argument("new")
+        args = parser.parse_args(sys.argv[2:])
+        compare(args.old, args.new)
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="approximate requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--distinct", type=int, default=200, help="distinct cities searched / recorded")
+    parser.add_argument("--places", type=int, default=50_000, help="gazetteer size for autocomplete")
+    parser.add_argument("--export-rows", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls that fail")
+    parser.add_argument("--error-status", default="503", help="comma-separated statuses for injected errors")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
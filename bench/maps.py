@@ -0,0 +1,62 @@
+#maps.py
+"""
+CPU time and upstream reads of map grids.
+
+    python -m bench.maps --iterations 20
+
+Builds grids of several sizes with ``maps.build_grid`` from a stub fetch
+(counting the reads it would send upstream) and times the interpolation
+plus the ``json`` and ``binary`` encodings.  Reports whether the NumPy or
+the plain-Python path ran.
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "bench")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--anchors", type=int, default=3)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 128, 256])
+    args = parser.parse_args()
+
+    from app import maps
+
+    reads = 0
+
+    async def fetch(lat: float, lon: float):
+        nonlocal reads
+        reads += 1
+        return {"main": {"temp": 10 + lat % 7, "humidity": 40 + lon % 50}, "wind": {"speed": 2 + lat % 3}}
+
+    print(f"interpolation: {'numpy' if maps.np is not None else 'pure python'}, anchors {args.anchors}x{args.anchors}")
+    z, x, y = 8, 127, 85
+    for size in args.sizes:
+        build_ms, json_ms, binary_ms = [], [], []
+        for _ in range(args.iterations):
+            reads = 0
+            t = time.perf_counter()
+            grid = asyncio.run(maps.build_grid(maps.tile_bounds(z, x, y), size, size, fetch, args.anchors,
+                                               maps.tile_row_lats(z, y, size)))
+            build_ms.append((time.perf_counter() - t) * 1000)
+            t = time.perf_counter()
+            body_json = grid.encode("json")
+            json_ms.append((time.perf_counter() - t) * 1000)
+            t = time.perf_counter()
+            body_binary = grid.encode("binary")
+            binary_ms.append((time.perf_counter() - t) * 1000)
+        print(f"{size:3d}x{size:<3d} reads={reads:2d}  build={statistics.median(build_ms):6.1f}ms  "
+              f"json={statistics.median(json_ms):5.1f}ms ({len(body_json) // 1024}KB, "
+              f"gzip {len(gzip.compress(body_json, 6)) // 1024}KB)  "
+              f"binary={statistics.median(binary_ms):5.1f}ms ({len(body_binary) // 1024}KB, "
+              f"gzip {len(gzip.compress(body_binary, 6)) // 1024}KB)")
+
+
+if __name__ == "__main__":
+    main()
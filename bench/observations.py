@@ -0,0 +1,86 @@
+#observations.py
+"""
+Write throughput of the observation store and latency of history queries.
+
+    python -m bench.observations --cells 1000 --days 365
+
+Loads hourly readings for ``--cells`` cells over ``--days`` days into a
+temporary SQLite database through ``observations.write_batch`` (raw rows and
+rollups), then times a year of daily aggregates and a week of hourly ones
+for random cells.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "bench")
+
+
+def _readings(cells, start: int, hours: int, rng: random.Random):
+    for h in range(hours):
+        ts = start + h * 3600
+        for cell in cells:
+            t = 10 + 8 * rng.random()
+            yield {"cell": cell, "kind": "current", "observed_at": ts, "day": ts // 86400, "fetched_at": ts,
+                   "temperature": t, "humidity": 60.0, "wind_speed": 3.0, "conditions": "Clouds"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cells", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch", type=int, default=5000, help="readings per write_batch call")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    from sqlalchemy.orm import sessionmaker
+
+    from app import observations
+    from app.database import Base, build_engine
+
+    rng = random.Random(1)
+    cells = [f"cell{i:05d}" for i in range(args.cells)]
+    start = int(time.time()) // 86400 * 86400 - args.days * 86400
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{os.path.join(tmp, 'obs.db')}")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+
+        written = 0
+        t0 = time.perf_counter()
+        batch = []
+        with Session() as db:
+            for row in _readings(cells, start, args.days * 24, rng):
+                batch.append(row)
+                if len(batch) == args.batch:
+                    observations.write_batch(db, batch)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                observations.write_batch(db, batch)
+                written += len(batch)
+        elapsed = time.perf_counter() - t0
+        print(f"wrote {written} readings in {elapsed:.1f}s ({written / elapsed:,.0f}/s)")
+
+        end = start + args.days * 86400
+        for label, period, lo in (
+            (f"daily, {args.days} days", observations.DAY, start),
+            ("hourly, 7 days", observations.HOUR, end - 7 * 86400),
+        ):
+            samples = []
+            with Session() as db:
+                for _ in range(args.queries):
+                    cell = rng.choice(cells)
+                    t = time.perf_counter()
+                    rows = observations.query_rollups(db, cell, "current", period, lo, end)
+                    samples.append((time.perf_counter() - t) * 1000)
+            samples.sort()
+            print(f"{label:16} rows={len(rows):4d}  p50={statistics.median(samples):.2f}ms  "
+                  f"p99={samples[int(len(samples) * 0.99) - 1]:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#places.py
+"""
+Latency of local autocomplete lookups against a synthetic gazetteer.
+
+    python -m bench.places --places 200000 --queries 20000
+
+Builds a GeoNames-format file of random place names, indexes it with
+``app.places`` and times ``PlaceIndex.suggest`` for prefixes of 2..8
+characters taken from real entries (plus some misses).
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import tempfile
+import time
+
+os.environ.setdefault("OPENWEATHER_API_KEY", "bench")
+
+SYLLABLES = ["san", "ta", "ro", "mar", "el", "ber", "lin", "ca", "do", "ville", "burg", "port",
+             "new", "ka", "shi", "ma", "rio", "la", "no", "gra", "de", "os", "ton", "ham"]
+
+
+def _name(rng: random.Random) -> str:
+    words = rng.choice((1, 1, 1, 2))
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        for _ in range(words)
+    )
+
+
+def write_gazetteer(path: str, n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    names = []
+    with open(path, "w", encoding="utf-8") as fh:
+        for i in range(n):
+            name = _name(rng)
+            names.append(name)
+            cols = [""] * 19
+            cols[0], cols[1], cols[2] = str(i), name, name
+            cols[4], cols[5] = f"{rng.uniform(-60, 70):.4f}", f"{rng.uniform(-180, 180):.4f}"
+            cols[8], cols[10] = rng.choice(["US", "GB", "DE", "BR", "IN", "JP"]), str(rng.randint(1, 50))
+            cols[14] = str(int(rng.paretovariate(1.2) * 1000))
+            fh.write("\t".join(cols) + "\n")
+    return names
+
+
+def _pct(samples: list, p: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--places", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    args = parser.parse_args()
+
+    from app import places
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src, idx = os.path.join(tmp, "gazetteer.txt"), os.path.join(tmp, "places.idx")
+        names = write_gazetteer(src, args.places)
+
+        start = time.perf_counter()
+        count = places.build_index(places.read_gazetteer(src), idx)
+        build = time.perf_counter() - start
+        print(f"built {count} places in {build:.2f}s, {os.path.getsize(idx) / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        index = places.PlaceIndex(idx)
+        print(f"opened in {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+        rng = random.Random(2)
+        queries = []
+        for _ in range(args.queries):
+            if rng.random() < 0.1:
+                queries.append("".join(rng.choice(string.ascii_lowercase) for _ in range(5)))
+            else:
+                name = rng.choice(names)
+                queries.append(name[:rng.randint(2, min(8, len(name)))])
+
+        by_len = {}
+        empty = 0
+        for q in queries:
+            t0 = time.perf_counter()
+            hits = index.suggest(q)
+            by_len.setdefault(len(q), []).append((time.perf_counter() - t0) * 1e6)
+            empty += not hits
+
+        print(f"{len(queries)} queries, {empty} without local hits (would go upstream)")
+        print("prefix len   n       p50 µs   p99 µs")
+        for n in sorted(by_len):
+            samples = sorted(by_len[n])
+            print(f"{n:>10} {len(samples):>6} {statistics.median(samples):>9.1f} {_pct(samples, 0.99):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#startup.py
+"""
+Cold-start time of a new API worker.
+
+    python -m bench.startup --runs 10
+    python -m bench.startup --profile 25
+
+Each run starts a fresh interpreter that imports ``app.main``, runs the
+lifespan startup and serves a first DB request and a first upstream request
+(against the fake OpenWeather server).  The first run sees an empty
+database and therefore includes the schema migration; it is reported
+separately.  ``--profile N`` prints the N slowest imports from
+``python -X importtime``, the startup profile report.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_CHILD = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import app.main as main
+t1 = time.perf_counter()
+
+async def run():
+    import httpx
+    out = {"import_ms": (t1 - t0) * 1000}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t = time.perf_counter()
+        async with main.app.router.lifespan_context(main.app):
+            out["lifespan_ms"] = (time.perf_counter() - t) * 1000
+            for name, path in (("first_db_ms", "/weather/?limit=1"),
+                               ("first_upstream_ms", "/weather/current/London"),
+                               ("warm_upstream_ms", "/weather/current/London")):
+                t = time.perf_counter()
+                r = await client.get(path)
+                out[name] = (time.perf_counter() - t) * 1000
+                assert r.status_code == 200, (path, r.status_code, r.text)
+            out["phases_ms"] = dict(main.startup_profile)
+    return out
+
+print(json.dumps(asyncio.run(run())))
+"""
+
+METRICS = ("process_ms", "import_ms", "lifespan_ms", "first_db_ms", "first_upstream_ms", "warm_upstream_ms")
+
+
+def _env(workdir: str, base_url: str) -> dict:
+    return dict(
+        os.environ,
+        OPENWEATHER_API_KEY=os.environ.get("OPENWEATHER_API_KEY", "bench"),
+        OPENWEATHER_BASE_URL=base_url,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        RESPONSE_CACHE_BACKEND="memory",
+        PLACE_INDEX_PATH=os.path.join(workdir, "places.idx"),
+        LOG_FILE="",
+        LOG_LEVEL="WARNING",
+        PREFETCH_ENABLED="false",
+        PYTHONPATH=os.getcwd(),
+    )
+
+
+def _one(env: dict) -> dict:
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", _CHILD], env=env, capture_output=True, text=True)
+    wall = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_ms"] = wall
+    return result
+
+
+def profile(top: int) -> None:
+    """Print the slowest imports (cumulative and self time) of ``app.main``."""
+    env = dict(os.environ, OPENWEATHER_API_KEY=os.environ.get("OPENWEATHER_API_KEY", "bench"), PYTHONPATH=os.getcwd())
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                          env=env, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative_us), int(self_us), name))
+    total = next((c for c, _, n in rows if n == "app.main"), 0)
+    print(f"import app.main: {total / 1000:.1f} ms")
+    print(f"{'cumulative ms':>13} {'self ms':>8}  module")
+    for cumulative, own, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:13.1f} {own / 1000:8.1f}  {name.strip()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--profile", type=int, metavar="N", help="print the N slowest imports and exit")
+    parser.add_argument("--output", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    if args.profile:
+        profile(args.profile)
+        return
+
+    from bench.fake_openweather import running_fake_server
+
+    with tempfile.TemporaryDirectory() as workdir, running_fake_server(args.port) as base_url:
+        env = _env(workdir, base_url)
+        first = _one(env)
+        runs = [_one(env) for _ in range(args.runs)]
+
+    report = {
+        "first_boot": {k: round(first[k], 1) for k in METRICS},
+        "first_boot_phases_ms": first["phases_ms"],
+        "runs": args.runs,
+        "p50": {k: round(statistics.median(r[k] for r in runs), 1) for k in METRICS},
+        "max": {k: round(max(r[k] for r in runs), 1) for k in METRICS},
+        "phases_ms_p50": {k: round(statistics.median(r["phases_ms"][k] for r in runs), 2)
+                          for k in runs[0]["phases_ms"]},
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#workers.py
+"""
+Throughput, upstream calls and memory per number of API workers.
+
+    python -m bench.workers --workers 1 2 4 --duration 15 --clients 2
+
+For each worker count the API is started as a real server (gunicorn with
+``gunicorn.conf.py`` when installed, else ``uvicorn --workers``) against the
+fake OpenWeather server, with the SQLite response cache shared by all
+workers.  A warm-up pass requests every city once, then ``--clients`` load
+processes request random cities for ``--duration`` seconds.
+
+Reported per worker count: requests/s and latency, upstream calls made
+during warm-up and during the run (these should not grow with the worker
+count), and RSS / PSS of each worker (PSS counts shared pages once).
+Throughput can only scale up to the number of CPUs, including the ones the
+load generator uses.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from bench.load import summarize
+
+
+def _wait_for_port(port: int, proc: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("API server failed to start")
+            time.sleep(0.1)
+
+
+def _server_command(n: int, port: int) -> List[str]:
+    if importlib.util.find_spec("gunicorn") is not None:
+        return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app",
+                "--bind", f"127.0.0.1:{port}", "--workers", str(n), "--log-level", "warning"]
+    return [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(n), "--log-level", "warning", "--no-access-log"]
+
+
+def _worker_pids(pid: int) -> List[int]:
+    """Worker processes of the server *pid*; the server itself when it did not fork."""
+    out = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as fh:
+                ppid = int(fh.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline") as fh:
+                helper = "resource_tracker" in fh.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid and not helper:
+            out.append(int(entry))
+    return out or [pid]
+
+
+def _memory_kb(pid: int) -> Dict[str, int]:
+    """Rss and Pss of *pid* in kB (Linux only)."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fh:
+            for line in fh:
+                name, _, rest = line.partition(":")
+                if name in ("Rss", "Pss"):
+                    fields[name.lower() + "_kb"] = int(rest.split()[0])
+    except OSError:
+        pass
+    return fields
+
+
+def _upstream_served(fake_url: str) -> int:
+    return httpx.get(f"{fake_url}/_fake/config").json()["served"]
+
+
+async def _client(port: int, cities: int, duration: float, concurrency: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        async def worker() -> None:
+            nonlocal errors
+            while time.monotonic() < deadline:
+                t = time.perf_counter()
+                try:
+                    r = await client.get(f"/weather/current/City{rng.randrange(cities)}")
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - t)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {"latencies": latencies, "errors": errors, "elapsed": elapsed}
+
+
+def _client_process(args) -> Dict[str, Any]:
+    return asyncio.run(_client(*args))
+
+
+async def _warm(port: int, cities: int) -> None:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+        sem = asyncio.Semaphore(32)
+
+        async def one(i: int) -> None:
+            async with sem:
+                r = await client.get(f"/weather/current/City{i}")
+                r.raise_for_status()
+
+        await asyncio.gather(*(one(i) for i in range(cities)))
+
+
+def measure(n: int, args: argparse.Namespace, fake_url: str) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            OPENWEATHER_API_KEY=os.environ.get("OPENWEATHER_API_KEY", "bench"),
+            OPENWEATHER_BASE_URL=fake_url,
+            DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            RESPONSE_CACHE_BACKEND="sqlite",
+            RESPONSE_CACHE_PATH=os.path.join(workdir, "cache.db"),
+            PREFETCH_LOCK_PATH=os.path.join(workdir, "prefetch.lock"),
+            PLACE_INDEX_PATH=os.path.join(workdir, "places.idx"),
+            WEB_CONCURRENCY=str(n),
+            UPSTREAM_RATE_PER_MINUTE="1000000",
+            DB_MIGRATE_ON_STARTUP="false",
+            LOG_FILE="",
+            LOG_LEVEL="WARNING",
+            PYTHONPATH=os.getcwd(),
+        )
+        subprocess.run([sys.executable, "-m", "app.migrations"], env=env, check=True, capture_output=True)
+        proc = subprocess.Popen(_server_command(n, args.port), env=env)
+        try:
+            _wait_for_port(args.port, proc)
+            served = _upstream_served(fake_url)
+            asyncio.run(_warm(args.port, args.cities))
+            warm_calls = _upstream_served(fake_url) - served
+
+            served = _upstream_served(fake_url)
+            jobs = [(args.port, args.cities, args.duration, args.concurrency, seed) for seed in range(args.clients)]
+            with multiprocessing.Pool(args.clients) as pool:
+                parts = pool.map(_client_process, jobs)
+            run_calls = _upstream_served(fake_url) - served
+
+            memory = [_memory_kb(pid) for pid in _worker_pids(proc.pid)]
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    latencies = [x for p in parts for x in p["latencies"]]
+    result = summarize(latencies, sum(p["errors"] for p in parts), max(p["elapsed"] for p in parts))
+    result.update(
+        workers=n,
+        upstream_calls_warmup=warm_calls,
+        upstream_calls_run=run_calls,
+        worker_memory_kb=memory,
+    )
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--cities", type=int, default=200, help="distinct locations requested")
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per load process")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--fake-port", type=int, default=9001)
+    parser.add_argument("--output", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    from bench.fake_openweather import running_fake_server
+
+    report: Dict[str, Any] = {"cpus": os.cpu_count(), "cities": args.cities, "runs": []}
+    with running_fake_server(args.fake_port) as fake_url:
+        for n in args.workers:
+            result = measure(n, args, fake_url)
+            report["runs"].append(result)
+            pss = [m.get("pss_kb") for m in result["worker_memory_kb"] if m.get("pss_kb")]
+            print(f"workers={n}: {result['rps']:,.0f} req/s  p50={result['p50_ms']}ms  p99={result['p99_ms']}ms  "
+                  f"upstream warmup={result['upstream_calls_warmup']} run={result['upstream_calls_run']}  "
+                  f"PSS/worker={sum(pss) // max(1, len(pss)) // 1024 if pss else '?'}MB", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
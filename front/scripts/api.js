@@ -34,6 +34,31 @@ export async function fetchWeatherByCoords(lat, lon) {
     }
 }
 
+// Current conditions + forecast in one request. The server sends an ETag, so
+// repeat searches revalidate with a cheap 304 instead of a full download.
+export async function fetchOverview(location) {
+  try {
+    document.getElementById("loading").classList.remove("hidden");
+    const response = await fetch(`${API_BASE_URL}/weather/overview/${encodeURIComponent(location)}`);
+    if (!response.ok) {
+      let msg;
+      try {
+        const data = await response.json();
+        msg = data.detail || JSON.stringify(data);
+      } catch {
+        msg = await response.text();
+      }
+      throw new Error(msg || "Failed to fetch weather");
+    }
+    return await response.json();
+  } catch (err) {
+    console.error("Fetch overview failed:", err);
+    throw err;
+  } finally {
+    document.getElementById("loading").classList.add("hidden");
+  }
+}
+
 export async function fetchForecast(location) {
   try {
     document.getElementById("loading").classList.remove("hidden");
@@ -97,3 +122,29 @@ export async function fetchTodayForecast(location) {
   }
 }
 
+// One round trip for a whole list of saved cities. Each entry of `locations`
+// is a place name / ZIP string or a {lat, lon} object; per-item failures come
+// back as {ok: false, error} instead of failing the whole request.
+export async function fetchWeatherBatch(locations) {
+  const response = await fetch(`${API_BASE_URL}/weather/current/batch`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ locations }),
+  });
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.detail || "Failed to fetch weather batch");
+  }
+  return (await response.json()).results;
+}
+
+// Live current conditions over server-sent events. `onUpdate` receives the
+// same object as fetchWeather() each time the reading changes; the browser
+// reconnects by itself after network drops. Call close() on the result to stop.
+export function subscribeWeather(locations, onUpdate) {
+  const params = new URLSearchParams();
+  for (const location of [].concat(locations)) params.append("location", location);
+  const source = new EventSource(`${API_BASE_URL}/weather/live?${params}`);
+  source.addEventListener("weather", (event) => onUpdate(JSON.parse(event.data)));
+  return source;
+}
@@ -1,8 +1,16 @@
-import {fetchWeather, fetchWeatherByCoords, fetchForecast, fetchLocationSuggestions} from "./api.js";
+import {fetchOverview, fetchLocationSuggestions, subscribeWeather} from "./api.js";
 import {displayCurrentWeather, displayError, displayForecast} from "./dom.js";
 
 console.log("Weather app initialized");
 
+// Keeps the displayed current conditions up to date without polling.
+let liveWeather = null;
+
+function watchLocation(location) {
+  if (liveWeather) liveWeather.close();
+  liveWeather = subscribeWeather(location, displayCurrentWeather);
+}
+
 document.addEventListener("DOMContentLoaded", () => {
   console.log("DOM fully loaded");
 
@@ -24,7 +32,7 @@ document.addEventListener("DOMContentLoaded", () => {
     });
 
     // Autocomplete suggestions
-    locationInput.addEventListener("input", handleSuggestions);
+    locationInput.addEventListener("input", debounce(handleSuggestions, 200));
 
     console.log("Event listeners set up successfully");
   } catch (error) {
@@ -44,11 +52,10 @@ async function handleSearch() {
   input.value = location;
 
   try {
-    const weatherData = await fetchWeather(location);
-    displayCurrentWeather(weatherData);
-
-    const forecastData = await fetchForecast(location);
-    displayForecast(forecastData);
+    const overview = await fetchOverview(location);
+    displayCurrentWeather(overview.current);
+    displayForecast(overview.forecast);
+    watchLocation(location);
 
     // Reveal forecast heading if hidden
     document.querySelector("h2").classList.remove("hidden");
@@ -70,11 +77,10 @@ async function handleCurrentLocation() {
     });
 
     const { latitude, longitude } = position.coords;
-    const weatherData = await fetchWeatherByCoords(latitude, longitude);
-    displayCurrentWeather(weatherData);
-
-    const forecastData = await fetchForecast(`${latitude},${longitude}`);
-    displayForecast(forecastData);
+    const overview = await fetchOverview(`${latitude},${longitude}`);
+    displayCurrentWeather(overview.current);
+    displayForecast(overview.forecast);
+    watchLocation(`${latitude},${longitude}`);
 
     document.getElementById("location-input").value = "Near Me";
 
@@ -92,17 +98,32 @@ function toTitleCase(str) {
   });
 }
 
+function debounce(fn, waitMs) {
+  let timer;
+  return (...args) => {
+    clearTimeout(timer);
+    timer = setTimeout(() => fn(...args), waitMs);
+  };
+}
+
+let latestSuggestionQuery = "";
+
 async function handleSuggestions(event) {
   const query = event.target.value.trim();
   const suggestionBox = document.getElementById("suggestions");
   if (!suggestionBox) return;
 
-  suggestionBox.innerHTML = "";
-
-  if (query.length < 2) return;
+  latestSuggestionQuery = query;
+  if (query.length < 2) {
+    suggestionBox.innerHTML = "";
+    return;
+  }
 
   try {
     const suggestions = await fetchLocationSuggestions(query);
+    // Ignore answers that arrive after the user kept typing
+    if (query !== latestSuggestionQuery) return;
+    suggestionBox.innerHTML = "";
     suggestions.forEach((loc) => {
       const option = document.createElement("option");
       option.value = `${loc.name}${loc.state ? ', ' + loc.state : ''}, ${loc.country}`;
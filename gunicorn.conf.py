@@ -0,0 +1,34 @@
+#gunicorn.conf.py
+"""
+Multi-worker server for one host:
+
+    python -m app.migrations
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported once in the master (``preload_app``) and read-only data
+is loaded before forking (``workers.prefork_warmup``), so workers share those
+pages copy-on-write.  Sockets, files and background tasks are opened per
+worker by the app lifespan.  See "Multi-worker deployment" in README.md.
+"""
+import multiprocessing
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# Read by app.config when the app is imported below: the upstream quota is
+# split between workers and they must share one response cache.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "sqlite")
+os.environ.setdefault("DB_MIGRATE_ON_STARTUP", "false")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+keepalive = 5
+timeout = 60
+graceful_timeout = 30
+
+
+def when_ready(server):
+    from app import workers as app_workers
+
+    app_workers.prefork_warmup()
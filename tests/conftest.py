@@ -0,0 +1,23 @@
+#conftest.py
+"""
+Test settings: a throwaway database, caches and lock file per session, no
+background prefetch and no log file.  Set before ``app`` is imported,
+because ``app.config.settings`` reads the environment once.
+"""
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="weatherapp-tests-")
+
+os.environ.update(
+    OPENWEATHER_API_KEY="test-key",
+    DATABASE_URL=f"sqlite:///{os.path.join(_TMP, 'test.db')}",
+    RESPONSE_CACHE_PATH=os.path.join(_TMP, "cache.db"),
+    PLACE_INDEX_PATH=os.path.join(_TMP, "places.idx"),
+    PREFETCH_LOCK_PATH=os.path.join(_TMP, "prefetch.lock"),
+    PREFETCH_ENABLED="false",
+    OBSERVATIONS_ENABLED="false",
+    JOB_WORKERS="0",
+    LOG_FILE="",
+    LOG_LEVEL="WARNING",
+)
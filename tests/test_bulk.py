@@ -0,0 +1,63 @@
+#test_bulk.py
+import asyncio
+from datetime import date
+
+from app import bulk, schemas
+
+
+async def _collect(lines, fmt):
+    return [row async for row in bulk.parse_rows(bulk._aiter(lines), fmt)]
+
+
+def test_csv_quoted_field_spans_lines():
+    text = 'location,record_date\n"Springfield,\nIL",2024-05-01\n\nParis,2024-05-02\n"Say ""hi""",\n'
+    rows = asyncio.run(_collect(text.splitlines(keepends=True), "csv"))
+    assert rows == [
+        (2, {"location": "Springfield,\nIL", "record_date": "2024-05-01"}),
+        (5, {"location": "Paris", "record_date": "2024-05-02"}),
+        (6, {"location": 'Say "hi"'}),
+    ]
+
+
+def test_csv_stray_quote_in_unquoted_field_is_literal():
+    text = 'location,note\nBoston,5" of snow\nDenver,clear\n'
+    rows = asyncio.run(_collect(text.splitlines(keepends=True), "csv"))
+    assert rows == [(2, {"location": "Boston", "note": '5" of snow'}), (3, {"location": "Denver", "note": "clear"})]
+
+
+def test_csv_from_byte_chunks():
+    async def chunks():
+        for part in (b'location\n"New', b'\r\nYork"\r\nRome', b"\r\n"):
+            yield part
+
+    async def main():
+        return [row async for row in bulk.parse_rows(bulk.aiter_lines(chunks()), "csv")]
+
+    assert asyncio.run(main()) == [(2, {"location": "New\nYork"}), (4, {"location": "Rome"})]
+
+
+def test_ndjson_rows_and_errors():
+    rows = asyncio.run(_collect(['{"location": "Oslo"}\n', "\n", "[1]\n", "{bad\n"], "ndjson"))
+    assert rows[0] == (1, {"location": "Oslo"})
+    assert rows[1] == (3, "Expected a JSON object")
+    assert rows[2][0] == 4 and rows[2][1].startswith("Invalid JSON")
+
+
+def test_failed_insert_counts_only_attempted_rows(monkeypatch):
+    async def run_batch(items, fn, concurrency):
+        return [{"ok": False, "error": {"detail": "Location not found"}} if item == "Nowhere"
+                else {"ok": True, "data": {"lat": 1.0, "lon": 2.0}} for item in items]
+
+    async def run_db(fn, *args):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(bulk.services, "run_batch", run_batch)
+    monkeypatch.setattr(bulk, "run_db", run_db)
+    chunk = [(i, schemas.WeatherRecordCreate(location=name, record_date=date(2024, 5, 1)))
+             for i, name in enumerate(["Paris", "Nowhere", "Rome"], start=2)]
+    report = bulk.BulkReport()
+    asyncio.run(bulk._insert_chunk(chunk, report))
+    assert report.failed == 3
+    assert [(e["line"], e["detail"].split(":")[0]) for e in report.errors] == [
+        (3, "Nowhere"), (2, "Insert failed"), (4, "Insert failed"),
+    ]
@@ -0,0 +1,112 @@
+#test_cache.py
+import asyncio
+import sqlite3
+import time
+
+from app.cache import MemoryBackend, ResponseCache, SQLiteBackend, await_lease
+
+
+def test_sqlite_backend_round_trip(tmp_path):
+    cache = ResponseCache(SQLiteBackend(str(tmp_path / "cache.db")))
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"temp": 20}
+
+    async def main():
+        first = await cache.get_or_fetch("k", 60, 0, fetch)
+        second = await cache.get_or_fetch("k", 60, 0, fetch)
+        return first, second
+
+    assert asyncio.run(main()) == ({"temp": 20}, {"temp": 20})
+    assert len(calls) == 1
+
+
+def test_locked_database_skips_writes_quickly(tmp_path):
+    path = str(tmp_path / "cache.db")
+    backend = SQLiteBackend(path, busy_timeout_ms=50)
+    backend.set("k", 1, time.time())
+
+    locker = sqlite3.connect(path)
+    locker.execute("BEGIN EXCLUSIVE")
+    try:
+        started = time.monotonic()
+        assert backend.claim("k", 5) is False
+        backend.set("k", 2, time.time())
+        assert time.monotonic() - started < 1
+        assert backend.busy == 2
+        assert backend.get("k")[0] == 1  # WAL readers are not blocked
+    finally:
+        locker.rollback()
+        locker.close()
+
+
+def test_await_lease_waits_for_the_holder(tmp_path):
+    path = str(tmp_path / "cache.db")
+    holder, waiter = SQLiteBackend(path), SQLiteBackend(path)
+    assert holder.claim("k", 5)
+    # Same pid: make the waiter look like a different process.
+    holder._conn.execute("UPDATE response_leases SET owner = -1")
+
+    async def main():
+        async def store():
+            await asyncio.sleep(0.1)
+            holder.set("k", "value", time.time())
+
+        task = asyncio.create_task(store())
+        result = await await_lease(waiter, "k", wait=2)
+        await task
+        return result
+
+    leased, entry = asyncio.run(main())
+    assert leased is False
+    assert entry[0] == "value"
+
+
+def test_concurrent_misses_share_one_fetch_despite_a_cancelled_caller():
+    cache = ResponseCache(MemoryBackend())
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"temp": 20}
+
+    async def main():
+        first = asyncio.create_task(cache.get_or_fetch("k", 60, 0, fetch))
+        await asyncio.sleep(0)
+        others = [asyncio.create_task(cache.get_or_fetch("k", 60, 0, fetch)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        first.cancel()  # the client that started the fetch went away
+        return await asyncio.gather(*others), first
+
+    results, first = asyncio.run(main())
+    assert first.cancelled()
+    assert results == [{"temp": 20}] * 3
+    assert len(calls) == 1
+    assert (cache.misses, cache.coalesced) == (1, 3)
+
+
+def test_unreadable_stored_times_count_as_misses(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"))
+    backend.set("k", 1, 1000.0)
+    assert backend.stored_times(["k", "missing"]) == {"k": 1000.0}
+
+    backend._conn.execute("ALTER TABLE response_cache RENAME TO gone")  # any OperationalError will do
+    assert backend.stored_times(["k"]) == {}
+    assert backend.busy == 1
+
+
+def test_memory_backend_is_bounded_by_bytes():
+    backend = MemoryBackend(maxsize=100, maxbytes=10, sizeof=len)
+    for key in ("a", "b", "c"):
+        backend.set(key, "xxxx", 0)
+    assert list(backend._data) == ["b", "c"]
+    assert (backend.nbytes, backend.evictions) == (8, 1)
+
+    backend.set("b", "x", 0)  # replacing an entry re-counts it
+    assert backend.nbytes == 5
+    backend.set("big", "x" * 50, 0)  # kept alone rather than not at all
+    assert list(backend._data) == ["big"]
+    assert backend.nbytes == 50
@@ -0,0 +1,68 @@
+#test_compression.py
+import asyncio
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware
+from app.main import app
+
+
+def _run(chunks, minimum_size=500, content_length=None, media_type=b"application/json"):
+    """Send *chunks* through the middleware; returns (start message, body bytes)."""
+    async def inner(scope, receive, send):
+        headers = [(b"content-type", media_type)]
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompressionMiddleware(inner, minimum_size=minimum_size)(scope, receive, send))
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return {k.decode().lower(): v.decode() for k, v in start["headers"]}, body
+
+
+def test_small_body_split_into_chunks_is_not_compressed():
+    # BaseHTTPMiddleware delivers bodies as a chunk plus an empty final chunk.
+    headers, body = _run([b"[]", b""])
+    assert "content-encoding" not in headers
+    assert headers["content-length"] == "2"
+    assert body == b"[]"
+
+
+def test_small_body_with_content_length_passes_through():
+    headers, body = _run([b'{"a":1}'], content_length=7)
+    assert "content-encoding" not in headers
+    assert headers["content-length"] == "7"
+
+
+def test_large_body_in_small_chunks_is_compressed():
+    chunks = [b"x" * 100] * 10 + [b""]
+    headers, body = _run(chunks)
+    assert headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == b"x" * 1000
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def test_small_app_responses_keep_content_length(client):
+    for path in ("/weather/?limit=1", "/weather/999999", "/jobs/999999"):
+        r = client.get(path, headers={"accept-encoding": "gzip"})
+        assert "content-encoding" not in r.headers, path
+        assert r.headers["content-length"] == str(len(r.content)), path
@@ -0,0 +1,55 @@
+#test_crud.py
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import Base
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    days = [date(2024, 5, 2), None, date(2024, 5, 1), date(2024, 5, 2), None, date(2024, 5, 1), date(2024, 5, 3)]
+    session.add_all(models.WeatherRecord(location=f"Town{i}", record_date=day) for i, day in enumerate(days))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _walk(db, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        page = crud.get_weather_records(db, limit=limit, cursor=cursor, **filters)
+        if not page:
+            return pages
+        pages.append([r.id for r in page])
+        cursor = crud.encode_cursor(page[-1])
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_cursor_walk_visits_every_record_once_in_order(db, limit):
+    expected = [r.id for r in crud.get_weather_records(db, limit=100)]
+    # Undated records first, then by date and id.
+    assert expected == [2, 5, 3, 6, 1, 4, 7]
+    assert sum(_walk(db, limit), []) == expected
+
+
+def test_cursor_from_an_undated_record(db):
+    cursor = crud.encode_cursor(db.get(models.WeatherRecord, 2))
+    assert crud.decode_cursor(cursor) == (None, 2)
+    assert [r.id for r in crud.get_weather_records(db, cursor=cursor)] == [5, 3, 6, 1, 4, 7]
+
+
+def test_cursor_respects_filters(db):
+    pages = _walk(db, 1, date_from=date(2024, 5, 2))
+    assert pages == [[1], [4], [7]]
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        crud.decode_cursor("not-a-cursor")
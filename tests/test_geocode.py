@@ -0,0 +1,145 @@
+#test_geocode.py
+import asyncio
+import threading
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import openweather, places, services
+from app.main import app
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path == "/geo/1.0/zip":
+            if request.url.params["zip"].startswith("00000"):
+                return httpx.Response(404, json={"cod": "404", "message": "not found"})
+            return httpx.Response(200, json={"lat": 40.7, "lon": -74.0})
+        if request.url.path == "/geo/1.0/direct":
+            return httpx.Response(200, json=[{"name": "Zzyzx", "country": "US", "lat": 35.1, "lon": -116.1}])
+        return httpx.Response(503)
+
+    client = openweather.OpenWeatherClient("http://upstream", "test-key", retries=0)
+    client._http = httpx.AsyncClient(base_url="http://upstream", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(openweather, "_client", client)
+    return calls
+
+
+def test_unknown_zip_is_not_found_and_cached(upstream):
+    async def main():
+        for _ in range(2):
+            with pytest.raises(HTTPException) as info:
+                await services.validate_location("00000")
+            assert info.value.status_code == 404
+            assert info.value.detail == "Location not found"
+
+    asyncio.run(main())
+    assert upstream == ["/geo/1.0/zip"]
+
+
+def test_known_zip_resolves(upstream):
+    assert asyncio.run(services.validate_location("10001")) == {"lat": 40.7, "lon": -74.0}
+
+
+def _cache(**kwargs):
+    return services.GeocodeCache(ttl=kwargs.get("ttl", 60), negative_ttl=kwargs.get("negative_ttl", 60),
+                                 maxsize=kwargs.get("maxsize", 100))
+
+
+def test_cache_hits_expiry_and_negative_answers(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(services.time, "monotonic", lambda: now[0])
+    cache = _cache(ttl=60, negative_ttl=10)
+    calls = []
+
+    async def resolve():
+        calls.append(1)
+        return {"lat": 1.0, "lon": 2.0}
+
+    async def missing():
+        calls.append(1)
+        raise HTTPException(404, "Location not found")
+
+    async def main():
+        assert await cache.get_or_resolve("q:paris", resolve) == {"lat": 1.0, "lon": 2.0}
+        await cache.get_or_resolve("q:paris", resolve)
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                await cache.get_or_resolve("q:nowhere", missing)
+        assert len(calls) == 2
+        now[0] += 30  # the negative answer expired, the place did not
+        await cache.get_or_resolve("q:paris", resolve)
+        with pytest.raises(HTTPException):
+            await cache.get_or_resolve("q:nowhere", missing)
+        assert len(calls) == 3
+
+    asyncio.run(main())
+    assert (cache.hits, cache.negative_hits, cache.misses) == (2, 1, 3)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = _cache(maxsize=2)
+
+    async def resolve():
+        return {"lat": 0.0, "lon": 0.0}
+
+    async def main():
+        for key in ("a", "b", "a", "c"):
+            await cache.get_or_resolve(key, resolve)
+
+    asyncio.run(main())
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.evictions == 1
+
+
+def test_concurrent_misses_share_one_lookup_despite_a_cancelled_caller():
+    cache = _cache()
+    calls = []
+
+    async def resolve():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"lat": 1.0, "lon": 2.0}
+
+    async def main():
+        first = asyncio.create_task(cache.get_or_resolve("q:paris", resolve))
+        await asyncio.sleep(0)
+        others = [asyncio.create_task(cache.get_or_resolve("q:paris", resolve)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        first.cancel()  # the client that started the lookup went away
+        return await asyncio.gather(*others), first
+
+    results, first = asyncio.run(main())
+    assert first.cancelled()
+    assert results == [{"lat": 1.0, "lon": 2.0}] * 3
+    assert len(calls) == 1
+    assert cache.coalesced == 3
+
+
+@pytest.mark.parametrize("coords", ["91/0", "-90.5/0", "0/180.1", "0/-181"])
+def test_out_of_range_coordinates_are_rejected(upstream, coords):
+    with TestClient(app) as client:
+        assert client.get(f"/weather/current/coords/{coords}").status_code == 422
+    assert upstream == []
+
+
+def test_learned_suggestions_are_written_off_the_event_loop(upstream, tmp_path, monkeypatch):
+    overlay = tmp_path / "learned.tsv"
+    index = places.PlaceIndex(None, str(overlay))
+    monkeypatch.setattr(places, "get_index", lambda: index)
+    monkeypatch.setattr(services.settings, "place_index_learn", True)
+    learned_on = []
+    learn = index.learn
+    monkeypatch.setattr(index, "learn", lambda results: learned_on.append(threading.current_thread()) or learn(results))
+
+    results = asyncio.run(services.suggest_locations("zzyzx"))
+    assert results[0]["name"] == "Zzyzx"
+    assert learned_on and learned_on[0] is not threading.main_thread()
+    assert "Zzyzx" in overlay.read_text()
+    assert index.suggest("zzy", 5)[0]["name"] == "Zzyzx"
@@ -0,0 +1,52 @@
+#test_httpcache.py
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        rows = b'{"location": "Etagville", "record_date": "2024-05-01", "latitude": 1.5, "longitude": 2.5}\n'
+        assert c.post("/weather/bulk?format=ndjson", content=rows * 3).json()["inserted"] == 3
+        yield c
+
+
+def test_record_revalidates_with_etag(client):
+    record_id = client.get("/weather/?location=etagville&limit=1").json()[0]["id"]
+    first = client.get(f"/weather/{record_id}")
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    not_modified = client.get(f"/weather/{record_id}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+    # Weak comparison: a strong copy of the same tag matches too.
+    assert client.get(f"/weather/{record_id}", headers={"If-None-Match": etag[2:]}).status_code == 304
+
+    client.put(f"/weather/{record_id}", json={"temperature": 21.5})
+    changed = client.get(f"/weather/{record_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["updated_at"] is not None
+
+
+def test_record_revalidates_with_last_modified(client):
+    record_id = client.get("/weather/?location=etagville&limit=1").json()[0]["id"]
+    last_modified = client.get(f"/weather/{record_id}").headers["Last-Modified"]
+    assert client.get(f"/weather/{record_id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+    older = "Mon, 01 Jan 2001 00:00:00 GMT"
+    assert client.get(f"/weather/{record_id}", headers={"If-Modified-Since": older}).status_code == 200
+
+
+def test_list_page_etag_follows_the_page(client):
+    first = client.get("/weather/?location=etagville&limit=2")
+    etag = first.headers["ETag"]
+    assert client.get("/weather/?location=etagville&limit=2", headers={"If-None-Match": etag}).status_code == 304
+
+    second = client.get(first.headers["Link"].split(">")[0].lstrip("<"), headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert len(second.json()) == 1
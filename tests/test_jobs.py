@@ -0,0 +1,152 @@
+#test_jobs.py
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import jobs
+from app.database import Base
+from app.models import Job, WeatherRecord
+from app.openweather import UpstreamUnavailable
+from app.services import upstream_error
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _record(location):
+    return WeatherRecord(location=location)
+
+
+def test_records_for_one_place_share_an_open_job(db):
+    first = jobs.create_record(db, _record("Paris"))
+    second = jobs.create_record(db, _record("paris "))
+    other = jobs.create_record(db, _record("Rome"))
+    assert first[1] == second[1] != other[1]
+    assert jobs.get_status(db, first[1])["record_ids"] == [first[0], second[0]]
+
+
+def test_claim_leases_a_job_until_it_expires(db):
+    record_id, job_id = jobs.create_record(db, _record("Paris"))
+    now = time.time() + 1
+    job = jobs.claim(db, lease=60, now=now)
+    assert (job["id"], job["attempts"]) == (job_id, 1)
+    assert jobs.claim(db, lease=60, now=now + 30) is None
+
+    # The first worker died: the job is claimed again once its lease ran out.
+    retaken = jobs.claim(db, lease=60, now=now + 61)
+    assert (retaken["id"], retaken["attempts"]) == (job_id, 2)
+    assert retaken["owner"] != job["owner"]
+
+    assert jobs.finish(db, job, jobs.DONE, {"latitude": 1.0}) is False
+    assert jobs.finish(db, retaken, jobs.DONE, {"latitude": 2.0, "longitude": 3.0}) is True
+    db.expire_all()
+    assert db.get(WeatherRecord, record_id).latitude == 2.0
+    assert jobs.get_status(db, job_id)["status"] == jobs.DONE
+    assert jobs.claim(db, lease=60, now=now + 1000) is None
+
+
+def test_racing_workers_never_claim_one_job_twice(engine, db):
+    job_ids = {jobs.create_record(db, _record(f"Town{i}"))[1] for i in range(40)}
+    start = threading.Barrier(4)
+    claimed, errors = [], []
+
+    def worker():
+        session = sessionmaker(bind=engine)()
+        try:
+            start.wait()
+            while (job := jobs.claim(session, lease=60)) is not None:
+                claimed.append((job["id"], job["attempts"]))
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sorted(job_id for job_id, _ in claimed) == sorted(job_ids)
+    assert {attempts for _, attempts in claimed} == {1}
+
+
+def test_finished_job_no_longer_collects_records(db):
+    _, job_id = jobs.create_record(db, _record("Paris"))
+    jobs.finish(db, jobs.claim(db, lease=60), jobs.DONE)
+    _, next_job = jobs.create_record(db, _record("Paris"))
+    assert next_job != job_id
+
+
+def test_reschedule_delays_the_next_claim(db):
+    _, job_id = jobs.create_record(db, _record("Paris"))
+    job = jobs.claim(db, lease=60)
+    assert jobs.reschedule(db, job, delay=30, error="upstream down")
+    assert jobs.claim(db, lease=60) is None
+    status = jobs.get_status(db, job_id)
+    assert (status["status"], status["attempts"], status["error"]) == (jobs.PENDING, 1, "upstream down")
+
+    again = jobs.claim(db, lease=60, now=time.time() + 31)
+    assert again["attempts"] == 2
+    # A hand-back on shutdown does not use up an attempt.
+    jobs.reschedule(db, again, 0, count_attempt=False)
+    assert jobs.claim(db, lease=60, now=time.time() + 1)["attempts"] == 2
+
+
+def _run_failure(db, monkeypatch, exc, attempts=1, max_attempts=5):
+    async def run_db(fn, *args, **kwargs):
+        return fn(db, *args, **kwargs)
+
+    monkeypatch.setattr(jobs, "run_db", run_db)
+    queue = jobs.JobQueue(workers=0, max_attempts=max_attempts, backoff_base=2)
+    _, job_id = jobs.create_record(db, _record("Paris"))
+    job = jobs.claim(db, lease=60)
+    job["attempts"] = attempts
+    asyncio.run(queue._failed(job, exc, {}))
+    db.expire_all()
+    return queue, db.get(Job, job_id)
+
+
+def test_upstream_failure_is_retried_after_retry_after(db, monkeypatch):
+    exc = upstream_error(UpstreamUnavailable("rate limited", retry_after=45))
+    queue, job = _run_failure(db, monkeypatch, exc)
+    assert queue.retried == 1
+    assert job.status == jobs.PENDING
+    assert job.run_after >= time.time() + 44
+
+
+def test_unknown_location_fails_at_once(db, monkeypatch):
+    queue, job = _run_failure(db, monkeypatch, HTTPException(404, "Location not found"))
+    assert queue.failed == 1
+    assert (job.status, job.error) == (jobs.FAILED, "Location not found")
+
+
+def test_gives_up_after_max_attempts(db, monkeypatch):
+    queue, job = _run_failure(db, monkeypatch, HTTPException(502, "bad gateway"), attempts=3, max_attempts=3)
+    assert queue.failed == 1
+    assert job.status == jobs.FAILED
+
+
+def test_backoff_grows_and_respects_retry_after():
+    queue = jobs.JobQueue(workers=0, backoff_base=2, backoff_max=60)
+    assert 1 <= queue.backoff(1) <= 2
+    assert 8 <= queue.backoff(4) <= 16
+    assert 30 <= queue.backoff(10) <= 60
+    assert queue.backoff(1, retry_after=20) == 20
@@ -0,0 +1,58 @@
+#test_live.py
+import asyncio
+
+from app import live
+
+
+def _scope():
+    return {"type": "http", "method": "GET", "path": "/weather/live", "headers": [], "asgi": {"spec_version": "2.4"}}
+
+
+def test_dropped_subscription_ends_a_blocked_stream():
+    async def main():
+        hub = live.Hub(stall_timeout=0.1)
+        sub = hub.connect()
+        sub.offer("Paris", {"location": "Paris"})
+        sent = []
+
+        async def receive():
+            await asyncio.Event().wait()  # the client never disconnects
+
+        async def send(message):
+            sent.append(message)
+            if message.get("body"):
+                await asyncio.Event().wait()  # and never reads
+
+        response = asyncio.create_task(live.EventStream(sub)(_scope(), receive, send))
+        await asyncio.sleep(0.05)
+        assert not response.done()
+        hub.drop(sub)
+        await asyncio.wait_for(response, 1)
+        return hub, sent
+
+    hub, sent = asyncio.run(main())
+    assert hub.dropped == 1 and hub.connections == 0
+    assert sent[0]["type"] == "http.response.start"
+    assert b"event: weather" in sent[1]["body"]
+
+
+def test_closed_subscription_ends_an_idle_stream():
+    async def main():
+        hub = live.Hub()
+        sub = hub.connect()
+        sent = []
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        response = asyncio.create_task(live.EventStream(sub)(_scope(), receive, send))
+        await asyncio.sleep(0.05)
+        hub.disconnect(sub)
+        await asyncio.wait_for(response, 1)
+        return sent
+
+    sent = asyncio.run(main())
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
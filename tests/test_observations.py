@@ -0,0 +1,29 @@
+#test_observations.py
+from app.observations import ObservationRecorder
+
+
+def _slot(dt, temp=10.0):
+    return {"dt": dt, "main": {"temp": temp, "humidity": 50}, "wind": {"speed": 3}, "weather": [{"main": "Clear"}]}
+
+
+def test_refetched_forecast_records_only_new_slots():
+    recorder = ObservationRecorder()
+    recorder.add("forecast", "u4pru", {"list": [_slot(t) for t in range(0, 40 * 10800, 10800)]})
+    recorder.add("forecast", "u4pru", {"list": [_slot(t) for t in range(0, 40 * 10800, 10800)]})
+    assert recorder.recorded == 40
+
+    recorder.add("forecast", "u4pru", {"list": [_slot(t) for t in range(10800, 41 * 10800, 10800)]})
+    assert recorder.recorded == 41
+    assert len({(r["cell"], r["observed_at"]) for r in recorder._pending}) == 41
+
+    recorder.add("forecast", "u4prv", {"list": [_slot(0)]})
+    assert recorder.recorded == 42
+
+
+def test_repeated_current_reading_is_skipped():
+    recorder = ObservationRecorder()
+    recorder.add("weather", "u4pru", _slot(600))
+    recorder.add("weather", "u4pru", _slot(600))
+    recorder.add("weather", "u4pru", _slot(1200))
+    assert [r["observed_at"] for r in recorder._pending] == [600, 1200]
+    assert {r["kind"] for r in recorder._pending} == {"current"}
@@ -0,0 +1,73 @@
+#test_prefetch.py
+import asyncio
+import time
+
+from app import workers
+from app.config import settings
+from app.prefetch import HotSet, Prefetcher
+
+
+def test_scan_reads_timestamps_once_and_spends_its_own_budget():
+    hot = HotSet()
+    for geohash in ("fresh", "stale", "missing"):
+        hot.touch("weather", geohash)
+    lookups, refreshed = [], []
+
+    async def stored_times(cells):
+        lookups.append(list(cells))
+        now = time.time()
+        return {("weather", "fresh"): now, ("weather", "stale"): now - 3600}
+
+    async def refresh(endpoint, geohash, budget):
+        refreshed.append((geohash, budget))
+
+    async def main():
+        prefetcher = Prefetcher(refresh, stored_times, ttl=lambda endpoint: 600, hot_set=hot,
+                                rate_per_minute=60, lead=60)
+        started = await prefetcher.scan()
+        await asyncio.gather(*prefetcher._inflight)
+        return prefetcher, started
+
+    prefetcher, started = asyncio.run(main())
+    assert len(lookups) == 1
+    assert started == 2
+    assert sorted(geohash for geohash, _ in refreshed) == ["missing", "stale"]
+    assert all(budget is prefetcher.budget for _, budget in refreshed)
+
+
+def test_scan_defers_beyond_the_budget():
+    hot = HotSet()
+    for i in range(10):
+        hot.touch("weather", f"cell{i}")
+
+    async def stored_times(cells):
+        return {}
+
+    async def refresh(endpoint, geohash, budget):
+        budget.try_acquire()
+
+    async def main():
+        # 6/min bursts to 10 s worth: one token.
+        prefetcher = Prefetcher(refresh, stored_times, ttl=lambda endpoint: 600, hot_set=hot, rate_per_minute=6)
+        started = await prefetcher.scan()
+        await asyncio.gather(*prefetcher._inflight)
+        return prefetcher, started
+
+    prefetcher, started = asyncio.run(main())
+    assert started == 1
+    assert prefetcher.deferred == 9
+
+
+def test_prefetch_budget_comes_off_the_request_quota(monkeypatch):
+    monkeypatch.setattr(settings, "prefetch_enabled", True)
+    monkeypatch.setattr(settings, "upstream_rate_per_minute", 60)
+    monkeypatch.setattr(settings, "prefetch_rate_per_minute", 20)
+    monkeypatch.setattr(settings, "web_concurrency", 4)
+    assert workers.prefetch_budget() == 20
+    assert workers.request_share() == 10
+
+    monkeypatch.setattr(settings, "prefetch_rate_per_minute", 50)
+    assert workers.prefetch_budget() == 30
+
+    monkeypatch.setattr(settings, "prefetch_enabled", False)
+    assert workers.request_share() == 15
@@ -0,0 +1,90 @@
+#test_ratelimit.py
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.openweather import OpenWeatherClient, UpstreamUnavailable
+from app.ratelimit import TokenBucket
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+def test_reserve_books_consecutive_slots(clock):
+    bucket = TokenBucket.per_minute(60, burst=2)
+    waits = [bucket.reserve(max_wait=2.0) for _ in range(6)]
+    # Two from the burst, then one slot per second up to max_wait, then refused.
+    assert waits == [0.0, 0.0, 1.0, 2.0, None, None]
+    assert bucket.wait_time() == pytest.approx(3.0)
+
+
+def test_refused_callers_book_nothing(clock):
+    bucket = TokenBucket.per_minute(60, burst=1)
+    assert bucket.reserve(max_wait=0) == 0.0
+    for _ in range(10):
+        assert bucket.reserve(max_wait=0.5) is None
+    clock.now += 1
+    assert bucket.reserve(max_wait=0) == 0.0
+
+
+def test_available_is_zero_while_in_debt(clock):
+    bucket = TokenBucket.per_minute(60, burst=1)
+    bucket.reserve()
+    bucket.reserve()
+    assert bucket.available() == 0.0
+    clock.now += 1
+    assert bucket.available() == pytest.approx(0.0)
+    clock.now += 1
+    assert bucket.available() == pytest.approx(1.0)
+
+
+def test_cancelled_acquire_returns_its_slot():
+    async def run():
+        bucket = TokenBucket(rate=10, capacity=1)
+        assert await bucket.acquire()
+        waiter = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return bucket.wait_time()
+
+    assert asyncio.run(run()) <= 0.1
+
+
+def test_client_enforces_max_queue_wait():
+    """12 concurrent calls, burst 2 and one slot per 0.1 s: only 4 fit in a 0.2 s queue."""
+
+    async def run():
+        client = OpenWeatherClient("http://upstream", "key", rate_per_minute=600, rate_burst=2,
+                                   max_queue_wait=0.2, retries=0)
+        client._http = httpx.AsyncClient(base_url="http://upstream",
+                                         transport=httpx.MockTransport(lambda r: httpx.Response(200, json={})))
+        start = time.monotonic()
+        results = await asyncio.gather(*(client.get_json("/data/2.5/weather") for _ in range(12)),
+                                       return_exceptions=True)
+        elapsed = time.monotonic() - start
+        await client.aclose()
+        return results, elapsed
+
+    results, elapsed = asyncio.run(run())
+    refused = [r for r in results if isinstance(r, UpstreamUnavailable)]
+    assert len(results) - len(refused) == 4
+    assert len(refused) == 8
+    # Retry-After points at the next free slot, just past the queue limit.
+    assert all(0.2 < r.retry_after <= 0.4 for r in refused)
+    assert elapsed < 0.5